@@ -0,0 +1,272 @@
+"""Measure how long the rules of the StartMenuHelper take on generated start menus.
+
+Run it from the root of the repository, for example:
+    python -m benchmarks.run_benchmarks --profile desktop --profile workstation --output results.json
+"""
+import argparse
+import contextlib
+import json
+import pathlib
+import platform
+import statistics
+import sys
+import tempfile
+import time
+from typing import Callable, Dict, Iterator, List, NamedTuple, Optional
+
+from benchmarks.start_menu_generator import PROFILES, GeneratedStartMenu, TreeProfile, generate
+from library import constants
+from library.configuration import Configuration
+from library.helpers.tree_snapshot import TreeSnapshot
+from library.start_menu_helper import StartMenuHelper
+
+_OFF = {
+    "flatten_folders_containing_only_one_item_bool": "False",
+    "flatten_folders_list_type_str": "whitelist",
+    "delete_empty_folders_bool": "False",
+    "delete_links_to_folders_bool": "False",
+    "delete_duplicates_bool": "False",
+    "delete_files_based_on_file_type_str": "in the list",
+    "delete_broken_links_bool": "False",
+    "incremental_scanning_bool": "False",
+}
+_NAMES = ["Uninstall", "Readme", "Help"]
+_FILE_TYPES = [".url", ".txt", ".chm", ".pdf"]
+_REQUIRED_FILE_TYPES = [".lnk", ".exe"]
+_FLATTENED_FOLDERS = ["Tools", "Utilities"]
+_WORKERS = [1, 2, 4, 8]
+
+
+class Scenario(NamedTuple):
+    """The options and lists that are used for one measurement."""
+    options: Dict[str, str]
+    names: List[str]
+    file_types: List[str]
+    flatten_folders_exceptions: List[str]
+
+
+SCENARIOS = {
+    "scan": Scenario({}, [], [], []),
+    "delete_files_with_names_containing": Scenario({}, _NAMES, [], []),
+    "delete_files_matching_file_types": Scenario({}, [], _FILE_TYPES, []),
+    "delete_files_not_matching_file_types": Scenario(
+        {"delete_files_based_on_file_type_str": "not in the list"}, [], _REQUIRED_FILE_TYPES, []
+    ),
+    "delete_broken_links": Scenario({"delete_broken_links_bool": "True"}, [], [], []),
+    "delete_links_to_folders": Scenario({"delete_links_to_folders_bool": "True"}, [], [], []),
+    "delete_duplicates": Scenario({"delete_duplicates_bool": "True"}, [], [], []),
+    "flatten_folders_with_whitelist": Scenario({}, [], [], _FLATTENED_FOLDERS),
+    "flatten_folders_with_blacklist": Scenario(
+        {"flatten_folders_list_type_str": "blacklist"}, [], [], _FLATTENED_FOLDERS
+    ),
+    "flatten_folders_containing_one_file": Scenario(
+        {"flatten_folders_containing_only_one_item_bool": "True"}, [], [], []
+    ),
+    "delete_empty_folders": Scenario({"delete_empty_folders_bool": "True"}, [], [], []),
+}
+FULL_CYCLE = Scenario(
+    {
+        "flatten_folders_containing_only_one_item_bool": "True",
+        "delete_empty_folders_bool": "True",
+        "delete_links_to_folders_bool": "True",
+        "delete_duplicates_bool": "True",
+        "delete_broken_links_bool": "True",
+        "incremental_scanning_bool": "True",
+    },
+    _NAMES,
+    _FILE_TYPES,
+    _FLATTENED_FOLDERS
+)
+
+
+def _create_helper(configuration_directory: pathlib.Path, scenario: Scenario) -> StartMenuHelper:
+    """Create a StartMenuHelper with a new configuration for the scenario."""
+    config = Configuration(configuration_directory)
+    for key, value in {**_OFF, **scenario.options}.items():
+        config.set(key, value)
+    config.save()
+    config.delete_files_with_names_containing_list = scenario.names
+    config.delete_matching_file_types_exceptions = scenario.file_types
+    config.flatten_folders_exceptions = scenario.flatten_folders_exceptions
+    return StartMenuHelper(config)
+
+
+def _use_start_menu(start_menu: GeneratedStartMenu) -> None:
+    """Make the StartMenuHelper clean the generated start menu instead of the real one."""
+    constants.START_MENU_PATHS = start_menu.start_menus
+
+
+def _summary(seconds: List[float], **details: object) -> Dict[str, object]:
+    """Return the results of the repetitions of one measurement."""
+    return {
+        "seconds": seconds,
+        "best": min(seconds),
+        "median": statistics.median(seconds),
+        **details,
+    }
+
+
+def _measure_plan(directory: pathlib.Path, scenario: Scenario, repeat: int) -> Dict[str, object]:
+    """Measure how long planning a cycle of the scenario takes with an empty shortcut cache."""
+    seconds = []
+    operations = 0
+    for repetition in range(repeat):
+        helper = _create_helper(directory.joinpath(f"config-plan-{repetition}"), scenario)
+        start = time.perf_counter()
+        operations = len(helper.dry_run())
+        seconds.append(time.perf_counter() - start)
+    return _summary(seconds, operations=operations)
+
+
+def _measure_cycles(
+        directory: pathlib.Path,
+        create_start_menu: Callable[[pathlib.Path], GeneratedStartMenu],
+        repeat: int
+) -> Dict[str, Dict[str, object]]:
+    """Measure a full cycle on a new start menu and the cycles after it.
+
+    The second cycle reads the directories that the first cycle changed again, only the third
+    cycle finds nothing changed.
+    """
+    full_cycle_seconds: List[float] = []
+    second_cycle_seconds: List[float] = []
+    unchanged_cycle_seconds: List[float] = []
+    operations = 0
+    for repetition in range(repeat):
+        _use_start_menu(create_start_menu(directory.joinpath(f"cycle-{repetition}")))
+        helper = _create_helper(directory.joinpath(f"config-cycle-{repetition}"), FULL_CYCLE)
+        operations = len(helper.dry_run())
+        start = time.perf_counter()
+        helper.run_cycle()
+        full_cycle_seconds.append(time.perf_counter() - start)
+        for seconds in (second_cycle_seconds, unchanged_cycle_seconds):
+            start = time.perf_counter()
+            helper.run_cycle()
+            seconds.append(time.perf_counter() - start)
+    return {
+        "full_cycle": _summary(full_cycle_seconds, operations=operations),
+        "second_cycle": _summary(second_cycle_seconds, operations=0),
+        "unchanged_cycle": _summary(unchanged_cycle_seconds, operations=0),
+    }
+
+
+@contextlib.contextmanager
+def _listing_latency(latency: float) -> Iterator[None]:
+    """Make every directory listing take the latency in seconds longer, like on a network drive."""
+    list_directory = TreeSnapshot._list_directory  # pylint: disable=W0212
+
+    def list_directory_slowly(directory: str) -> object:
+        time.sleep(latency)
+        return list_directory(directory)
+
+    if latency > 0:
+        TreeSnapshot._list_directory = staticmethod(list_directory_slowly)  # type: ignore
+    try:
+        yield
+    finally:
+        TreeSnapshot._list_directory = staticmethod(list_directory)  # type: ignore
+
+
+def _measure_traversal(start_menu: GeneratedStartMenu, workers: List[int], repeat: int,
+                       latency: float) -> Dict[str, Dict[str, object]]:
+    """Measure reading the start menu with parallel traversal for every number of workers.
+
+    The speedup is relative to the first number of workers.
+    """
+    results: Dict[str, Dict[str, object]] = {}
+    baseline = 0.0
+    with _listing_latency(latency):
+        for worker_count in workers:
+            seconds = []
+            listings = 0
+            for _ in range(repeat):
+                start = time.perf_counter()
+                snapshot = TreeSnapshot(start_menu.programs, workers=worker_count, parallel_traversal=True)
+                seconds.append(time.perf_counter() - start)
+                listings = snapshot.listings
+            baseline = baseline or min(seconds)
+            results[str(worker_count)] = _summary(seconds, listings=listings, speedup=baseline / min(seconds))
+    return results
+
+
+def run_profile(name: str, profile: TreeProfile, seed: int, repeat: int,
+                scenarios: Optional[List[str]] = None, workers: Optional[List[int]] = None,
+                listing_latency: float = 0.0) -> Dict[str, object]:
+    """Run the benchmarks of the scenarios on a start menu that is generated from the profile."""
+    with tempfile.TemporaryDirectory(prefix="start-menu-benchmark-") as temporary_directory:
+        directory = pathlib.Path(temporary_directory)
+        start = time.perf_counter()
+        start_menu = generate(directory.joinpath("start-menu"), profile, seed)
+        generation_seconds = time.perf_counter() - start
+        _use_start_menu(start_menu)
+
+        results: Dict[str, object] = {}
+        if scenarios is None or "traversal" in scenarios:
+            results["traversal"] = _measure_traversal(start_menu, workers or _WORKERS, repeat, listing_latency)
+        for scenario_name, scenario in SCENARIOS.items():
+            if scenarios is None or scenario_name in scenarios:
+                results[scenario_name] = _measure_plan(directory, scenario, repeat)
+        if scenarios is None or "full_cycle" in scenarios:
+            results.update(_measure_cycles(
+                directory,
+                lambda cycle_directory: generate(cycle_directory, profile, seed),
+                repeat
+            ))
+    return {
+        "profile": {"name": name, **profile._asdict()},
+        "seed": seed,
+        "counts": start_menu.counts,
+        "generation_seconds": generation_seconds,
+        "results": results,
+    }
+
+
+def main(arguments: Optional[List[str]] = None) -> None:
+    """Run the benchmarks and write the results as JSON."""
+    argument_parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawTextHelpFormatter)
+    argument_parser.add_argument("--profile", action="append", choices=sorted(PROFILES),
+                                 help="Size of the generated start menu, can be given multiple times "
+                                      "(Default is desktop and workstation)")
+    argument_parser.add_argument("--entries", type=int,
+                                 help="Override the number of files and folders of the profiles")
+    argument_parser.add_argument("--scenario", action="append",
+                                 choices=sorted([*SCENARIOS, "full_cycle", "traversal"]),
+                                 help="Only run these scenarios, can be given multiple times")
+    argument_parser.add_argument("--workers", type=int, action="append",
+                                 help="Numbers of workers of the traversal scenario, can be given multiple "
+                                      "times (Default is 1, 2, 4 and 8)")
+    argument_parser.add_argument("--listing-latency", type=float, default=0.0,
+                                 help="Seconds that every directory listing of the traversal scenario takes "
+                                      "longer to simulate network drives")
+    argument_parser.add_argument("--repeat", type=int, default=3, help="Repetitions of each measurement")
+    argument_parser.add_argument("--seed", type=int, default=0, help="Seed of the generated start menus")
+    argument_parser.add_argument("--output", type=pathlib.Path,
+                                 help="Write the results to this file instead of printing them")
+    parsed_arguments = argument_parser.parse_args(arguments)
+
+    runs = []
+    for name in parsed_arguments.profile or ["desktop", "workstation"]:
+        profile = PROFILES[name]
+        if parsed_arguments.entries:
+            profile = profile._replace(entries=parsed_arguments.entries)
+        print(f"Running {name} with {profile.entries} entries", file=sys.stderr)
+        runs.append(run_profile(name, profile, parsed_arguments.seed, parsed_arguments.repeat,
+                                parsed_arguments.scenario, parsed_arguments.workers,
+                                parsed_arguments.listing_latency))
+
+    results = {
+        "version": constants.VERSION_NUMBER,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "runs": runs,
+    }
+    if parsed_arguments.output:
+        with open(parsed_arguments.output, "w", encoding="utf-8") as file:
+            json.dump(results, file, indent=2)
+    else:
+        print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+"""Write minimal windows shortcut files without needing windows."""
+import pathlib
+import struct
+
+_HEADER_SIZE = 0x4C
+_LINK_CLSID = bytes.fromhex("0114020000000000c000000000000046")
+_HAS_LINK_INFO = 0x00000002
+_HAS_ARGUMENTS = 0x00000020
+_IS_UNICODE = 0x00000080
+_FILE_ATTRIBUTE_NORMAL = 0x80
+_VOLUME_ID_AND_LOCAL_BASE_PATH = 0x00000001
+_LINK_INFO_HEADER_SIZE = 0x24
+_DRIVE_FIXED = 3
+
+
+def _link_info(target: str) -> bytes:
+    """Return a unicode LinkInfo structure that points to a local path."""
+    volume_id = struct.pack("<IIII", 0x11, _DRIVE_FIXED, 0x5354524D, 0x10) + b"\0"
+    local_base_path = target.encode("ascii", "replace") + b"\0"
+    unicode_local_base_path = target.encode("utf-16-le") + b"\0\0"
+    volume_id_offset = _LINK_INFO_HEADER_SIZE
+    local_base_path_offset = volume_id_offset + len(volume_id)
+    suffix_offset = local_base_path_offset + len(local_base_path)
+    unicode_local_base_path_offset = suffix_offset + 1
+    unicode_suffix_offset = unicode_local_base_path_offset + len(unicode_local_base_path)
+    size = unicode_suffix_offset + 2
+    return struct.pack(
+        "<IIIIIIIII",
+        size,
+        _LINK_INFO_HEADER_SIZE,
+        _VOLUME_ID_AND_LOCAL_BASE_PATH,
+        volume_id_offset,
+        local_base_path_offset,
+        0,
+        suffix_offset,
+        unicode_local_base_path_offset,
+        unicode_suffix_offset,
+    ) + volume_id + local_base_path + b"\0" + unicode_local_base_path + b"\0\0"
+
+
+def _string_data(string: str) -> bytes:
+    """Return a unicode StringData structure."""
+    return struct.pack("<H", len(string)) + string.encode("utf-16-le")
+
+
+def shortcut_bytes(target: str, arguments: str = "") -> bytes:
+    """Return the contents of a shortcut file to the target with the arguments."""
+    flags = _HAS_LINK_INFO | _IS_UNICODE
+    if arguments:
+        flags |= _HAS_ARGUMENTS
+    header = struct.pack("<I16sII", _HEADER_SIZE, _LINK_CLSID, flags, _FILE_ATTRIBUTE_NORMAL)
+    header += b"\0" * 24 + struct.pack("<IiIH", 0, 0, 1, 0) + b"\0" * 10
+    data = header + _link_info(target)
+    if arguments:
+        data += _string_data(arguments)
+    return data + b"\0\0\0\0"
+
+
+def write_shortcut(link: pathlib.Path, target: pathlib.Path, arguments: str = "") -> None:
+    """Write a shortcut file to the target with the arguments."""
+    link.write_bytes(shortcut_bytes(str(target), arguments))
@@ -0,0 +1,170 @@
+"""Generate synthetic start menus for benchmarks."""
+import pathlib
+import random
+from typing import Dict, List, NamedTuple, Tuple
+
+from benchmarks.shortcut_writer import write_shortcut
+
+_VENDORS = ["Contoso", "Fabrikam", "Northwind", "Litware", "Tailspin", "Adventure Works", "Woodgrove",
+            "Proseware", "Wingtip", "Coho"]
+_PRODUCTS = ["Studio", "Editor", "Viewer", "Manager", "Designer", "Player", "Tools", "Utilities", "Suite",
+             "Monitor", "Client", "Server", "Toolkit", "Reader", "Converter"]
+_EXTRAS = [("Readme", ".txt"), ("Help", ".chm"), ("Manual", ".pdf"), ("Website", ".url"), ("Setup", ".exe"),
+           ("Settings", ".ini"), ("Uninstall", ".lnk"), ("Release Notes", ".htm")]
+_PROTECTED_FOLDER = "Startup"
+
+
+class TreeProfile(NamedTuple):
+    """The shape of a generated start menu.
+
+    The number of entries counts all files and folders of both programs directories together.
+    The ratios are fractions of all folders or of all files respectively.
+    """
+    entries: int
+    depth: int
+    fan_out: int
+    folder_ratio: float = 0.15
+    single_item_folder_ratio: float = 0.3
+    duplicate_ratio: float = 0.1
+    broken_link_ratio: float = 0.1
+    folder_link_ratio: float = 0.03
+    other_file_ratio: float = 0.15
+
+
+PROFILES = {
+    "desktop": TreeProfile(entries=400, depth=2, fan_out=4),
+    "workstation": TreeProfile(entries=4_000, depth=3, fan_out=8),
+    "developer": TreeProfile(entries=20_000, depth=4, fan_out=12),
+    "terminal_server": TreeProfile(entries=100_000, depth=5, fan_out=16),
+}
+
+
+class GeneratedStartMenu(NamedTuple):
+    """The directories of a generated start menu and what they contain."""
+    start_menus: List[pathlib.Path]
+    programs: List[pathlib.Path]
+    counts: Dict[str, int]
+
+
+class _Generator:
+    """Creates the folders and files of one generated start menu."""
+    def __init__(self, directory: pathlib.Path, profile: TreeProfile, seed: int) -> None:
+        self._directory = directory
+        self._profile = profile
+        self._random = random.Random(seed)
+        self._targets = directory.joinpath("Targets")
+        self._target_files: List[pathlib.Path] = []
+        self._target_folders: List[pathlib.Path] = []
+        self._links: List[Tuple[pathlib.Path, pathlib.Path, str]] = []
+        self.counts = {"folders": 0, "single_item_folders": 0, "valid_links": 0, "broken_links": 0,
+                       "folder_links": 0, "name_duplicates": 0, "target_duplicates": 0, "other_files": 0}
+
+    def _product_name(self) -> str:
+        """Return a random product name."""
+        return f"{self._random.choice(_VENDORS)} {self._random.choice(_PRODUCTS)}"
+
+    def _create_targets(self, files: int) -> None:
+        """Create the files and folders that the valid shortcuts point to."""
+        for index in range(max(1, files // 4)):
+            target = self._targets.joinpath(f"Vendor {index % 50}", f"app{index}.exe")
+            target.parent.mkdir(parents=True, exist_ok=True)
+            target.write_bytes(b"")
+            self._target_files.append(target)
+        for index in range(max(1, files // 100)):
+            target = self._targets.joinpath("Folders", f"Folder {index}")
+            target.mkdir(parents=True)
+            self._target_folders.append(target)
+
+    def _create_folders(self, roots: List[pathlib.Path], folders: int) -> List[Tuple[pathlib.Path, bool]]:
+        """Create nested folders and return them together with whether they get a single item."""
+        created: List[Tuple[pathlib.Path, bool]] = []
+        level = [(root, 0) for root in roots]
+        while len(created) < folders and self._profile.depth > 0:
+            next_level = []
+            for parent, depth in level:
+                if depth >= self._profile.depth:
+                    continue
+                for _ in range(self._random.randint(1, self._profile.fan_out)):
+                    if len(created) >= folders:
+                        break
+                    folder = parent.joinpath(f"{self._product_name()} {len(created)}")
+                    folder.mkdir()
+                    single_item = self._random.random() < self._profile.single_item_folder_ratio
+                    created.append((folder, single_item))
+                    next_level.append((folder, depth + 1))
+            # Start over with more top level folders once all branches are as deep as allowed
+            level = next_level or [(root, 0) for root in roots]
+        self.counts["folders"] = len(created)
+        self.counts["single_item_folders"] = sum(single_item for _, single_item in created)
+        return created
+
+    def _write_file(self, folder: pathlib.Path, index: int) -> None:
+        """Write a random file into the folder."""
+        kind = self._random.random()
+        profile = self._profile
+        if kind < profile.duplicate_ratio and self._links:
+            link, target, arguments = self._random.choice(self._links)
+            if self._random.random() < 0.5:
+                name, kind_of_duplicate = link.name, "name_duplicates"
+            else:
+                name, kind_of_duplicate = f"{self._product_name()} {index}.lnk", "target_duplicates"
+            destination = folder.joinpath(name)
+            if not destination.exists():
+                write_shortcut(destination, target, arguments)
+                self.counts[kind_of_duplicate] += 1
+            return
+        kind -= profile.duplicate_ratio
+        name = f"{self._product_name()} {index}"
+        if kind < profile.broken_link_ratio:
+            write_shortcut(folder.joinpath(name + ".lnk"), self._targets.joinpath(f"missing{index}.exe"))
+            self.counts["broken_links"] += 1
+        elif kind < profile.broken_link_ratio + profile.folder_link_ratio:
+            write_shortcut(folder.joinpath(name + ".lnk"), self._random.choice(self._target_folders))
+            self.counts["folder_links"] += 1
+        elif kind < profile.broken_link_ratio + profile.folder_link_ratio + profile.other_file_ratio:
+            extra_name, extension = self._random.choice(_EXTRAS)
+            extra = folder.joinpath(f"{extra_name} {name}{extension}")
+            if extension == ".lnk":
+                write_shortcut(extra, self._random.choice(self._target_files), "/uninstall")
+            else:
+                extra.write_bytes(b"")
+            self.counts["other_files"] += 1
+        else:
+            target = self._random.choice(self._target_files)
+            arguments = f"--instance {index}"
+            link = folder.joinpath(name + ".lnk")
+            write_shortcut(link, target, arguments)
+            self._links.append((link, target, arguments))
+            self.counts["valid_links"] += 1
+
+    def generate(self) -> GeneratedStartMenu:
+        """Create the start menus of the current user and of all users."""
+        start_menus = [self._directory.joinpath(user, "Start Menu") for user in ("All Users", "Current User")]
+        programs = [start_menu.joinpath("Programs") for start_menu in start_menus]
+        for programs_directory in programs:
+            programs_directory.joinpath(_PROTECTED_FOLDER).mkdir(parents=True)
+
+        folders = int(self._profile.entries * self._profile.folder_ratio)
+        files = self._profile.entries - folders
+        self._create_targets(files)
+        created_folders = self._create_folders(programs, folders)
+
+        index = 0
+        for folder, single_item in created_folders:
+            if single_item:
+                self._write_file(folder, index)
+                index += 1
+        containers = programs + [folder for folder, single_item in created_folders if not single_item]
+        while index < files:
+            self._write_file(self._random.choice(containers), index)
+            index += 1
+        return GeneratedStartMenu(start_menus, programs, dict(self.counts))
+
+
+def generate(directory: pathlib.Path, profile: TreeProfile, seed: int = 0) -> GeneratedStartMenu:
+    """Generate a start menu of the current user and of all users inside the directory.
+
+    Valid shortcuts point to files and folders in a "Targets" directory next to the start
+    menus. The same seed always generates the same start menu.
+    """
+    return _Generator(directory, profile, seed).generate()
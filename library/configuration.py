@@ -1,9 +1,90 @@
 """Loads, edits and saves the configuration."""
 import configparser
+import hashlib
+import os
 import pathlib
-from typing import Optional, Union, List
+import types
+from typing import Dict, FrozenSet, List, Mapping, NamedTuple, Optional, Tuple, Type, TypeVar, Union, cast
 
 from library import constants
+from library.helpers.name_matcher import NameMatcher, SuffixMatcher
+
+Matcher = TypeVar("Matcher", NameMatcher, SuffixMatcher)
+Option = Union[bool, int, float, str]
+Stamp = Tuple[int, int]
+
+_DEFAULT_OPTIONS = {
+    "flatten_folders_containing_only_one_item_bool": "False",
+    "flatten_folders_list_type_str": "whitelist",
+    "delete_empty_folders_bool": "False",
+    "delete_links_to_folders_bool": "False",
+    "delete_duplicates_bool": "False",
+    "delete_duplicates_keep_str": "all users",
+    "delete_files_based_on_file_type_str": "in the list",
+    "delete_broken_links_bool": "False",
+    "watch_for_changes_bool": "False",
+    "time_between_scans_in_minutes_int": str(constants.TIME_BETWEEN_SCANS_IN_MINUTES),
+    "adaptive_scan_interval_bool": "True",
+    "incremental_scanning_bool": "True",
+    "shortcut_cache_size_int": "10000",
+    "shortcut_resolution_workers_int": "8",
+    "write_metrics_bool": "True",
+    "start_menu_workers_int": "4",
+    "parallel_traversal_bool": "False",
+    "journal_bool": "True",
+    "log_rotation_str": "size",
+    "log_maximum_size_in_kilobytes_int": "1024",
+    "log_backups_int": "5",
+    "json_log_bool": "False",
+    "history_bool": "True",
+    "history_retention_in_days_int": "365",
+    "time_budget_in_seconds_int": "0",
+    "reads_per_second_int": "0",
+    "changes_per_second_int": "0",
+    "first_cycle_delay_in_seconds_int": "0",
+    "low_priority_bool": "False",
+}
+
+
+def _parse_option(options: configparser.SectionProxy, key: str) -> Option:
+    """Return an option in the type that is given by the suffix of its key."""
+    option: Optional[Option]
+    if key.endswith("_bool"):
+        option = options.getboolean(key)
+    elif key.endswith("_int"):
+        option = options.getint(key)
+    elif key.endswith("_float"):
+        option = options.getfloat(key)
+    else:
+        option = options[key]
+    if option is None:
+        raise RuntimeError("Config value is None")
+    return option
+
+
+def _file_stamp(file_path: pathlib.Path) -> Stamp:
+    """Return the modification time and size of a file, which change whenever it is saved."""
+    try:
+        file_stat = os.stat(file_path)
+    except FileNotFoundError:
+        return 0, -1
+    return file_stat.st_mtime_ns, file_stat.st_size
+
+
+class ConfigurationSnapshot(NamedTuple):
+    """The saved configuration at one point in time with its options already parsed."""
+    stamps: Tuple[Stamp, ...]
+    fingerprint: str
+    options: Mapping[str, Option]
+    flatten_folders_exceptions_matcher: NameMatcher
+    flatten_folders_containing_one_file_exceptions: FrozenSet[str]
+    delete_files_with_names_containing_matcher: NameMatcher
+    delete_matching_file_types_matcher: SuffixMatcher
+    start_menus: Tuple[str, ...]
+
+    def get(self, key: str) -> Option:
+        """Get a value from the configuration in its correct type."""
+        return self.options[key]
 
 
 class Configuration:
@@ -24,12 +105,16 @@ class Configuration:
         self._delete_files_matching_file_types_list_path = configuration_directory.joinpath(
             "delete_based_on_file_type_list.txt"
         )
+        self._start_menus_path = configuration_directory.joinpath("start_menus.txt")
+        self._matchers: Dict[tuple, Tuple[Stamp, Union[NameMatcher, SuffixMatcher]]] = {}
+        self._snapshot: Optional[ConfigurationSnapshot] = None
 
         self.reload()
 
         if self._empty:
             self._create_new_config()
-        elif self._config["app_info"]["version"] != constants.VERSION_NUMBER:
+        elif (self._config["app_info"]["version"] != constants.VERSION_NUMBER or
+              not set(_DEFAULT_OPTIONS).issubset(self._config["options"])):
             self._migrate_config()
 
     def _create_new_config(self, options: Optional[dict] = None) -> None:
@@ -37,15 +122,7 @@ class Configuration:
         self._config["app_info"] = {
             "version": constants.VERSION_NUMBER
         }
-        self._config["options"] = {
-            "flatten_folders_containing_only_one_item_bool": "False",
-            "flatten_folders_list_type_str": "whitelist",
-            "delete_empty_folders_bool": "False",
-            "delete_links_to_folders_bool": "False",
-            "delete_duplicates_bool": "False",
-            "delete_files_based_on_file_type_str": "in the list",
-            "delete_broken_links_bool": "False",
-        }
+        self._config["options"] = dict(_DEFAULT_OPTIONS)
 
         if options:
             for key, value in options.items():
@@ -69,25 +146,72 @@ class Configuration:
         with open(self._configuration_file, "w", encoding="utf-8") as configfile:
             self._config.write(configfile)
 
-    def get(self, key: str) -> Union[bool, int, float, str]:
+    def get(self, key: str) -> Option:
         """Get a value from the configuration in its correct type."""
-        option: Union[bool, int, float, str, None]
-        if key.endswith("_bool"):
-            option = self._config["options"].getboolean(key)
-        elif key.endswith("_int"):
-            option = self._config["options"].getint(key)
-        elif key.endswith("_float"):
-            option = self._config["options"].getfloat(key)
-        else:
-            option = self._config["options"][key]
-        if option is None:
-            raise RuntimeError("Config value is None")
-        return option
+        return _parse_option(self._config["options"], key)
 
     def set(self, key: str, value: Union[bool, int, float, str]) -> None:
         """Set a value in the configuration."""
         self._config["options"][key] = str(value)
 
+    @property
+    def directory(self) -> pathlib.Path:
+        """Get the directory that contains the configuration files."""
+        return self._configuration_directory
+
+    @property
+    def _files(self) -> Tuple[pathlib.Path, ...]:
+        """Get all files that the saved configuration consists of."""
+        return (self._configuration_file,
+                self._flatten_folders_exception_path,
+                self._flatten_folders_with_one_item_exception_path,
+                self._delete_files_with_names_containing_list_path,
+                self._delete_files_matching_file_types_list_path,
+                self._start_menus_path)
+
+    def snapshot(self) -> ConfigurationSnapshot:
+        """Return the saved configuration as an immutable snapshot.
+
+        The snapshot is only read again when one of the configuration files changed and the
+        matchers are only rebuilt when their own list changed.
+        """
+        stamps = tuple(_file_stamp(file_path) for file_path in self._files)
+        if self._snapshot is not None and self._snapshot.stamps == stamps:
+            return self._snapshot
+
+        contents = [file_path.read_bytes() if stamp[1] >= 0 else b""
+                    for file_path, stamp in zip(self._files, stamps)]
+        fingerprint = hashlib.sha256()
+        for content in contents:
+            fingerprint.update(content)
+            fingerprint.update(b"\0")
+
+        config = configparser.ConfigParser()
+        config.read_dict({"options": _DEFAULT_OPTIONS})
+        config.read_string(contents[0].decode("utf-8"))
+        options = {key: _parse_option(config["options"], key) for key in config["options"]}
+
+        lists = [content.decode("utf-8").splitlines() for content in contents[1:]]
+        self._snapshot = ConfigurationSnapshot(
+            stamps=stamps,
+            fingerprint=fingerprint.hexdigest(),
+            options=types.MappingProxyType(options),
+            flatten_folders_exceptions_matcher=self._get_matcher(
+                self._flatten_folders_exception_path, stamps[1], lists[0], NameMatcher, ignore_case=False
+            ),
+            flatten_folders_containing_one_file_exceptions=frozenset(lists[1]),
+            delete_files_with_names_containing_matcher=self._get_matcher(
+                self._delete_files_with_names_containing_list_path, stamps[3], lists[2], NameMatcher,
+                ignore_case=True
+            ),
+            delete_matching_file_types_matcher=self._get_matcher(
+                self._delete_files_matching_file_types_list_path, stamps[4], lists[3], SuffixMatcher,
+                ignore_case=True
+            ),
+            start_menus=tuple(line for line in lists[4] if line.strip()),
+        )
+        return self._snapshot
+
     @property
     def _empty(self) -> bool:
         return not self._config.sections()
@@ -109,6 +233,23 @@ class Configuration:
             for string in strings:
                 file.write(string + "\n")
 
+    def _get_matcher(
+            self,
+            file_path: pathlib.Path,
+            stamp: Stamp,
+            strings: List[str],
+            matcher_type: Type[Matcher],
+            ignore_case: bool
+    ) -> Matcher:
+        """Return a matcher for the list in the file that is only rebuilt when the file changes."""
+        key = (file_path, matcher_type, ignore_case)
+        cached = self._matchers.get(key)
+        if cached is not None and cached[0] == stamp:
+            return cast(Matcher, cached[1])
+        matcher = matcher_type(strings, ignore_case)
+        self._matchers[key] = (stamp, matcher)
+        return matcher
+
     @property
     def flatten_folders_exceptions(self) -> List[str]:
         """Get list of exceptions for flattening folders."""
@@ -148,3 +289,13 @@ class Configuration:
     def delete_matching_file_types_exceptions(self, exceptions: List[str]) -> None:
         """Set list of exceptions for deleting files (not) matching certain file types."""
         self._save_list_to_file(self._delete_files_matching_file_types_list_path, exceptions)
+
+    @property
+    def start_menus(self) -> List[str]:
+        """Get list of additional start menu directories or glob patterns matching them."""
+        return self._get_list_from_file(self._start_menus_path)
+
+    @start_menus.setter
+    def start_menus(self, start_menus: List[str]) -> None:
+        """Set list of additional start menu directories or glob patterns matching them."""
+        self._save_list_to_file(self._start_menus_path, start_menus)
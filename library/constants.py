@@ -7,23 +7,36 @@ ICON_FILE_NAME = "icon.ico"
 DOCUMENTATION_URL = "https://github.com/jarikmarwede/Start-Menu-Helper?tab=readme-ov-file#how-to-use"
 ISSUE_TRACKER_URL = "https://github.com/jarikmarwede/Start-Menu-Helper/issues"
 TIME_BETWEEN_SCANS_IN_MINUTES = 5
-APP_DATA_PATH = pathlib.WindowsPath.home().joinpath("AppData")
+MINIMUM_ADAPTIVE_SCAN_INTERVAL_FACTOR = 0.25
+MAXIMUM_ADAPTIVE_SCAN_INTERVAL_FACTOR = 8
+SCAN_INTERVAL_JITTER = 0.1
+WATCHER_POLLING_INTERVAL_IN_SECONDS = 10
+WATCHER_SETTLE_TIME_IN_SECONDS = 2
+FULL_SCAN_INTERVAL_IN_HOURS = 24
+APP_DATA_PATH = pathlib.Path.home().joinpath("AppData")
 DEFAULT_CONFIGURATION_PATH = APP_DATA_PATH.joinpath("Roaming").joinpath(PROGRAM_NAME)
 LOG_FILE_NAME = "log.txt"
-STARTUP_PATH = pathlib.WindowsPath.home().drive + \
+MANIFEST_FILE_NAME = "manifest.json"
+SHORTCUT_CACHE_FILE_NAME = "shortcut_cache.json"
+METRICS_FILE_NAME = "metrics.json"
+PROMETHEUS_METRICS_FILE_NAME = "metrics.prom"
+TASK_BAR_ICON_REFRESH_INTERVAL_IN_SECONDS = 10
+JOURNAL_FILE_NAME = "journal.jsonl"
+JOURNAL_GROUP_COMMIT_SIZE = 64
+JOURNAL_MAXIMUM_STORED_FILE_SIZE_IN_BYTES = 64 * 1024
+JOURNAL_MAXIMUM_SIZE_IN_BYTES = 4 * 1024 * 1024
+HISTORY_FILE_NAME = "history.sqlite3"
+CURSOR_FILE_NAME = "cursor.json"
+TARGET_LISTING_TIME_TO_LIVE_IN_SECONDS = 60
+STARTUP_PATH = pathlib.Path.home().drive + \
                "\\ProgramData\\Microsoft\\Windows\\Start Menu\\Programs\\Startup"
-EXECUTABLE_PATH = pathlib.WindowsPath.cwd().joinpath(PROGRAM_NAME + ".exe")
+EXECUTABLE_PATH = pathlib.Path.cwd().joinpath(PROGRAM_NAME + ".exe")
 START_MENU_PATHS = [
-    pathlib.WindowsPath(
-        pathlib.WindowsPath.home().drive + "/ProgramData/Microsoft/Windows/Start Menu"
+    pathlib.Path(
+        pathlib.Path.home().drive + "/ProgramData/Microsoft/Windows/Start Menu"
     ),
     APP_DATA_PATH.joinpath("Roaming/Microsoft/Windows/Start Menu")
 ]
-START_MENU_PROGRAMS_PATHS = [
-    pathlib.WindowsPath(
-        pathlib.WindowsPath.home().drive + "/ProgramData/Microsoft/Windows/Start Menu/Programs"),
-    APP_DATA_PATH.joinpath("Roaming/Microsoft/Windows/Start Menu/Programs")
-]
 PROTECTED_FOLDERS = [
     "StartUp",
     "Startup",
@@ -27,11 +27,13 @@ class MainFrame(wx.Frame):
                             type=wx.BITMAP_TYPE_ICO)
         self.SetIcon(self.icon)
 
-        self.task_bar_icon = TaskBarIcon(self.stop_scanning)
-
         self.config = configuration.Configuration(configuration_directory)
         self.start_menu_helper = start_menu_helper.StartMenuHelper(self.config)
 
+        self.task_bar_icon = TaskBarIcon(self.stop_scanning, self.start_menu_helper.scan_now)
+        self.task_bar_icon_timer = wx.Timer(self)
+        self.Bind(wx.EVT_TIMER, lambda _: self.update_task_bar_icon(), self.task_bar_icon_timer)
+
         # Widgets
         main_menu = MainMenu(self, configuration_directory)
         self.SetMenuBar(main_menu)
@@ -255,9 +257,15 @@ class MainFrame(wx.Frame):
         self.task_bar_icon.show()
         self.save_config()
         self.start_menu_helper.start_cleaning()
+        self.task_bar_icon_timer.Start(constants.TASK_BAR_ICON_REFRESH_INTERVAL_IN_SECONDS * 1000)
+
+    def update_task_bar_icon(self) -> None:
+        """Show a summary of the last scan in the tooltip of the taskbar icon."""
+        self.task_bar_icon.set_tooltip(self.start_menu_helper.metrics.summary())
 
     def stop_scanning(self) -> None:
         """Stop scanning and show GUI."""
+        self.task_bar_icon_timer.Stop()
         self.task_bar_icon.hide()
         self.Show()
         self.start_menu_helper.stop_cleaning()
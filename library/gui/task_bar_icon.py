@@ -10,16 +10,18 @@ from library.helpers import pyinstaller_asset
 
 class TaskBarIcon(wx.adv.TaskBarIcon):
     """Icon that appears in the windows taskbar when cleaning in background."""
-    def __init__(self, open_callback: typing.Callable):
+    def __init__(self, open_callback: typing.Callable, scan_now_callback: typing.Callable):
         super().__init__()
 
         self._open_callback = open_callback
+        self._scan_now_callback = scan_now_callback
 
         self._icon = wx.Icon(name=pyinstaller_asset.asset_path(constants.ICON_FILE_NAME),
                              type=wx.BITMAP_TYPE_ICO)
 
         self._task_bar_menu = wx.Menu()
         self._task_bar_menu.Append(wx.ID_OPEN, "Open")
+        self._task_bar_menu.Append(wx.ID_REFRESH, "Scan now")
         self._task_bar_menu.Append(wx.ID_CLOSE, "Close")
         self._task_bar_menu.Bind(wx.EVT_MENU, self._on_menu_select)
 
@@ -35,6 +37,8 @@ class TaskBarIcon(wx.adv.TaskBarIcon):
         event_id = event.GetId()
         if event_id == wx.ID_OPEN:
             self._open_callback()
+        elif event_id == wx.ID_REFRESH:
+            self._scan_now_callback()
         elif event_id == wx.ID_CLOSE:
             wx.Exit()
 
@@ -42,6 +46,11 @@ class TaskBarIcon(wx.adv.TaskBarIcon):
         """Show the icon in the taskbar."""
         self.SetIcon(self._icon, "Start-menu helper")
 
+    def set_tooltip(self, text: str) -> None:
+        """Show the text when hovering over the icon in the taskbar."""
+        if self.IsIconInstalled():
+            self.SetIcon(self._icon, f"Start-menu helper\n{text}")
+
     def hide(self) -> None:
         """Hide the icon from the taskbar."""
         self.RemoveIcon()
@@ -0,0 +1,43 @@
+"""Stop cleaning cycles in the middle when the cleaning is stopped or a cycle takes too long."""
+import time
+from typing import Callable, Optional
+
+
+class CycleCancelled(Exception):
+    """Raised at a checkpoint when the cleaning was stopped in the middle of a cycle."""
+
+
+class Checkpoint:
+    """Decides at the checkpoints of a cycle whether it has to stop.
+
+    The cycle is cancelled as soon as stopped returns True. With a time budget in seconds,
+    over_budget tells when the cycle took longer than its budget, so that it can leave the
+    rest of its work to the next cycle. Only the resolution of links asks for the budget,
+    because it is the only work that can resume from a cursor and whose time depends on other
+    drives, so the budget is started again when the resolution begins. The rules that follow
+    it and the execution of the plan always run to the end.
+    """
+    def __init__(self, stopped: Callable[[], bool] = lambda: False, time_budget: float = 0,
+                 clock: Callable[[], float] = time.monotonic) -> None:
+        self._stopped = stopped
+        self._clock = clock
+        self._time_budget = time_budget
+        self._deadline: Optional[float] = None
+        self.start_budget()
+
+    def start_budget(self) -> None:
+        """Start the time budget from now on, e.g. once the work that may run out of it begins."""
+        self._deadline = self._clock() + self._time_budget if self._time_budget > 0 else None
+
+    def stopped(self) -> bool:
+        """Return whether the cycle has to stop."""
+        return self._stopped()
+
+    def check(self) -> None:
+        """Raise CycleCancelled if the cycle has to stop."""
+        if self._stopped():
+            raise CycleCancelled()
+
+    def over_budget(self) -> bool:
+        """Return whether the cycle took longer than its time budget."""
+        return self._deadline is not None and self._clock() >= self._deadline
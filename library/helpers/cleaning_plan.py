@@ -0,0 +1,355 @@
+"""Plan the changes of a cleaning cycle before applying them to the file system."""
+import base64
+import concurrent.futures
+import logging
+import os
+import pathlib
+from typing import Callable, Dict, List, NamedTuple, Optional, Sequence, Set, Tuple
+
+from library import constants
+from library.helpers.operation_journal import MOVE, RMDIR, UNLINK, OperationJournal, RecordedOperation
+from library.helpers.tree_snapshot import DIRECTORY, FILE, Entry, RootEntry, TreeSnapshot
+
+_UNLINK_SUPPORTS_DIRECTORY = os.unlink in os.supports_dir_fd
+
+
+class Operation(NamedTuple):
+    """A single planned change to the file system.
+
+    The message is formatted with the path of the entry, for moves followed by the
+    destination directory, and then the arguments. The rule is the name of the rule that
+    planned the operation.
+    """
+    kind: str
+    entry: Entry
+    parent: Optional[Entry]
+    destination: Optional[Entry]
+    replaces: bool
+    path: pathlib.Path
+    destination_path: Optional[pathlib.Path]
+    message: str
+    arguments: Tuple[object, ...]
+    rule: str = ""
+
+    def describe(self, path: object = None, destination_path: object = None) -> str:
+        """Return the message of the operation with the given paths or the ones it was planned with."""
+        path = path or self.path
+        destination_path = destination_path or self.destination_path
+        paths = (path,) if destination_path is None else (path, destination_path)
+        return self.message % (*paths, *self.arguments)
+
+
+class _Execution:
+    """The operations of the last execution of a plan and which of them were applied or left out."""
+    def __init__(self, operations: List[Operation], journal: Optional[OperationJournal],
+                 stopped: Callable[[], bool], throttle: Callable[[], None]) -> None:
+        self.operations = operations
+        self.journal = journal
+        self.stopped = stopped
+        self.throttle = throttle
+        self.recorded_operations: Optional[List[RecordedOperation]] = None
+        self.applied: Set[int] = set()
+        self.left_out: Set[int] = set()
+
+
+class CleaningPlan:
+    """An ordered list of operations that are planned on a TreeSnapshot.
+
+    Every operation is applied to the snapshot right away, so that the rules that are planned
+    later see the state that the earlier operations leave behind. Nothing is changed on the
+    file system until execute() is called. Operations are labelled with the name of the rule
+    that is set in the rule attribute while they are planned.
+    """
+    def __init__(self, tree: TreeSnapshot) -> None:
+        self._tree = tree
+        self.operations: List[Operation] = []
+        self.rule = ""
+        self.failed = 0
+        self._original_parents: Dict[Entry, Optional[Entry]] = {}
+        self._execution = _Execution([], None, lambda: False, lambda: None)
+
+    def __len__(self) -> int:
+        return len(self.operations)
+
+    def _add(self, kind: str, entry: Entry, destination: Optional[Entry], message: str,
+             arguments: Tuple[object, ...]) -> None:
+        """Add an operation and remember where its entry was before the plan moved it."""
+        self._original_parents.setdefault(entry, entry.parent)
+        replaced = None
+        if destination is not None and destination.children is not None:
+            replaced = destination.children.get(os.path.normcase(entry.name))
+            if replaced is not None:
+                self._original_parents.setdefault(replaced, replaced.parent)
+        self.operations.append(Operation(
+            kind=kind,
+            entry=entry,
+            parent=entry.parent,
+            destination=destination,
+            replaces=replaced is not None,
+            path=entry.path,
+            destination_path=None if destination is None else destination.path,
+            message=message,
+            arguments=arguments,
+            rule=self.rule,
+        ))
+
+    def move(self, entry: Entry, destination: Entry, message: str, *arguments: object) -> None:
+        """Plan to move the entry into the destination directory."""
+        self._add(MOVE, entry, destination, message, arguments)
+        self._tree.move(entry, destination)
+
+    def unlink(self, file: Entry, message: str, *arguments: object) -> None:
+        """Plan to delete a file."""
+        self._add(UNLINK, file, None, message, arguments)
+        self._tree.remove(file)
+
+    def rmdir(self, directory: Entry, message: str, *arguments: object) -> None:
+        """Plan to delete an empty directory."""
+        self._add(RMDIR, directory, None, message, arguments)
+        self._tree.remove(directory)
+
+    def _redundant_operations(self) -> Set[int]:
+        """Return the indices of the moves that are made redundant by later operations.
+
+        A move is redundant if its entry is moved again or deleted later on, unless it replaces
+        another entry in its destination or the directory that the entry would stay in without
+        the move is deleted in between.
+        """
+        redundant = set()
+        last_moves: Dict[Entry, int] = {}
+        sources: Dict[Entry, Optional[Entry]] = {}
+        for index, operation in enumerate(self.operations):
+            if operation.kind == RMDIR:
+                for entry in [entry for entry, source in sources.items() if source is operation.entry]:
+                    del sources[entry]
+                    last_moves.pop(entry, None)
+            last_move = last_moves.pop(operation.entry, None)
+            if last_move is not None and not self.operations[last_move].replaces:
+                redundant.add(last_move)
+            else:
+                sources[operation.entry] = operation.parent
+            if operation.kind == MOVE:
+                last_moves[operation.entry] = index
+            else:
+                sources.pop(operation.entry, None)
+        return redundant
+
+    @staticmethod
+    def _root(entry: Entry, parents: Dict[Entry, Optional[Entry]]) -> RootEntry:
+        """Return the root that the entry was in before the plan is executed."""
+        while not isinstance(entry, RootEntry):
+            parent = parents[entry] if entry in parents else entry.parent
+            if parent is None:
+                raise ValueError(f"{entry.name} is no longer part of the snapshot")
+            entry = parent
+        return entry
+
+    @staticmethod
+    def _location(entry: Entry, parents: Dict[Entry, Optional[Entry]]) -> str:
+        """Return where the entry currently is on the file system while the plan is executed."""
+        names = []
+        while not isinstance(entry, RootEntry):
+            names.append(entry.name)
+            parent = parents[entry] if entry in parents else entry.parent
+            if parent is None:
+                raise ValueError(f"{entry.name} is no longer part of the snapshot")
+            entry = parent
+        return os.path.join(entry.location, *reversed(names))
+
+    def execute(self, workers: int = 1, journal: Optional[OperationJournal] = None,
+                stopped: Callable[[], bool] = lambda: False,
+                throttle: Callable[[], None] = lambda: None) -> Tuple[int, int]:
+        """Apply the plan to the file system and return how many operations were applied and skipped.
+
+        Redundant moves are skipped and consecutive deletions of files are grouped by their
+        directory. Operations that fail are logged, skipped and counted in the failed attribute.
+        No operation moves an entry from one root to another except into the owner of the root,
+        so with more than one worker the operations of different owners are applied concurrently.
+        With a journal the operations are recorded before they are applied and every applied
+        operation is recorded afterwards. Once stopped returns True, the operations that are left
+        are not applied and are neither failed nor part of the results. The throttle is called
+        before every operation and may wait to slow the execution down.
+        """
+        redundant = self._redundant_operations()
+        parents = dict(self._original_parents)
+        operations = [operation for index, operation in enumerate(self.operations) if index not in redundant]
+        self._execution = _Execution(operations, journal if operations else None, stopped, throttle)
+        if self._execution.journal is not None:
+            self._execution.recorded_operations = self._recorded_operations(operations, parents)
+            self._execution.journal.begin(self._execution.recorded_operations)
+        roots: Dict[RootEntry, List[Tuple[int, Operation]]] = {}
+        for index, operation in enumerate(operations):
+            roots.setdefault(self._root(operation.entry, parents).owner, []).append((index, operation))
+        try:
+            if workers > 1 and len(roots) > 1:
+                with concurrent.futures.ThreadPoolExecutor(min(workers, len(roots))) as executor:
+                    applied = sum(executor.map(lambda root_operations: self._apply_all(root_operations, parents),
+                                               roots.values()))
+            else:
+                applied = sum(self._apply_all(root_operations, parents) for root_operations in roots.values())
+        finally:
+            if self._execution.journal is not None:
+                self._execution.journal.commit()
+        self.failed = len(operations) - len(self._execution.left_out) - applied
+        return applied, len(self.operations) - applied
+
+    def results(self) -> List[Tuple[Operation, RecordedOperation, bool]]:
+        """Return the executed operations with the paths they were applied to and whether they were applied."""
+        execution = self._execution
+        if execution.recorded_operations is None:
+            execution.recorded_operations = self._recorded_operations(
+                execution.operations, self._original_parents, False
+            )
+        return [(operation, recorded_operation, index in execution.applied)
+                for index, (operation, recorded_operation)
+                in enumerate(zip(execution.operations, execution.recorded_operations))
+                if index not in execution.left_out]
+
+    def _recorded_operations(self, operations: List[Operation], parents: Dict[Entry, Optional[Entry]],
+                             contents: bool = True) -> List[RecordedOperation]:
+        """Return the operations with the paths they will be applied to if all of them succeed.
+
+        With contents the size and modification time of the files and the content of small
+        files that are deleted are recorded as well. They are read where the files are before
+        the plan is executed, which does not change them.
+        """
+        original_parents = parents
+        parents = dict(parents)
+        recorded_operations = []
+        for operation in operations:
+            path = self._location(operation.entry, parents)
+            destination = None
+            if operation.kind == MOVE and operation.destination is not None:
+                destination = self._location(operation.destination, parents)
+                parents[operation.entry] = operation.destination
+            if not contents or operation.entry.kind == DIRECTORY:
+                recorded_operations.append(RecordedOperation(operation.kind, path, destination))
+                continue
+            original_path = self._location(operation.entry, original_parents)
+            try:
+                file_stat = os.lstat(original_path)
+            except OSError:
+                recorded_operations.append(RecordedOperation(operation.kind, path, destination))
+                continue
+            recorded_operations.append(RecordedOperation(
+                operation.kind,
+                path,
+                destination,
+                _content(operation, original_path),
+                file_stat.st_size,
+                file_stat.st_mtime_ns
+            ))
+        return recorded_operations
+
+    def _applied(self, index: int) -> int:
+        """Record that the operation with the index was applied and return 1."""
+        self._execution.applied.add(index)
+        if self._execution.journal is not None:
+            self._execution.journal.applied(index)
+        return 1
+
+    def _leave_out(self, operations: Sequence[Tuple[int, Operation]]) -> None:
+        """Record that the operations are not applied because the execution was stopped."""
+        self._execution.left_out.update(index for index, _ in operations)
+
+    def _may_continue(self) -> bool:
+        """Wait for the throttle and return whether the next operation may be applied."""
+        self._execution.throttle()
+        return not self._execution.stopped()
+
+    def _apply_all(self, operations: List[Tuple[int, Operation]], parents: Dict[Entry, Optional[Entry]]) -> int:
+        """Apply the operations in their order until the execution is stopped and return how many were applied."""
+        applied = 0
+        position = 0
+        while position < len(operations):
+            if operations[position][1].kind == UNLINK:
+                end = position
+                while end < len(operations) and operations[end][1].kind == UNLINK:
+                    end += 1
+                applied += self._unlink_all(operations[position:end], parents)
+                position = end
+                continue
+            if not self._may_continue():
+                self._leave_out(operations[position:])
+                break
+            index, operation = operations[position]
+            if self._apply(operation, parents):
+                applied += self._applied(index)
+            position += 1
+        return applied
+
+    def _apply(self, operation: Operation, parents: Dict[Entry, Optional[Entry]]) -> int:
+        """Apply a move or the deletion of a directory and return whether it succeeded."""
+        path = self._location(operation.entry, parents)
+        try:
+            if operation.kind == MOVE and operation.destination is not None:
+                destination = self._location(operation.destination, parents)
+                os.replace(path, os.path.join(destination, operation.entry.name))
+                parents[operation.entry] = operation.destination
+                logging.info(operation.message, path, destination, *operation.arguments)
+            else:
+                os.rmdir(path)
+                logging.info(operation.message, path, *operation.arguments)
+        except OSError as error:
+            logging.warning("Could not apply \"%s\" to %s: %s", operation.kind, path, error)
+            return 0
+        return 1
+
+    def _unlink_all(self, operations: List[Tuple[int, Operation]], parents: Dict[Entry, Optional[Entry]]) -> int:
+        """Delete the files grouped by their directory and return how many were deleted."""
+        directories: Dict[str, List[Tuple[int, Operation]]] = {}
+        for index, operation in operations:
+            directory = os.path.dirname(self._location(operation.entry, parents))
+            directories.setdefault(directory, []).append((index, operation))
+
+        deleted = 0
+        for directory, directory_operations in directories.items():
+            directory_descriptor = _open_directory(directory)
+            try:
+                for position, (index, operation) in enumerate(directory_operations):
+                    if not self._may_continue():
+                        self._leave_out(directory_operations[position:])
+                        break
+                    if _unlink(directory, directory_descriptor, operation):
+                        deleted += self._applied(index)
+            finally:
+                if directory_descriptor is not None:
+                    os.close(directory_descriptor)
+        return deleted
+
+
+def _content(operation: Operation, path: str) -> Optional[str]:
+    """Return the base64 encoded content of a small file that the operation deletes."""
+    if (operation.kind != UNLINK or operation.entry.kind != FILE or
+            operation.entry.size > constants.JOURNAL_MAXIMUM_STORED_FILE_SIZE_IN_BYTES):
+        return None
+    try:
+        with open(path, "rb") as file:
+            return base64.b64encode(file.read()).decode("ascii")
+    except OSError:
+        return None
+
+
+def _open_directory(directory: str) -> Optional[int]:
+    """Return a descriptor of the directory if files can be deleted relative to it."""
+    if not _UNLINK_SUPPORTS_DIRECTORY:
+        return None
+    try:
+        return os.open(directory, os.O_RDONLY)
+    except OSError:
+        return None
+
+
+def _unlink(directory: str, directory_descriptor: Optional[int], operation: Operation) -> int:
+    """Delete the file of the operation from the directory and return whether it succeeded."""
+    path = os.path.join(directory, operation.entry.name)
+    try:
+        if directory_descriptor is None:
+            os.unlink(path)
+        else:
+            os.unlink(operation.entry.name, dir_fd=directory_descriptor)
+    except OSError as error:
+        logging.warning("Could not delete %s: %s", path, error)
+        return 0
+    logging.info(operation.message, path, *operation.arguments)
+    return 1
@@ -0,0 +1,65 @@
+"""Remember the contents of directories between cleaning cycles."""
+import json
+import logging
+import os
+import pathlib
+from typing import Dict, List, Optional, Tuple
+
+Item = Tuple[str, int, int, int]
+
+_FORMAT_VERSION = 2
+
+
+class DirectoryManifest:
+    """The modification time and the items of every directory of the last cycle.
+
+    A directory whose modification time did not change since it was recorded still contains the
+    same items, so it does not have to be listed again. The modification time is the only thing
+    that is compared, because adding, removing or renaming an item always changes it.
+    """
+    def __init__(self, file: pathlib.Path) -> None:
+        self._file = file
+        self._directories: Dict[str, Tuple[int, List[Item]]] = {}
+        self.fingerprint = ""
+        self.full_scan_time = 0.0
+        self._load()
+
+    def _load(self) -> None:
+        """Load the manifest from its file or start with an empty one."""
+        try:
+            with open(self._file, encoding="utf-8") as file:
+                data = json.load(file)
+            if data["version"] != _FORMAT_VERSION:
+                raise ValueError(f"Unknown manifest version {data['version']}")
+            self._directories = {
+                path: (modification_time, [tuple(item) for item in items])
+                for path, (modification_time, items) in data["directories"].items()
+            }
+            self.fingerprint = data["fingerprint"]
+            self.full_scan_time = data["full_scan_time"]
+        except FileNotFoundError:
+            logging.debug("No directory manifest found, doing a full scan")
+        except (OSError, KeyError, TypeError, ValueError):
+            logging.warning("Directory manifest is corrupt, doing a full scan")
+            self._directories = {}
+
+    def lookup(self, path: str, modification_time: int) -> Optional[List[Item]]:
+        """Return the recorded items of the directory if it did not change."""
+        recorded = self._directories.get(path)
+        if recorded is None:
+            return None
+        recorded_modification_time, items = recorded
+        return items if recorded_modification_time == modification_time else None
+
+    def save(self, directories: Dict[str, Tuple[int, List[Item]]]) -> None:
+        """Replace the recorded directories and save the manifest to its file."""
+        self._directories = dict(directories)
+        temporary_file = self._file.with_name(self._file.name + ".tmp")
+        with open(temporary_file, "w", encoding="utf-8") as file:
+            json.dump({
+                "version": _FORMAT_VERSION,
+                "fingerprint": self.fingerprint,
+                "full_scan_time": self.full_scan_time,
+                "directories": self._directories
+            }, file)
+        os.replace(temporary_file, self._file)
@@ -1,56 +1,104 @@
 """Helper functions for file system operations."""
+import collections
+import concurrent.futures
 import ctypes
+import os
 import pathlib
-from typing import List
+import stat
+import sys
+from typing import Callable, Deque, Iterable, Iterator, NamedTuple, Optional, Tuple, TypeVar
 
-from library.helpers import windows_shortcuts
+T = TypeVar("T")
 
 
-def get_nested_directories(directory: pathlib.WindowsPath) -> List[pathlib.WindowsPath]:
-    """Return all directories inside directory recursively."""
-    nested_directories: List[pathlib.WindowsPath] = []
-    for item in directory.iterdir():
-        if item.is_dir():
-            nested_directories.append(item)
-            nested_directories.extend(get_nested_directories(item))
-    return nested_directories
+def walk(
+        directory: pathlib.Path,
+        prune: Optional[Callable[[os.DirEntry], bool]] = None
+) -> Iterator[os.DirEntry]:
+    """Iterate over all items inside directory and its child directories in pre-order.
 
+    The items are yielded while the directories are read, so the type information of the
+    os.DirEntry objects can be used without calling stat again. Directories for which prune
+    returns True are yielded but not descended into. Symbolic links to directories are not
+    followed. Only one open directory listing per level of the tree is kept in memory.
+    """
+    pending = [os.scandir(directory)]
+    try:
+        while pending:
+            item = next(pending[-1], None)
+            if item is None:
+                pending.pop().close()
+                continue
+            yield item
+            if item.is_dir(follow_symlinks=False) and not (prune and prune(item)):
+                pending.append(os.scandir(item.path))
+    finally:
+        for listing in pending:
+            listing.close()
 
-def get_nested_files(directory: pathlib.WindowsPath) -> List[pathlib.WindowsPath]:
-    """Return all files inside directory and its child directories."""
-    files = [item for item in directory.iterdir() if item.is_file()]
 
-    for current_directory in get_nested_directories(directory):
-        for item in current_directory.iterdir():
-            if item.is_file():
-                files.append(item)
-    return files
+class LinkTarget(NamedTuple):
+    """The target of a link and whether it exists.
 
+    Targets that could not be checked, e.g. because their drive can not be reached, are not
+    known and neither exist nor are missing.
+    """
+    path: pathlib.Path
+    exists: bool
+    is_dir: bool
+    known: bool = True
 
-def get_nested_links(directory: pathlib.WindowsPath) -> List[pathlib.WindowsPath]:
-    """Return all links inside directory and its child directories."""
-    links = [item for item in directory.iterdir() if
-             item.is_symlink() or windows_shortcuts.is_shortcut(item)]
 
-    for current_directory in get_nested_directories(directory):
-        for item in current_directory.iterdir():
-            if item.is_symlink() or windows_shortcuts.is_shortcut(item):
-                links.append(item)
-    return links
+def stat_target(target: pathlib.Path) -> LinkTarget:
+    """Return whether the target exists and whether it is a directory.
 
+    Only targets whose path does not exist are missing, the target is unknown if reading its
+    metadata failed for any other reason.
+    """
+    try:
+        target_stat = os.stat(target)
+    except (FileNotFoundError, NotADirectoryError, ValueError):
+        return LinkTarget(target, False, False)
+    except OSError:
+        return LinkTarget(target, False, False, known=False)
+    return LinkTarget(target, True, stat.S_ISDIR(target_stat.st_mode))
 
-def resolve_files(files: List[pathlib.WindowsPath]) -> List[pathlib.WindowsPath]:
-    """Resolve multiple files."""
-    resolved_files = []
-    for file in files:
-        if windows_shortcuts.is_shortcut(file):
-            resolved_files.append(windows_shortcuts.read_shortcut(file))
-        else:
-            resolved_files.append(file.resolve())
-    return resolved_files
 
+def resolve_links(
+        links: Iterable[T],
+        read_target: Callable[[T], pathlib.Path],
+        max_workers: int,
+        check_target: Callable[[pathlib.Path], LinkTarget] = stat_target
+) -> Iterator[Tuple[T, LinkTarget]]:
+    """Resolve links and check their targets on a pool of threads.
 
-def file_is_writable(file: pathlib.WindowsPath) -> bool:
+    The links are yielded together with their targets in the order they were given, as soon as
+    they are resolved. At most two links per worker are resolved ahead of the consumer, so slow
+    network drives do not block each other while the memory usage stays bounded. If the
+    consumer stops early, e.g. because the cycle was cancelled, the links that were not
+    started yet are dropped and the ones that are being resolved are not waited for.
+    """
+    def resolve(link: T) -> LinkTarget:
+        return check_target(read_target(link))
+
+    executor = concurrent.futures.ThreadPoolExecutor(max_workers=max_workers)
+    try:
+        pending: Deque[Tuple[T, concurrent.futures.Future]] = collections.deque()
+        for link in links:
+            pending.append((link, executor.submit(resolve, link)))
+            if len(pending) >= max_workers * 2:
+                next_link, future = pending.popleft()
+                yield next_link, future.result()
+        while pending:
+            next_link, future = pending.popleft()
+            yield next_link, future.result()
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
+def file_is_writable(file: pathlib.Path) -> bool:
     """Return whether the file is writable."""
+    if sys.platform != "win32":
+        return os.access(file, os.W_OK)
     file_attributes = ctypes.windll.kernel32.GetFileAttributesW(str(file))
     return not file_attributes & 0x01
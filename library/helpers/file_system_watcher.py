@@ -0,0 +1,242 @@
+"""Get notified about changes inside directory trees."""
+import ctypes
+import ctypes.util
+import os
+import pathlib
+import select
+import struct
+import sys
+import threading
+import time
+from abc import ABC, abstractmethod
+from typing import Any, Dict, Iterator, List, Sequence, Tuple
+
+from library.helpers.file_system import walk
+
+
+class FileSystemWatcher(ABC):
+    """Watches directory trees for added, removed, renamed or changed items."""
+    def __init__(self, directories: Sequence[pathlib.Path]) -> None:
+        self._directories = directories
+
+    @property
+    def directories(self) -> List[pathlib.Path]:
+        """Get the directories that are watched."""
+        return list(self._directories)
+
+    @abstractmethod
+    def wait(self, timeout: float) -> bool:
+        """Wait until something changed or the timeout in seconds passed.
+
+        Return whether something changed since the last call of wait() or clear().
+        """
+
+    def clear(self) -> None:
+        """Forget all changes that happened until now."""
+        self.wait(0)
+
+    def close(self) -> None:
+        """Stop watching the directories."""
+
+
+class PollingWatcher(FileSystemWatcher):
+    """Detects changes by comparing the modification times of all directories."""
+    def __init__(self, directories: Sequence[pathlib.Path], interval: float) -> None:
+        super().__init__(directories)
+        self._interval = interval
+        self._modification_times = self._read_modification_times()
+        self._next_poll = time.monotonic() + interval
+
+    def _read_modification_times(self) -> Dict[str, int]:
+        """Return the modification times of all directories that are watched."""
+        modification_times = {}
+        for directory in self._directories:
+            if not directory.exists():
+                continue
+            modification_times[os.fspath(directory)] = directory.stat().st_mtime_ns
+            for item in walk(directory):
+                if item.is_dir(follow_symlinks=False):
+                    modification_times[item.path] = item.stat(follow_symlinks=False).st_mtime_ns
+        return modification_times
+
+    def wait(self, timeout: float) -> bool:
+        deadline = time.monotonic() + timeout
+        while True:
+            now = time.monotonic()
+            if now >= self._next_poll:
+                self._next_poll = now + self._interval
+                modification_times = self._read_modification_times()
+                if modification_times != self._modification_times:
+                    self._modification_times = modification_times
+                    return True
+            if now >= deadline:
+                return False
+            time.sleep(min(self._next_poll, deadline) - now)
+
+    def clear(self) -> None:
+        self._modification_times = self._read_modification_times()
+        self._next_poll = time.monotonic() + self._interval
+
+
+class InotifyWatcher(FileSystemWatcher):
+    """Uses inotify on Linux to get notified about changes."""
+    _EVENT = struct.Struct("iIII")
+    _MASK = (0x00000004 |  # IN_ATTRIB
+             0x00000008 |  # IN_CLOSE_WRITE
+             0x00000040 |  # IN_MOVED_FROM
+             0x00000080 |  # IN_MOVED_TO
+             0x00000100 |  # IN_CREATE
+             0x00000200 |  # IN_DELETE
+             0x00000400 |  # IN_DELETE_SELF
+             0x00000800)   # IN_MOVE_SELF
+    _IN_NONBLOCK = 0o4000
+    _IN_CLOEXEC = 0o2000000
+    _IN_ISDIR = 0x40000000
+    _IN_Q_OVERFLOW = 0x00004000
+    _IN_IGNORED = 0x00008000
+
+    def __init__(self, directories: Sequence[pathlib.Path]) -> None:
+        super().__init__(directories)
+        self._libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        self._file_descriptor = self._libc.inotify_init1(self._IN_NONBLOCK | self._IN_CLOEXEC)
+        if self._file_descriptor < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        self._watched_directories: Dict[int, str] = {}
+        for directory in directories:
+            if directory.exists():
+                self._watch_tree(os.fspath(directory))
+
+    def _watch_tree(self, directory: str) -> None:
+        """Watch a directory and all of its child directories."""
+        self._watch(directory)
+        for item in walk(pathlib.Path(directory)):
+            if item.is_dir(follow_symlinks=False):
+                self._watch(item.path)
+
+    def _watch(self, directory: str) -> None:
+        """Watch a single directory."""
+        watch_descriptor = self._libc.inotify_add_watch(
+            self._file_descriptor,
+            os.fsencode(directory),
+            self._MASK
+        )
+        if watch_descriptor >= 0:
+            self._watched_directories[watch_descriptor] = directory
+
+    def _read_events(self) -> Iterator[Tuple[int, int, str]]:
+        """Read all pending events and return their watch descriptors, masks and names."""
+        data = b""
+        while True:
+            try:
+                data += os.read(self._file_descriptor, 65536)
+            except BlockingIOError:
+                break
+        offset = 0
+        while offset < len(data):
+            watch_descriptor, mask, _, length = self._EVENT.unpack_from(data, offset)
+            offset += self._EVENT.size
+            yield watch_descriptor, mask, os.fsdecode(data[offset:offset + length].rstrip(b"\0"))
+            offset += length
+
+    def _handle_events(self) -> None:
+        """Handle all pending events and watch directories that were added."""
+        for watch_descriptor, mask, name in self._read_events():
+            if mask & self._IN_IGNORED:
+                self._watched_directories.pop(watch_descriptor, None)
+            elif mask & self._IN_Q_OVERFLOW:
+                for directory in self._directories:
+                    if directory.exists():
+                        self._watch_tree(os.fspath(directory))
+            elif mask & self._IN_ISDIR and mask & (0x00000080 | 0x00000100):
+                parent = self._watched_directories.get(watch_descriptor)
+                if parent is not None:
+                    self._watch_tree(os.path.join(parent, name))
+
+    def wait(self, timeout: float) -> bool:
+        readable, _, _ = select.select([self._file_descriptor], [], [], max(timeout, 0))
+        if not readable:
+            return False
+        self._handle_events()
+        return True
+
+    def close(self) -> None:
+        os.close(self._file_descriptor)
+
+
+class ReadDirectoryChangesWatcher(FileSystemWatcher):
+    """Uses ReadDirectoryChangesW on Windows to get notified about changes."""
+    _FILE_LIST_DIRECTORY = 0x0001
+
+    def __init__(self, directories: Sequence[pathlib.Path]) -> None:
+        super().__init__(directories)
+        # pylint: disable=C0415
+        import win32con
+        import win32file
+
+        self._changed = threading.Event()
+        self._closed = threading.Event()
+        self._watches: List[Tuple[Any, threading.Thread]] = []
+        for directory in directories:
+            if not directory.exists():
+                continue
+            handle = win32file.CreateFile(
+                str(directory),
+                self._FILE_LIST_DIRECTORY,
+                win32con.FILE_SHARE_READ | win32con.FILE_SHARE_WRITE | win32con.FILE_SHARE_DELETE,
+                None,
+                win32con.OPEN_EXISTING,
+                win32con.FILE_FLAG_BACKUP_SEMANTICS,
+                None
+            )
+            thread = threading.Thread(target=self._watch, args=(handle,), daemon=True)
+            thread.start()
+            self._watches.append((handle, thread))
+
+    def _watch(self, handle: Any) -> None:
+        """Wait for changes below the directory of the handle until the watcher is closed."""
+        # pylint: disable=C0415
+        import pywintypes
+        import win32con
+        import win32file
+
+        notify_filter = (win32con.FILE_NOTIFY_CHANGE_FILE_NAME |
+                         win32con.FILE_NOTIFY_CHANGE_DIR_NAME |
+                         win32con.FILE_NOTIFY_CHANGE_ATTRIBUTES |
+                         win32con.FILE_NOTIFY_CHANGE_LAST_WRITE)
+        try:
+            while not self._closed.is_set():
+                win32file.ReadDirectoryChangesW(handle, 8192, True, notify_filter, None, None)
+                self._changed.set()
+        except pywintypes.error:
+            pass
+
+    def wait(self, timeout: float) -> bool:
+        changed = self._changed.wait(max(timeout, 0))
+        self._changed.clear()
+        return changed
+
+    def close(self) -> None:
+        self._closed.set()
+        # The reads block, so they are cancelled until the threads noticed that the watcher is
+        # closed. A read that started right after a cancel is stopped by the next one.
+        for handle, thread in self._watches:
+            while thread.is_alive():
+                ctypes.windll.kernel32.CancelIoEx(int(handle), None)
+                thread.join(0.1)
+            handle.Close()
+        self._watches.clear()
+
+
+def create_watcher(directories: Sequence[pathlib.Path], polling_interval: float) -> FileSystemWatcher:
+    """Return the best watcher that is supported by the operating system."""
+    if sys.platform == "win32":
+        try:
+            return ReadDirectoryChangesWatcher(directories)
+        except ImportError:
+            pass
+    elif sys.platform.startswith("linux"):
+        try:
+            return InotifyWatcher(directories)
+        except (AttributeError, OSError):
+            pass
+    return PollingWatcher(directories, polling_interval)
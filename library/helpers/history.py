@@ -0,0 +1,157 @@
+"""Keep a history of the changes to the start menu in an SQLite database."""
+import contextlib
+import os
+import pathlib
+import sqlite3
+import time
+from typing import Iterator, List, NamedTuple, Optional
+
+from library.helpers.metrics import ACTIONS, ENTRIES_VISITED, FAILED_ACTIONS, SKIPPED_ACTIONS, CycleStatistics
+
+_SCHEMA_VERSION = 1
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS cycles (
+    id INTEGER PRIMARY KEY,
+    started REAL NOT NULL,
+    seconds REAL NOT NULL,
+    entries INTEGER NOT NULL,
+    actions INTEGER NOT NULL,
+    skipped INTEGER NOT NULL,
+    failed INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS actions (
+    id INTEGER PRIMARY KEY,
+    cycle INTEGER NOT NULL,
+    time REAL NOT NULL,
+    rule TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    path TEXT NOT NULL,
+    name TEXT NOT NULL,
+    destination TEXT,
+    applied INTEGER NOT NULL,
+    message TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS cycles_by_time ON cycles (started);
+CREATE INDEX IF NOT EXISTS actions_by_time ON actions (time);
+CREATE INDEX IF NOT EXISTS actions_by_path ON actions (path COLLATE NOCASE, time);
+CREATE INDEX IF NOT EXISTS actions_by_name ON actions (name COLLATE NOCASE, time);
+CREATE INDEX IF NOT EXISTS actions_by_rule ON actions (rule, time);
+"""
+
+
+class HistoryAction(NamedTuple):
+    """A change to the start menu that a rule made or tried to make."""
+    rule: str
+    kind: str
+    path: str
+    destination: Optional[str]
+    applied: bool
+    message: str
+
+
+class RecordedAction(NamedTuple):
+    """A change to the start menu as it was recorded in the history."""
+    time: float
+    rule: str
+    kind: str
+    path: str
+    destination: Optional[str]
+    applied: bool
+    message: str
+
+
+class RecordedCycle(NamedTuple):
+    """The summary of a cleaning cycle as it was recorded in the history."""
+    started: float
+    seconds: float
+    entries: int
+    actions: int
+    skipped: int
+    failed: int
+
+
+class HistoryStore:
+    """A database of the summaries of all cycles and of all changes they made.
+
+    Every cycle is written in one transaction together with its changes. Changes can be looked
+    up by their path, the name of the file or folder and the rule that made them, newest first.
+    Records that are older than the retention are deleted when a cycle is recorded.
+    """
+    def __init__(self, file: pathlib.Path, retention_in_days: int = 365) -> None:
+        self._file = file
+        self._retention_in_days = retention_in_days
+        self._created = False
+
+    @contextlib.contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        """Open the database, create its tables if needed and close it again afterwards."""
+        connection = sqlite3.connect(self._file, timeout=10)
+        try:
+            if not self._created:
+                connection.execute("PRAGMA journal_mode=WAL")
+                if connection.execute("PRAGMA user_version").fetchone()[0] != _SCHEMA_VERSION:
+                    connection.executescript(_SCHEMA)
+                    connection.execute(f"PRAGMA user_version={_SCHEMA_VERSION}")
+                self._created = True
+            connection.execute("PRAGMA synchronous=NORMAL")
+            yield connection
+        finally:
+            connection.close()
+
+    def record(self, cycle: CycleStatistics, actions: List[HistoryAction]) -> None:
+        """Record the summary and the changes of a cycle and delete the records that are too old."""
+        with self._connect() as connection, connection:
+            cycle_id = connection.execute(
+                "INSERT INTO cycles (started, seconds, entries, actions, skipped, failed) VALUES (?, ?, ?, ?, ?, ?)",
+                (cycle.started, cycle.seconds, cycle.counters[ENTRIES_VISITED], cycle.counters[ACTIONS],
+                 cycle.counters[SKIPPED_ACTIONS], cycle.counters[FAILED_ACTIONS])
+            ).lastrowid
+            connection.executemany(
+                "INSERT INTO actions (cycle, time, rule, kind, path, name, destination, applied, message) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                [(cycle_id, cycle.started, action.rule, action.kind, action.path, os.path.basename(action.path),
+                  action.destination, action.applied, action.message) for action in actions]
+            )
+            if self._retention_in_days > 0:
+                oldest = time.time() - self._retention_in_days * 24 * 60 * 60
+                connection.execute("DELETE FROM actions WHERE time < ?", (oldest,))
+                connection.execute("DELETE FROM cycles WHERE started < ?", (oldest,))
+
+    def actions(self, path: Optional[str] = None, rule: Optional[str] = None, since: Optional[float] = None,
+                limit: int = 50) -> List[RecordedAction]:
+        """Return the newest recorded changes.
+
+        The path can be a full path or only the name of a file or folder, both are compared
+        ignoring the case.
+        """
+        conditions = []
+        parameters: List[object] = []
+        if path:
+            column = "path" if os.path.basename(path) != path else "name"
+            conditions.append(f"{column} = ? COLLATE NOCASE")
+            parameters.append(path)
+        if rule:
+            conditions.append("rule = ?")
+            parameters.append(rule)
+        if since is not None:
+            conditions.append("time >= ?")
+            parameters.append(since)
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        with self._connect() as connection:
+            rows = connection.execute(
+                "SELECT time, rule, kind, path, destination, applied, message FROM actions "
+                f"{where} ORDER BY time DESC, id DESC LIMIT ?",  # nosec B608
+                (*parameters, limit)
+            ).fetchall()
+        return [RecordedAction(time_, rule_, kind, path_, destination, bool(applied), message)
+                for time_, rule_, kind, path_, destination, applied, message in rows]
+
+    def cycles(self, since: Optional[float] = None, limit: int = 50) -> List[RecordedCycle]:
+        """Return the summaries of the newest recorded cycles."""
+        with self._connect() as connection:
+            rows = connection.execute(
+                "SELECT started, seconds, entries, actions, skipped, failed FROM cycles "
+                "WHERE started >= ? ORDER BY started DESC LIMIT ?",
+                (since or 0, limit)
+            ).fetchall()
+        return [RecordedCycle(*row) for row in rows]
@@ -0,0 +1,126 @@
+"""Write the log on a background thread to a file that is rotated into compressed archives."""
+import copy
+import gzip
+import json
+import logging
+import logging.handlers
+import os
+import pathlib
+import queue
+import shutil
+from typing import Optional
+
+ROTATE_BY_SIZE = "size"
+ROTATE_DAILY = "daily"
+NO_ROTATION = "off"
+ROTATIONS = [ROTATE_BY_SIZE, ROTATE_DAILY, NO_ROTATION]
+
+LOG_FORMAT = "%(asctime)s - %(levelname)s - %(message)s"
+
+_TRACEBACK_FORMATTER = logging.Formatter()
+
+
+class JsonLinesFormatter(logging.Formatter):
+    """Formats every record as one JSON object per line."""
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "time": record.created,
+            "level": record.levelname,
+            "logger": record.name,
+            "thread": record.threadName,
+            "message": record.getMessage(),
+        }
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry["exception"] = record.exc_text
+        return json.dumps(entry)
+
+
+class _QueueHandler(logging.handlers.QueueHandler):
+    """Puts records into the queue with their message and traceback already turned into text.
+
+    Unlike the QueueHandler of the standard library, the traceback is kept apart from the
+    message, so that it still ends up in its own field of the JSON-lines format.
+    """
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = _TRACEBACK_FORMATTER.formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+def _archive_name(name: str) -> str:
+    """Return the name of a rotated log file after it was compressed."""
+    return name + ".gz"
+
+
+def _compress(source: str, destination: str) -> None:
+    """Compress a log file that is rotated into an archive and remove it."""
+    with open(source, "rb") as source_file, gzip.open(destination, "wb") as destination_file:
+        shutil.copyfileobj(source_file, destination_file)
+    os.remove(source)
+
+
+def _file_handler(file: pathlib.Path, rotation: str, maximum_size: int, backups: int) -> logging.FileHandler:
+    """Return a handler that writes to the file and rotates it as configured."""
+    handler: logging.FileHandler
+    if rotation == ROTATE_BY_SIZE:
+        handler = logging.handlers.RotatingFileHandler(
+            file, maxBytes=maximum_size, backupCount=backups, encoding="utf-8", delay=True
+        )
+    elif rotation == ROTATE_DAILY:
+        handler = logging.handlers.TimedRotatingFileHandler(
+            file, when="midnight", backupCount=backups, encoding="utf-8", delay=True
+        )
+    elif rotation == NO_ROTATION:
+        return logging.FileHandler(file, encoding="utf-8", delay=True)
+    else:
+        raise ValueError(f"Unknown log rotation \"{rotation}\", expected one of {', '.join(ROTATIONS)}")
+    handler.namer = _archive_name
+    handler.rotator = _compress
+    return handler
+
+
+class LogPipeline:
+    """Sends the records of the root logger through a queue to a thread that writes them.
+
+    Logging only puts the record into the queue, so the thread that cleans the start menu never
+    waits for the log file to be written, rotated or compressed.
+    """
+    def __init__(self, file: pathlib.Path, rotation: str = ROTATE_BY_SIZE, maximum_size: int = 1024 * 1024,
+                 backups: int = 5, json_lines: bool = False, level: int = logging.INFO) -> None:
+        self._handler = _file_handler(file, rotation, maximum_size, backups)
+        self._handler.setFormatter(JsonLinesFormatter() if json_lines else logging.Formatter(LOG_FORMAT))
+        self._queue: "queue.SimpleQueue[logging.LogRecord]" = queue.SimpleQueue()
+        self._queue_handler = _QueueHandler(self._queue)
+        self._listener = logging.handlers.QueueListener(self._queue, self._handler)
+        self._level = level
+        self._previous_level: Optional[int] = None
+
+    def start(self) -> None:
+        """Start writing the records of the root logger in the background."""
+        root_logger = logging.getLogger()
+        self._previous_level = root_logger.level
+        root_logger.setLevel(self._level)
+        root_logger.addHandler(self._queue_handler)
+        self._listener.start()
+
+    def stop(self) -> None:
+        """Write the records that are still queued and stop the background thread."""
+        root_logger = logging.getLogger()
+        root_logger.removeHandler(self._queue_handler)
+        if self._previous_level is not None:
+            root_logger.setLevel(self._previous_level)
+        self._listener.stop()
+        self._handler.close()
+
+    def __enter__(self) -> "LogPipeline":
+        self.start()
+        return self
+
+    def __exit__(self, *exception_info: object) -> None:
+        self.stop()
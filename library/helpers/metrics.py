@@ -0,0 +1,185 @@
+"""Count and time what the cleaning cycles do."""
+import json
+import os
+import pathlib
+import threading
+import time
+from typing import Dict, List, Optional
+
+ENTRIES_VISITED = "entries_visited"
+DIRECTORY_LISTINGS = "directory_listings"
+STATS = "stats"
+SHORTCUT_RESOLUTIONS = "shortcut_resolutions"
+ACTIONS = "actions"
+SKIPPED_ACTIONS = "skipped_actions"
+FAILED_ACTIONS = "failed_actions"
+COUNTERS = [ENTRIES_VISITED, DIRECTORY_LISTINGS, STATS, SHORTCUT_RESOLUTIONS, ACTIONS, SKIPPED_ACTIONS,
+            FAILED_ACTIONS]
+# The statistics of resolving the targets of links once for all rules that need them
+RESOLVE_LINKS = "resolve_links"
+
+_PROMETHEUS_PREFIX = "start_menu_helper_"
+_COUNTER_DESCRIPTIONS = {
+    ENTRIES_VISITED: "Files and folders that were read into a snapshot of the start menu.",
+    DIRECTORY_LISTINGS: "Directories that were listed.",
+    STATS: "Files and folders whose metadata was read.",
+    SHORTCUT_RESOLUTIONS: "Shortcuts and symbolic links whose target was looked up.",
+    ACTIONS: "Changes that were applied to the start menu.",
+    SKIPPED_ACTIONS: "Planned changes that were redundant or could not be applied.",
+    FAILED_ACTIONS: "Planned changes that could not be applied.",
+}
+_RULE_DESCRIPTIONS = {
+    "seconds": "Time spent evaluating the rule and planning its changes.",
+    "visited": "Entries the rule was evaluated for.",
+    "actions": "Entries the rule acted on.",
+    DIRECTORY_LISTINGS: "Directories that were listed for the rule.",
+    STATS: "Files and folders whose metadata was read for the rule.",
+    SHORTCUT_RESOLUTIONS: "Shortcuts and symbolic links whose target was looked up for the rule.",
+}
+
+
+class RuleStatistics:
+    """How long a rule took, how many entries it was evaluated for, how often it acted and what it read.
+
+    Reading the start menu is shared by all rules and only counted for the whole cycle. The
+    targets of links are resolved once for all rules that need them, so what that reads is
+    counted for RESOLVE_LINKS instead of for each of these rules.
+    """
+    __slots__ = ("seconds", "visited", "actions", "directory_listings", "stats", "shortcut_resolutions")
+
+    def __init__(self) -> None:
+        self.seconds = 0.0
+        self.visited = 0
+        self.actions = 0
+        self.directory_listings = 0
+        self.stats = 0
+        self.shortcut_resolutions = 0
+
+    def add(self, other: "RuleStatistics") -> None:
+        """Add the values of other to these statistics."""
+        for value in self.__slots__:
+            setattr(self, value, getattr(self, value) + getattr(other, value))
+
+    def to_dict(self) -> Dict[str, float]:
+        """Return the statistics as a dictionary."""
+        return {value: getattr(self, value) for value in self.__slots__}
+
+
+class CycleStatistics:
+    """The counters and rule statistics of one cleaning cycle or of many added together.
+
+    The statistics are only changed by the thread that runs the cycle, so no locking is needed
+    while the cycle runs.
+    """
+    def __init__(self) -> None:
+        self.started = time.time()
+        self.seconds = 0.0
+        self.counters: Dict[str, int] = dict.fromkeys(COUNTERS, 0)
+        self.rules: Dict[str, RuleStatistics] = {}
+
+    def count(self, counter: str, amount: int = 1) -> None:
+        """Increase a counter."""
+        self.counters[counter] += amount
+
+    def rule(self, name: str) -> RuleStatistics:
+        """Return the statistics of a rule that are updated while the rule is applied."""
+        statistics = self.rules.get(name)
+        if statistics is None:
+            statistics = self.rules[name] = RuleStatistics()
+        return statistics
+
+    def add(self, other: "CycleStatistics") -> None:
+        """Add the values of other to these statistics."""
+        self.seconds += other.seconds
+        for counter, amount in other.counters.items():
+            self.counters[counter] += amount
+        for name, statistics in other.rules.items():
+            self.rule(name).add(statistics)
+
+    def to_dict(self) -> Dict[str, object]:
+        """Return the statistics as a dictionary."""
+        return {
+            "started": self.started,
+            "seconds": self.seconds,
+            "counters": dict(self.counters),
+            "rules": {name: statistics.to_dict() for name, statistics in self.rules.items()},
+        }
+
+
+class MetricsRegistry:
+    """Keeps the statistics of the last cycle and the totals of all cycles since the start.
+
+    Finished cycles are recorded by the thread that runs them while the summary can be read from
+    any other thread, e.g. to show it in the task bar icon.
+    """
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.cycles = 0
+        self.last_cycle: Optional[CycleStatistics] = None
+        self.totals = CycleStatistics()
+
+    def record(self, cycle: CycleStatistics) -> None:
+        """Record the statistics of a finished cycle."""
+        with self._lock:
+            self.cycles += 1
+            self.last_cycle = cycle
+            self.totals.add(cycle)
+
+    def to_dict(self) -> Dict[str, object]:
+        """Return the metrics as a dictionary that can be written as JSON."""
+        with self._lock:
+            return {
+                "updated": time.time(),
+                "cycles": self.cycles,
+                "last_cycle": None if self.last_cycle is None else self.last_cycle.to_dict(),
+                "totals": self.totals.to_dict(),
+            }
+
+    def to_prometheus(self) -> str:
+        """Return the metrics in the text format of Prometheus."""
+        lines: List[str] = []
+
+        def add_metric(name: str, metric_type: str, description: str, values: Dict[str, float]) -> None:
+            lines.append(f"# HELP {_PROMETHEUS_PREFIX}{name} {description}")
+            lines.append(f"# TYPE {_PROMETHEUS_PREFIX}{name} {metric_type}")
+            for labels, value in values.items():
+                lines.append(f"{_PROMETHEUS_PREFIX}{name}{labels} {value}")
+
+        with self._lock:
+            add_metric("cycles_total", "counter", "Cleaning cycles that were run.", {"": self.cycles})
+            add_metric("cycle_seconds_total", "counter", "Time spent in cleaning cycles.",
+                       {"": self.totals.seconds})
+            for counter in COUNTERS:
+                add_metric(f"{counter}_total", "counter", _COUNTER_DESCRIPTIONS[counter],
+                           {"": self.totals.counters[counter]})
+            for value, description in _RULE_DESCRIPTIONS.items():
+                add_metric(f"rule_{value}_total", "counter", description, {
+                    f"{{rule=\"{name}\"}}": getattr(statistics, value)
+                    for name, statistics in sorted(self.totals.rules.items())
+                })
+            if self.last_cycle is not None:
+                add_metric("last_cycle_seconds", "gauge", "Duration of the last cleaning cycle.",
+                           {"": self.last_cycle.seconds})
+                add_metric("last_cycle_timestamp_seconds", "gauge", "Start of the last cleaning cycle.",
+                           {"": self.last_cycle.started})
+        return "\n".join(lines) + "\n"
+
+    def summary(self) -> str:
+        """Return a short summary of the last cycle."""
+        with self._lock:
+            cycle = self.last_cycle
+            if cycle is None:
+                return "No scan yet"
+            return (f"Last scan at {time.strftime('%H:%M', time.localtime(cycle.started))} "
+                    f"took {cycle.seconds:.1f} s\n"
+                    f"{cycle.counters[ENTRIES_VISITED]} items, {cycle.counters[ACTIONS]} changes, "
+                    f"{self.cycles} scans in total")
+
+    def save(self, json_file: pathlib.Path, prometheus_file: pathlib.Path) -> None:
+        """Write the metrics to a JSON file and to a file in the text format of Prometheus."""
+        for file, content in ((json_file, json.dumps(self.to_dict(), indent=2)),
+                              (prometheus_file, self.to_prometheus())):
+            temporary_file = file.with_name(file.name + ".tmp")
+            with open(temporary_file, "w", encoding="utf-8") as opened_file:
+                opened_file.write(content)
+            os.replace(temporary_file, file)
@@ -0,0 +1,89 @@
+"""Match names against many phrases or suffixes at once."""
+import re
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+_Trie = Dict[str, "_Trie"]
+
+
+def _trie_pattern(node: _Trie) -> str:
+    """Return a regular expression that matches all phrases of the trie.
+
+    Phrases that start with a shorter phrase are left out, because the shorter phrase
+    already matches wherever they do.
+    """
+    if "" in node:
+        return ""
+    alternatives = [re.escape(character) + _trie_pattern(child) for character, child in node.items()]
+    if len(alternatives) == 1:
+        return alternatives[0]
+    return "(?:" + "|".join(alternatives) + ")"
+
+
+class NameMatcher:
+    """Finds the phrase of a list that is contained in a name.
+
+    All phrases are compiled into a single regular expression that is built from a trie of the
+    phrases, so a name is only scanned once no matter how many phrases there are.
+    """
+    def __init__(self, phrases: Iterable[str], ignore_case: bool) -> None:
+        self.phrases = list(phrases)
+        self._ignore_case = ignore_case
+        self._pattern: Optional[re.Pattern] = None
+        if self.phrases:
+            trie: _Trie = {}
+            for phrase in self.phrases:
+                node = trie
+                for character in self._fold(phrase):
+                    node = node.setdefault(character, {})
+                node[""] = {}
+            self._pattern = re.compile(_trie_pattern(trie))
+
+    def _fold(self, text: str) -> str:
+        """Return the text in the form in which it is compared."""
+        return text.lower() if self._ignore_case else text
+
+    def match(self, name: str) -> Optional[str]:
+        """Return the first phrase of the list that is contained in the name or None."""
+        if self._pattern is None:
+            return None
+        folded_name = self._fold(name)
+        if not self._pattern.search(folded_name):
+            return None
+        for phrase in self.phrases:
+            if self._fold(phrase) in folded_name:
+                return phrase
+        return None
+
+
+class SuffixMatcher:
+    """Finds the suffix of a list that a name ends with.
+
+    The suffixes are grouped by their length, so a name is only compared once per distinct
+    suffix length no matter how many suffixes there are.
+    """
+    def __init__(self, suffixes: Iterable[str], ignore_case: bool) -> None:
+        self.suffixes = list(suffixes)
+        self._ignore_case = ignore_case
+        self._positions: Dict[str, int] = {}
+        for position, suffix in enumerate(self.suffixes):
+            self._positions.setdefault(self._fold(suffix), position)
+        suffixes_by_length: Dict[int, Set[str]] = {}
+        for suffix in self._positions:
+            suffixes_by_length.setdefault(len(suffix), set()).add(suffix)
+        self._suffixes_by_length: List[Tuple[int, Set[str]]] = sorted(suffixes_by_length.items())
+
+    def _fold(self, text: str) -> str:
+        """Return the text in the form in which it is compared."""
+        return text.lower() if self._ignore_case else text
+
+    def match(self, name: str) -> Optional[str]:
+        """Return the first suffix of the list that the name ends with or None."""
+        folded_name = self._fold(name)
+        position = None
+        for length, suffixes in self._suffixes_by_length:
+            if length > len(folded_name):
+                break
+            ending = folded_name[len(folded_name) - length:]
+            if ending in suffixes and (position is None or self._positions[ending] < position):
+                position = self._positions[ending]
+        return None if position is None else self.suffixes[position]
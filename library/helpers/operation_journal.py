@@ -0,0 +1,257 @@
+"""Record the changes of the cleaning cycles so that they can be resumed and undone."""
+import base64
+import json
+import logging
+import os
+import pathlib
+import threading
+import time
+import uuid
+from typing import Dict, List, NamedTuple, Optional, Set, Tuple
+
+from library import constants
+
+MOVE = "move"
+UNLINK = "unlink"
+RMDIR = "rmdir"
+
+
+class RecordedOperation(NamedTuple):
+    """A change to the file system with the paths it is applied to.
+
+    Moves move the item at path into the destination directory. The content of deleted files
+    is kept base64 encoded if they are small enough, so that they can be restored. The size and
+    modification time of files tell whether the item at the path is still the same file.
+    """
+    kind: str
+    path: str
+    destination: Optional[str] = None
+    content: Optional[str] = None
+    size: Optional[int] = None
+    mtime_ns: Optional[int] = None
+
+    @property
+    def _moved_path(self) -> str:
+        """Return where a moved item is after the move."""
+        return os.path.join(self.destination or "", os.path.basename(self.path))
+
+    def _is_recorded_item(self) -> bool:
+        """Return whether the item at the path is the one the operation was recorded for.
+
+        Items without a recorded size and modification time, like folders, always match.
+        """
+        if self.size is None or self.mtime_ns is None:
+            return True
+        item_stat = os.lstat(self.path)
+        if (item_stat.st_size, item_stat.st_mtime_ns) != (self.size, self.mtime_ns):
+            return False
+        if self.content is None:
+            return True
+        with open(self.path, "rb") as file:
+            return file.read() == base64.b64decode(self.content)
+
+    def apply(self) -> bool:
+        """Apply the operation unless it was already applied and return whether it changed anything.
+
+        The operation is not applied if another item than the recorded one is at the path now,
+        e.g. because a later operation of the same cycle moved another file there.
+        """
+        if not os.path.lexists(self.path):
+            return False
+        if not self._is_recorded_item():
+            logging.warning("Not applying \"%s\" to %s because it is not the same item anymore", self.kind, self.path)
+            return False
+        if self.kind == MOVE:
+            os.replace(self.path, self._moved_path)
+        elif self.kind == UNLINK:
+            os.unlink(self.path)
+        else:
+            os.rmdir(self.path)
+        return True
+
+    def undo(self) -> bool:
+        """Revert the operation if possible and return whether it changed anything."""
+        if os.path.lexists(self.path):
+            return False
+        if self.kind == MOVE:
+            if not os.path.lexists(self._moved_path):
+                return False
+            os.replace(self._moved_path, self.path)
+        elif self.kind == UNLINK:
+            if self.content is None:
+                logging.warning("Can not restore %s because its content was not recorded", self.path)
+                return False
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            with open(self.path, "xb") as file:
+                file.write(base64.b64decode(self.content))
+        else:
+            os.makedirs(self.path)
+        return True
+
+
+class _Cycle:
+    """The records of one cycle that were read from the journal."""
+    def __init__(self, operations: List[RecordedOperation]) -> None:
+        self.operations = operations
+        self.applied: Set[int] = set()
+        self.committed = False
+        self.undone = False
+
+
+class OperationJournal:
+    """An append-only file of the operations of every cycle.
+
+    The operations of a cycle are written and synced to disk before the first of them is
+    applied. Applied operations are only written in groups, so a crash can lose the last
+    group, but applying an operation a second time does nothing and operations are not applied
+    to other items that are at their paths by now. A cycle without a commit record was
+    interrupted and its remaining operations can be applied later on.
+    """
+    def __init__(self, file: pathlib.Path, group_size: int = constants.JOURNAL_GROUP_COMMIT_SIZE) -> None:
+        self._file = file
+        self._group_size = group_size
+        self._lock = threading.Lock()
+        self._cycle: Optional[str] = None
+        self._applied: List[int] = []
+
+    def _write(self, records: List[Dict[str, object]]) -> None:
+        """Append the records to the journal and sync it to disk."""
+        with open(self._file, "a", encoding="utf-8") as file:
+            file.write("".join(json.dumps(record) + "\n" for record in records))
+            file.flush()
+            os.fsync(file.fileno())
+
+    def begin(self, operations: List[RecordedOperation]) -> None:
+        """Record the operations of a new cycle before they are applied."""
+        with self._lock:
+            self._cycle = uuid.uuid4().hex
+            self._applied = []
+            self._write([{"cycle": self._cycle, "event": "plan", "time": time.time(),
+                          "operations": [list(operation) for operation in operations]}])
+
+    def applied(self, index: int) -> None:
+        """Record that the operation with the index was applied, the group is written once it is full."""
+        with self._lock:
+            self._applied.append(index)
+            if len(self._applied) >= self._group_size:
+                self._write_applied()
+
+    def _write_applied(self) -> None:
+        """Write the group of applied operations."""
+        if self._applied:
+            self._write([{"cycle": self._cycle, "event": "applied", "operations": self._applied}])
+            self._applied = []
+
+    def commit(self) -> None:
+        """Record that all operations of the current cycle were applied or skipped."""
+        with self._lock:
+            if self._cycle is None:
+                return
+            self._write_applied()
+            self._write([{"cycle": self._cycle, "event": "commit"}])
+            self._cycle = None
+        if self._file.stat().st_size > constants.JOURNAL_MAXIMUM_SIZE_IN_BYTES:
+            self._compact()
+
+    def _read(self) -> Dict[str, _Cycle]:
+        """Read the cycles of the journal in the order they were recorded."""
+        cycles: Dict[str, _Cycle] = {}
+        if not self._file.exists():
+            return cycles
+        with open(self._file, encoding="utf-8") as file:
+            for line in file:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue  # The last line can be incomplete after a crash
+                if record["event"] == "plan":
+                    cycles[record["cycle"]] = _Cycle(
+                        [RecordedOperation(*operation) for operation in record["operations"]]
+                    )
+                    continue
+                cycle = cycles.get(record["cycle"])
+                if cycle is None:
+                    continue
+                if record["event"] == "applied":
+                    cycle.applied.update(record["operations"])
+                elif record["event"] == "commit":
+                    cycle.committed = True
+                elif record["event"] == "undo":
+                    cycle.undone = True
+        return cycles
+
+    def _compact(self) -> None:
+        """Rewrite the journal with only the last cycle, so that it can still be undone."""
+        cycles = self._read()
+        if not cycles:
+            return
+        identifier, cycle = list(cycles.items())[-1]
+        records: List[Dict[str, object]] = [
+            {"cycle": identifier, "event": "plan", "time": time.time(),
+             "operations": [list(operation) for operation in cycle.operations]},
+            {"cycle": identifier, "event": "applied", "operations": sorted(cycle.applied)},
+        ]
+        if cycle.committed:
+            records.append({"cycle": identifier, "event": "commit"})
+        if cycle.undone:
+            records.append({"cycle": identifier, "event": "undo"})
+        temporary_file = self._file.with_name(self._file.name + ".tmp")
+        with open(temporary_file, "w", encoding="utf-8") as file:
+            file.write("".join(json.dumps(record) + "\n" for record in records))
+        os.replace(temporary_file, self._file)
+
+    def interrupted(self) -> Optional[Tuple[str, List[Tuple[int, RecordedOperation]]]]:
+        """Return the last cycle if it was interrupted together with its operations that are left."""
+        cycles = self._read()
+        if not cycles:
+            return None
+        identifier, cycle = list(cycles.items())[-1]
+        if cycle.committed:
+            return None
+        return identifier, [(index, operation) for index, operation in enumerate(cycle.operations)
+                            if index not in cycle.applied]
+
+    def resume(self) -> int:
+        """Apply the operations that are left of an interrupted cycle and return how many were applied."""
+        interrupted = self.interrupted()
+        if interrupted is None:
+            return 0
+        identifier, operations = interrupted
+        with self._lock:
+            self._cycle = identifier
+            self._applied = []
+        applied = 0
+        for index, operation in operations:
+            try:
+                if operation.apply():
+                    applied += 1
+                    logging.info("Resumed interrupted %s of %s", operation.kind, operation.path)
+            except OSError as error:
+                logging.warning("Could not resume \"%s\" of %s: %s", operation.kind, operation.path, error)
+                continue
+            self.applied(index)
+        self.commit()
+        return applied
+
+    def undo_last_cycle(self) -> int:
+        """Revert the applied operations of the last cycle that was not undone yet.
+
+        Returns how many operations were reverted.
+        """
+        cycles = [(identifier, cycle) for identifier, cycle in self._read().items()
+                  if cycle.applied and not cycle.undone]
+        if not cycles:
+            return 0
+        identifier, cycle = cycles[-1]
+        undone = 0
+        for index in sorted(cycle.applied, reverse=True):
+            operation = cycle.operations[index]
+            try:
+                if operation.undo():
+                    undone += 1
+                    logging.info("Undid %s of %s", operation.kind, operation.path)
+            except OSError as error:
+                logging.warning("Could not undo \"%s\" of %s: %s", operation.kind, operation.path, error)
+        with self._lock:
+            self._write([{"cycle": identifier, "event": "undo"}])
+        return undone
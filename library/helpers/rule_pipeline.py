@@ -0,0 +1,129 @@
+"""Apply many cleaning rules to the start menu in a single pass."""
+import time
+from typing import Callable, Iterator, List, NamedTuple, Optional, Sequence, Tuple
+
+from library.helpers.cleaning_plan import CleaningPlan
+from library.helpers.file_system import LinkTarget
+from library.helpers.metrics import RESOLVE_LINKS, SHORTCUT_RESOLUTIONS, CycleStatistics, RuleStatistics
+from library.helpers.tree_snapshot import Entry, RootEntry, TreeSnapshot
+
+Details = Tuple[object, ...]
+Resolver = Callable[[List[Entry]], Iterator[Tuple[Entry, LinkTarget]]]
+# The index of a root of the tree and the names of the path below it
+Cursor = Tuple[int, Tuple[str, ...]]
+
+
+class Rule(NamedTuple):
+    """A rule that is evaluated for every single file or directory of the start menu.
+
+    The predicate returns None if the rule does not apply to the entry and otherwise the details
+    that are passed on to the action, e.g. the phrase that matched. Rules that need the target
+    get a LinkTarget for links and None for every other entry.
+    """
+    name: str
+    predicate: Callable[[Entry, Optional[LinkTarget]], Optional[Details]]
+    action: Callable[[Entry, Details], None]
+    needs_target: bool = False
+
+
+def _apply(rules: Sequence[Tuple[Rule, RuleStatistics]], entry: Entry, target: Optional[LinkTarget],
+           plan: Optional[CleaningPlan]) -> None:
+    """Apply the rules to the entry until it no longer exists and update their statistics."""
+    for rule, statistics in rules:
+        if not entry.exists:
+            return
+        start = time.perf_counter()
+        details = rule.predicate(entry, target)
+        if details is not None:
+            if plan is not None:
+                plan.rule = rule.name
+            rule.action(entry, details)
+            statistics.actions += 1
+        statistics.visited += 1
+        statistics.seconds += time.perf_counter() - start
+
+
+def _position(tree: TreeSnapshot, entry: Entry) -> Cursor:
+    """Return the position of the entry in the order in which the files of the tree are visited."""
+    names = []
+    while not isinstance(entry, RootEntry):
+        names.append(entry.name)
+        if entry.parent is None:
+            raise ValueError(f"{entry.name} is no longer part of the snapshot")
+        entry = entry.parent
+    return tree.roots.index(entry), tuple(reversed(names))
+
+
+class RulePipeline:
+    """Fuses rules into one pass over the files and one pass over the directories.
+
+    Rules that only look at the entry itself are evaluated before rules that need the target of
+    links, so that links that are already deleted are never resolved. The links that are left
+    are resolved together once for all rules that need their targets.
+    The time, the evaluated entries and the actions of every rule are added to the statistics,
+    the time and the resolutions of resolving the links are added to RESOLVE_LINKS.
+    The operations that the actions add to the plan are labelled with the rule.
+    The checkpoint is called before every entry and can stop the pipeline by raising an exception.
+    """
+    def __init__(self, file_rules: Sequence[Rule], directory_rules: Sequence[Rule],
+                 statistics: Optional[CycleStatistics] = None, plan: Optional[CleaningPlan] = None,
+                 checkpoint: Callable[[], None] = lambda: None) -> None:
+        self._statistics = statistics or CycleStatistics()
+        self._plan = plan
+        self._checkpoint = checkpoint
+        self._cheap_file_rules = [(rule, self._statistics.rule(rule.name))
+                                  for rule in file_rules if not rule.needs_target]
+        self._target_file_rules = [(rule, self._statistics.rule(rule.name))
+                                   for rule in file_rules if rule.needs_target]
+        self._directory_rules = [(rule, self._statistics.rule(rule.name)) for rule in directory_rules]
+
+    def run_file_rules(self, tree: TreeSnapshot, resolve_all: Resolver, cursor: Optional[Cursor] = None,
+                       over_budget: Callable[[], bool] = lambda: False) -> Optional[Cursor]:
+        """Apply the file rules to every file of the tree.
+
+        Resolving the targets of links is the slowest part, so with a cursor only the links at
+        or after it are resolved. Once over_budget returns True, the rules stop before the next
+        link and the cursor of that link is returned, so that the next cycle can continue there.
+        None is returned if all links were handled.
+        """
+        links = []
+        for root in tree.roots:
+            for file in tree.files(root):
+                self._checkpoint()
+                _apply(self._cheap_file_rules, file, None, self._plan)
+                if not file.exists or not self._target_file_rules:
+                    continue
+                if not file.is_link:
+                    _apply(self._target_file_rules, file, None, self._plan)
+                elif cursor is None or _position(tree, file) >= cursor:
+                    links.append(file)
+        if links:
+            resolution = self._statistics.rule(RESOLVE_LINKS)
+            resolved = 0
+            start = time.perf_counter()
+            for link, target in resolve_all(links):
+                resolution.seconds += time.perf_counter() - start
+                self._checkpoint()
+                if resolved and over_budget():
+                    self._count_resolutions(resolved)
+                    return _position(tree, link)
+                _apply(self._target_file_rules, link, target, self._plan)
+                resolved += 1
+                start = time.perf_counter()
+            resolution.seconds += time.perf_counter() - start
+            self._count_resolutions(resolved)
+        return None
+
+    def _count_resolutions(self, resolved: int) -> None:
+        """Add the links whose targets were resolved to the statistics."""
+        self._statistics.count(SHORTCUT_RESOLUTIONS, resolved)
+        self._statistics.rule(RESOLVE_LINKS).shortcut_resolutions += resolved
+
+    def run_directory_rules(self, tree: TreeSnapshot) -> None:
+        """Apply the directory rules to every directory of the tree, the deepest ones first."""
+        if not self._directory_rules:
+            return
+        for root in tree.roots:
+            for directory in reversed(tree.directories(root)):
+                self._checkpoint()
+                _apply(self._directory_rules, directory, None, self._plan)
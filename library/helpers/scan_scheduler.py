@@ -0,0 +1,105 @@
+"""Decide when the next scan of the start menu happens."""
+import random
+import threading
+import time
+from typing import Callable, Optional
+
+from library import constants
+
+
+class ScanScheduler:
+    """Waits between scans without waking up until the next scan is due.
+
+    With adaptive intervals the interval doubles after every scan that did not change anything,
+    up to a multiple of the regular interval, and falls back to a fraction of the regular
+    interval after a scan that did.
+    Every interval is randomly varied by the jitter fraction, so that computers that were
+    started at the same time do not keep scanning at the same time.
+    """
+    def __init__(
+            self,
+            interval: float,
+            adaptive: bool,
+            jitter: float,
+            clock: Callable[[], float] = time.monotonic,
+            random_generator: Optional[random.Random] = None
+    ) -> None:
+        self._condition = threading.Condition()
+        self._jitter = jitter
+        self._clock = clock
+        self._random = random_generator or random.Random()
+        self._interval = interval
+        self._adaptive = adaptive
+        self._current_interval = interval
+        self._deadline = clock()
+        self._triggered = False
+        self._stopped = False
+
+    def configure(self, interval: float, adaptive: bool) -> None:
+        """Change the regular interval between scans in seconds and whether it is adapted."""
+        if (interval, adaptive) != (self._interval, self._adaptive):
+            self._interval = interval
+            self._adaptive = adaptive
+            self._current_interval = interval
+
+    @property
+    def current_interval(self) -> float:
+        """Get the interval before the next scan without the jitter in seconds."""
+        return self._current_interval
+
+    def record_scan(self, changed: bool) -> None:
+        """Schedule the next scan based on whether the last scan changed anything."""
+        if self._adaptive:
+            if changed:
+                self._current_interval = self._interval * constants.MINIMUM_ADAPTIVE_SCAN_INTERVAL_FACTOR
+            else:
+                self._current_interval = min(
+                    self._current_interval * 2,
+                    self._interval * constants.MAXIMUM_ADAPTIVE_SCAN_INTERVAL_FACTOR
+                )
+        jitter = self._random.uniform(-self._jitter, self._jitter)
+        with self._condition:
+            self._deadline = self._clock() + self._current_interval * (1 + jitter)
+
+    def seconds_until_next_scan(self) -> float:
+        """Return how long it is until the next scan is due."""
+        return max(0.0, self._deadline - self._clock())
+
+    def trigger(self) -> None:
+        """Make the next scan happen right away."""
+        with self._condition:
+            self._triggered = True
+            self._condition.notify_all()
+
+    def stop(self) -> None:
+        """Make all waiting return and stop scheduling scans."""
+        with self._condition:
+            self._stopped = True
+            self._condition.notify_all()
+
+    def stopped(self) -> bool:
+        """Return whether the scheduler was stopped."""
+        return self._stopped
+
+    def interrupted(self) -> bool:
+        """Return whether a scan was triggered or the scheduler was stopped."""
+        return self._triggered or self._stopped
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """Wait until the next scan is due, a scan is triggered or the scheduler is stopped.
+
+        With a timeout at most that long is waited. Returns whether a scan should happen now.
+        """
+        end = None if timeout is None else self._clock() + timeout
+        with self._condition:
+            while not self.interrupted():
+                remaining = self.seconds_until_next_scan()
+                if remaining <= 0:
+                    break
+                if end is not None:
+                    if self._clock() >= end:
+                        return False
+                    remaining = min(remaining, end - self._clock())
+                self._condition.wait(remaining)
+            self._triggered = False
+            return not self._stopped
@@ -0,0 +1,206 @@
+"""Parse windows shortcut files in the Shell Link Binary File Format (MS-SHLLINK)."""
+import ntpath
+import pathlib
+import struct
+import sys
+from typing import List, NamedTuple, Optional, Tuple
+
+_HEADER = struct.Struct("<I16sII24xIiIH10x")
+_HEADER_SIZE = 0x4C
+_LINK_CLSID = bytes.fromhex("0114020000000000c000000000000046")
+
+_HAS_LINK_TARGET_ID_LIST = 0x00000001
+_HAS_LINK_INFO = 0x00000002
+_HAS_NAME = 0x00000004
+_HAS_RELATIVE_PATH = 0x00000008
+_HAS_WORKING_DIR = 0x00000010
+_HAS_ARGUMENTS = 0x00000020
+_HAS_ICON_LOCATION = 0x00000040
+_IS_UNICODE = 0x00000080
+_FORCE_NO_LINK_INFO = 0x00000100
+
+_VOLUME_ID_AND_LOCAL_BASE_PATH = 0x00000001
+_COMMON_NETWORK_RELATIVE_LINK_AND_PATH_SUFFIX = 0x00000002
+
+_ENVIRONMENT_VARIABLE_DATA_BLOCK = 0xA0000001
+_DARWIN_DATA_BLOCK = 0xA0000006
+
+_ANSI_ENCODING = "mbcs" if sys.platform == "win32" else "cp1252"
+
+
+class ShellLinkError(ValueError):
+    """The data is not a valid shell link."""
+
+
+class ShellLink(NamedTuple):
+    """The information of a windows shortcut that is needed for cleaning."""
+    target: Optional[str]
+    arguments: str
+    working_directory: Optional[str]
+    relative_path: Optional[str]
+    advertised: bool
+
+
+def _c_string(data: bytes, offset: int, unicode: bool) -> str:
+    """Read a NULL-terminated string."""
+    if unicode:
+        end = offset
+        while data[end:end + 2] not in (b"\0\0", b""):
+            end += 2
+        return data[offset:end].decode("utf-16-le")
+    end = data.find(b"\0", offset)
+    if end < 0:
+        raise ShellLinkError("Unterminated string")
+    return data[offset:end].decode(_ANSI_ENCODING)
+
+
+def _parse_link_info(data: bytes) -> Optional[str]:
+    """Return the target path that is stored in a LinkInfo structure."""
+    (header_size, flags, _, local_base_path_offset, network_offset,
+     suffix_offset) = struct.unpack_from("<4xIIIIII", data)
+    unicode = header_size >= 0x24
+    if unicode:
+        local_base_path_offset, suffix_offset = struct.unpack_from("<II", data, 28)
+    suffix = _c_string(data, suffix_offset, unicode)
+
+    if flags & _VOLUME_ID_AND_LOCAL_BASE_PATH:
+        return _c_string(data, local_base_path_offset, unicode) + suffix
+    if flags & _COMMON_NETWORK_RELATIVE_LINK_AND_PATH_SUFFIX:
+        net_name_offset = struct.unpack_from("<I", data, network_offset + 8)[0]
+        net_name_unicode = net_name_offset > 0x14
+        if net_name_unicode:
+            net_name_offset = struct.unpack_from("<I", data, network_offset + 20)[0]
+        net_name = _c_string(data, network_offset + net_name_offset, net_name_unicode)
+        return ntpath.join(net_name, suffix) if suffix else net_name
+    return None
+
+
+def _parse_item_id(item: bytes) -> Optional[str]:
+    """Return the path component of a shell item in a target ID list."""
+    item_type = item[0] & 0x70
+    if item_type == 0x10:  # Root folder, e.g. "My Computer"
+        return ""
+    if item_type == 0x20:  # Volume
+        return _c_string(item, 1, False)
+    if item_type != 0x30:  # Not a file entry
+        return None
+
+    unicode = bool(item[0] & 0x04)
+    name = _c_string(item, 12, unicode)
+    name_end = 12 + (len(name) + 1) * (2 if unicode else 1)
+    extension_offset = name_end + (name_end % 2)
+    while extension_offset + 8 <= len(item):
+        size, version, signature = struct.unpack_from("<HHI", item, extension_offset)
+        if size < 8:
+            break
+        if signature == 0xBEEF0004 and version >= 3:
+            name_offset = extension_offset + 20
+            if version >= 7:
+                name_offset += 18
+            if version >= 8:
+                name_offset += 4
+            if version >= 9:
+                name_offset += 4
+            return _c_string(item, name_offset, True)
+        extension_offset += size
+    return name
+
+
+def _parse_id_list(data: bytes) -> Optional[str]:
+    """Return the target path of a target ID list if it points into the file system."""
+    components: List[str] = []
+    offset = 0
+    while offset + 2 <= len(data):
+        size = struct.unpack_from("<H", data, offset)[0]
+        if size == 0:
+            break
+        component = _parse_item_id(data[offset + 2:offset + size])
+        if component is None:
+            return None
+        components.append(component)
+        offset += size
+    path = ""
+    for component in components:
+        path = ntpath.join(path, component) if path else component
+    return path if ntpath.isabs(path) or path.startswith("\\\\") else None
+
+
+def _read_string_data(data: bytes, offset: int, unicode: bool) -> Tuple[str, int]:
+    """Read a StringData structure and return it together with the offset after it."""
+    length = struct.unpack_from("<H", data, offset)[0]
+    offset += 2
+    if unicode:
+        return data[offset:offset + length * 2].decode("utf-16-le"), offset + length * 2
+    return data[offset:offset + length].decode(_ANSI_ENCODING), offset + length
+
+
+def _read_extra_data(data: bytes, offset: int) -> Tuple[Optional[str], bool]:
+    """Return the environment variable target and whether the link is advertised."""
+    environment_target = None
+    advertised = False
+    while offset + 8 <= len(data):
+        size, signature = struct.unpack_from("<II", data, offset)
+        if size < 8:
+            break
+        if signature == _ENVIRONMENT_VARIABLE_DATA_BLOCK and size >= 0x314:
+            environment_target = (_c_string(data, offset + 268, True) or
+                                  _c_string(data, offset + 8, False))
+        elif signature == _DARWIN_DATA_BLOCK:
+            advertised = True
+        offset += size
+    return environment_target, advertised
+
+
+def parse(data: bytes) -> ShellLink:
+    """Parse the contents of a windows shortcut file."""
+    try:
+        header_size, clsid, flags, _, _, _, _, _ = _HEADER.unpack_from(data)
+        if header_size != _HEADER_SIZE or clsid != _LINK_CLSID:
+            raise ShellLinkError("Not a shell link")
+        offset = _HEADER_SIZE
+        unicode = bool(flags & _IS_UNICODE)
+
+        id_list_target = None
+        if flags & _HAS_LINK_TARGET_ID_LIST:
+            id_list_size = struct.unpack_from("<H", data, offset)[0]
+            id_list_target = _parse_id_list(data[offset + 2:offset + 2 + id_list_size])
+            offset += 2 + id_list_size
+
+        link_info_target = None
+        if flags & _HAS_LINK_INFO:
+            link_info_size = struct.unpack_from("<I", data, offset)[0]
+            if not flags & _FORCE_NO_LINK_INFO:
+                link_info_target = _parse_link_info(data[offset:offset + link_info_size])
+            offset += link_info_size
+
+        strings = {}
+        for string_flag in (_HAS_NAME, _HAS_RELATIVE_PATH, _HAS_WORKING_DIR,
+                            _HAS_ARGUMENTS, _HAS_ICON_LOCATION):
+            if flags & string_flag:
+                strings[string_flag], offset = _read_string_data(data, offset, unicode)
+
+        environment_target, advertised = _read_extra_data(data, offset)
+    except (struct.error, IndexError, UnicodeDecodeError) as error:
+        raise ShellLinkError("Truncated or malformed shell link") from error
+
+    target = environment_target or link_info_target or id_list_target
+    return ShellLink(
+        target=ntpath.expandvars(target) if target else None,
+        arguments=strings.get(_HAS_ARGUMENTS, ""),
+        working_directory=strings.get(_HAS_WORKING_DIR),
+        relative_path=strings.get(_HAS_RELATIVE_PATH),
+        advertised=advertised,
+    )
+
+
+def read(link: pathlib.Path) -> ShellLink:
+    """Read and parse a windows shortcut file.
+
+    Shortcuts that only contain a relative path are resolved relative to the shortcut itself.
+    """
+    with open(link, "rb") as file:
+        parsed_link = parse(file.read())
+    if parsed_link.target is None and parsed_link.relative_path:
+        target = ntpath.normpath(ntpath.join(str(link.parent), parsed_link.relative_path))
+        parsed_link = parsed_link._replace(target=target)
+    return parsed_link
@@ -0,0 +1,107 @@
+"""Remember the targets of windows shortcuts between cleaning cycles."""
+import collections
+import json
+import logging
+import os
+import pathlib
+import threading
+from typing import Callable, Optional, OrderedDict, Tuple
+
+from library.helpers import windows_shortcuts
+
+_FORMAT_VERSION = 2
+
+ShortcutReader = Callable[[pathlib.Path], Tuple[pathlib.Path, str]]
+
+
+class ShortcutCache:
+    """A least recently used cache of shortcut targets.
+
+    The targets are keyed on the path, modification time and size of the shortcut files,
+    so a shortcut is read again as soon as it changes.
+    """
+    def __init__(
+            self,
+            file: Optional[pathlib.Path],
+            max_entries: int,
+            read_shortcut: ShortcutReader = windows_shortcuts.read_shortcut_and_arguments
+    ) -> None:
+        self._file = file
+        self._max_entries = max_entries
+        self._read_shortcut = read_shortcut
+        self._entries: OrderedDict[str, Tuple[int, int, str, str]] = collections.OrderedDict()
+        self._lock = threading.Lock()
+        self._changed = False
+        self.hits = 0
+        self.misses = 0
+        self._load()
+
+    def _load(self) -> None:
+        """Load the cache from its file."""
+        if self._file is None or not self._file.exists():
+            return
+        try:
+            with open(self._file, encoding="utf-8") as file:
+                data = json.load(file)
+            if data["version"] != _FORMAT_VERSION:
+                logging.debug("Shortcut cache has an old format, starting with an empty cache")
+                return
+            for path, modification_time, size, target, arguments in \
+                    data["entries"][-self._max_entries:]:
+                self._entries[path] = (modification_time, size, target, arguments)
+        except (OSError, KeyError, TypeError, ValueError):
+            logging.warning("Shortcut cache is corrupt, starting with an empty cache")
+            self._entries.clear()
+
+    def save(self) -> None:
+        """Save the cache to its file if it changed."""
+        if self._file is None or not self._changed:
+            return
+        with self._lock:
+            entries = [[path, *entry] for path, entry in self._entries.items()]
+            self._changed = False
+        temporary_file = self._file.with_name(self._file.name + ".tmp")
+        with open(temporary_file, "w", encoding="utf-8") as file:
+            json.dump({"version": _FORMAT_VERSION, "entries": entries}, file)
+        os.replace(temporary_file, self._file)
+
+    def read_shortcut(
+            self,
+            link: pathlib.Path,
+            modification_time: Optional[int] = None,
+            size: Optional[int] = None
+    ) -> pathlib.Path:
+        """Return the target of the shortcut.
+
+        The modification time in nanoseconds and the size of the shortcut file are read from
+        the file system if they are not given.
+        """
+        return self.read_shortcut_and_arguments(link, modification_time, size)[0]
+
+    def read_shortcut_and_arguments(
+            self,
+            link: pathlib.Path,
+            modification_time: Optional[int] = None,
+            size: Optional[int] = None
+    ) -> Tuple[pathlib.Path, str]:
+        """Return the target and the command line arguments of the shortcut."""
+        if modification_time is None or size is None:
+            stat = link.stat()
+            modification_time, size = stat.st_mtime_ns, stat.st_size
+        key = os.fspath(link)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] == modification_time and entry[1] == size:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return pathlib.Path(entry[2]), entry[3]
+            self.misses += 1
+
+        target, arguments = self._read_shortcut(link)
+        with self._lock:
+            self._entries[key] = (modification_time, size, str(target), arguments)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self._max_entries:
+                self._entries.popitem(last=False)
+            self._changed = True
+        return target, arguments
@@ -22,3 +22,7 @@ class StoppableThread(threading.Thread):
     def stopped(self) -> bool:
         """Return whether the thread is supposed to be stopped."""
         return self._stop_event.is_set()
+
+    def wait(self, timeout: float) -> bool:
+        """Wait until the thread is supposed to be stopped or the timeout passed and return whether it is stopped."""
+        return self._stop_event.wait(timeout)
@@ -0,0 +1,129 @@
+"""Check whether the targets of links exist by listing the directories they are in."""
+import concurrent.futures
+import os
+import pathlib
+import threading
+import time
+from typing import Callable, Dict, Generic, Optional, Tuple, TypeVar
+
+from library import constants
+from library.helpers.file_system import LinkTarget, stat_target
+
+T = TypeVar("T")
+Clock = Callable[[], float]
+
+
+class _ExpiringCache(Generic[T]):
+    """Values that are read by only one thread at a time and kept for the time to live."""
+    def __init__(self, read: Callable[[str], T], time_to_live: float, clock: Clock) -> None:
+        self._read = read
+        self._time_to_live = time_to_live
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._values: Dict[str, Tuple[float, T]] = {}
+        self._reading: Dict[str, concurrent.futures.Future] = {}
+        self._expired = clock() + time_to_live
+
+    def get(self, key: str) -> T:
+        """Return the value of the key if it is younger than the time to live or read it again.
+
+        Threads that need a value that another thread is reading wait for it.
+        """
+        now = self._clock()
+        with self._lock:
+            if now >= self._expired:
+                self._values = {key: value for key, value in self._values.items()
+                                if now - value[0] < self._time_to_live}
+                self._expired = now + self._time_to_live
+            cached = self._values.get(key)
+            if cached is not None and now - cached[0] < self._time_to_live:
+                return cached[1]
+            future = self._reading.get(key)
+            reading = future is None
+            if future is None:
+                future = self._reading[key] = concurrent.futures.Future()
+        if not reading:
+            return future.result()
+        try:
+            value = self._read(key)
+        except BaseException as error:
+            with self._lock:
+                del self._reading[key]
+            future.set_exception(error)
+            raise
+        with self._lock:
+            self._values[key] = (now, value)
+            del self._reading[key]
+        future.set_result(value)
+        return value
+
+
+class TargetOracle:
+    """Tells whether the targets of links exist and whether they are directories.
+
+    Instead of reading the metadata of every target, the directory that a target is in is
+    listed once and the names and types of its items are kept for the time to live, so many
+    links into the same directory only cost one listing. Targets on drives that can not be
+    reached are unknown instead of missing. A target is only missing after reading its own
+    metadata confirmed it, so an outdated listing can never get a link deleted.
+    before_read is called before every listing or metadata read, e.g. to throttle them.
+    """
+    def __init__(
+            self,
+            time_to_live: float = constants.TARGET_LISTING_TIME_TO_LIVE_IN_SECONDS,
+            clock: Clock = time.monotonic,
+            before_read: Callable[[], None] = lambda: None
+    ) -> None:
+        self._before_read = before_read
+        self._lock = threading.Lock()
+        self._listings = _ExpiringCache(self._list, time_to_live, clock)
+        self._drives = _ExpiringCache(self._drive_is_reachable, time_to_live, clock)
+        self.listings = 0
+        self.stats = 0
+
+    def check(self, target: pathlib.Path) -> LinkTarget:
+        """Return whether the target exists and whether it is a directory."""
+        directory, name = os.path.split(str(target))
+        if not name or not directory:
+            return self._stat(target)
+        anchor = target.anchor
+        if anchor and not self._drives.get(anchor):
+            return LinkTarget(target, False, False, known=False)
+        names = self._listings.get(directory)
+        if names is not None:
+            is_dir = names.get(os.path.normcase(name))
+            if is_dir is not None:
+                return LinkTarget(target, True, is_dir)
+        return self._stat(target)
+
+    def _stat(self, target: pathlib.Path) -> LinkTarget:
+        """Read the metadata of the target itself."""
+        with self._lock:
+            self.stats += 1
+        self._before_read()
+        return stat_target(target)
+
+    def _drive_is_reachable(self, anchor: str) -> bool:
+        """Return whether the root of a drive or network share can be read."""
+        with self._lock:
+            self.stats += 1
+        self._before_read()
+        return os.path.isdir(anchor)
+
+    def _list(self, directory: str) -> Optional[Dict[str, bool]]:
+        """Return whether the items of the directory are directories by their normalized names.
+
+        A directory that does not exist has no items, None is returned if it could not be read.
+        Symbolic links are left out, so that their targets are checked on their own.
+        """
+        with self._lock:
+            self.listings += 1
+        self._before_read()
+        try:
+            with os.scandir(directory) as items:
+                return {os.path.normcase(item.name): item.is_dir()
+                        for item in items if not item.is_symlink()}
+        except (FileNotFoundError, NotADirectoryError):
+            return {}
+        except OSError:
+            return None
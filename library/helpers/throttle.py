@@ -0,0 +1,96 @@
+"""Limit how fast the start menu is read and changed and lower the priority of the process."""
+import ctypes
+import functools
+import logging
+import os
+import sys
+import threading
+import time
+from typing import Callable
+
+Clock = Callable[[], float]
+Sleep = Callable[[float], object]
+
+# Lowers the CPU, I/O and memory priority of the whole process until it ends
+_PROCESS_MODE_BACKGROUND_BEGIN = 0x00100000
+_LOW_PRIORITY_NICENESS = 10
+
+
+class TokenBucket:
+    """Lets operations through at a rate per second with bursts of up to a number of operations.
+
+    Every operation takes a token and tokens are added at the rate up to the burst. An
+    operation that finds no token reserves the next one and has to wait until it is added,
+    so threads that share a bucket are let through one after another in the order they came.
+    With a rate of 0 every operation is let through right away. The burst defaults to the
+    operations of one second.
+    """
+    def __init__(self, rate: float, burst: float = 0, clock: Clock = time.monotonic) -> None:
+        self.rate = rate
+        self._burst = burst or max(rate, 1)
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._tokens = self._burst
+        self._updated = clock()
+        self.waited = 0.0
+
+    def take(self) -> float:
+        """Take a token and return how many seconds to wait until it is available."""
+        if self.rate <= 0:
+            return 0
+        with self._lock:
+            now = self._clock()
+            self._tokens = min(self._burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= 1
+            wait = -self._tokens / self.rate if self._tokens < 0 else 0
+            self.waited += wait
+        return wait
+
+
+class Throttle:
+    """Separate limits for reading the start menu and for changing it.
+
+    Waiting is done with the sleep function, which may return early, e.g. when the cleaning
+    is stopped.
+    """
+    def __init__(self, reads_per_second: float = 0, changes_per_second: float = 0,
+                 clock: Clock = time.monotonic, sleep: Sleep = time.sleep) -> None:
+        self.reads = TokenBucket(reads_per_second, clock=clock)
+        self.changes = TokenBucket(changes_per_second, clock=clock)
+        self._sleep = sleep
+
+    def _wait(self, bucket: TokenBucket) -> None:
+        """Wait until the bucket lets the next operation through."""
+        wait = bucket.take()
+        if wait > 0:
+            self._sleep(wait)
+
+    def read(self) -> None:
+        """Wait until the start menu may be read again."""
+        self._wait(self.reads)
+
+    def change(self) -> None:
+        """Wait until the start menu may be changed again."""
+        self._wait(self.changes)
+
+
+@functools.lru_cache(maxsize=1)
+def lower_priority() -> bool:
+    """Lower the CPU and I/O priority of the process once and return whether it worked.
+
+    On Windows the process enters the background mode. Elsewhere its niceness is raised,
+    which on Linux also lowers its I/O priority unless one was set explicitly.
+    """
+    try:
+        if sys.platform == "win32":
+            kernel32 = ctypes.windll.kernel32
+            if not kernel32.SetPriorityClass(kernel32.GetCurrentProcess(), _PROCESS_MODE_BACKGROUND_BEGIN):
+                raise ctypes.WinError()
+        else:
+            os.nice(_LOW_PRIORITY_NICENESS)
+    except OSError as error:
+        logging.warning("Could not lower the priority: %s", error)
+        return False
+    logging.debug("Lowered the priority")
+    return True
@@ -0,0 +1,300 @@
+"""A snapshot of directory trees that is shared by all rules of a cleaning cycle."""
+import logging
+import os
+import pathlib
+import sys
+import threading
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+from library.helpers.directory_manifest import DirectoryManifest, Item
+from library.helpers.work_stealing import WorkStealingPool
+
+DIRECTORY = 0
+FILE = 1
+SYMLINK = 2
+
+
+class Entry:
+    """A directory, file or symbolic link inside a TreeSnapshot."""
+    __slots__ = ("name", "kind", "parent", "children", "mtime_ns", "size")
+
+    def __init__(self, name: str, kind: int, parent: Optional["Entry"],
+                 mtime_ns: int = 0, size: int = 0) -> None:
+        self.name: str = sys.intern(name)
+        self.kind = kind
+        self.parent = parent
+        self.children: Optional[Dict[str, "Entry"]] = {} if kind == DIRECTORY else None
+        self.mtime_ns = mtime_ns
+        self.size = size
+
+    def __repr__(self) -> str:
+        return f"Entry({str(self.path)!r})"
+
+    @property
+    def path(self) -> pathlib.Path:
+        """Return the current path of the entry."""
+        names = []
+        entry: Entry = self
+        while entry.parent is not None:
+            names.append(entry.name)
+            entry = entry.parent
+        if not isinstance(entry, RootEntry):
+            raise ValueError(f"{self.name} is no longer part of the snapshot")
+        return entry.location.joinpath(*reversed(names))
+
+    @property
+    def is_directory(self) -> bool:
+        """Return whether the entry is a directory."""
+        return self.kind == DIRECTORY
+
+    @property
+    def is_link(self) -> bool:
+        """Return whether the entry is a symbolic link or a windows shortcut."""
+        return self.kind == SYMLINK or (self.kind == FILE and self.name.endswith(".lnk"))
+
+    @property
+    def exists(self) -> bool:
+        """Return whether the entry is still part of the snapshot."""
+        entry: Entry = self
+        while entry.parent is not None:
+            entry = entry.parent
+        return isinstance(entry, RootEntry)
+
+
+class RootEntry(Entry):
+    """The root directory of a tree inside a TreeSnapshot.
+
+    The parent directory of a root can be read as a root of its own that is not part of the
+    snapshot. Its owner is the root of the snapshot that its entries are moved into.
+    """
+    __slots__ = ("location", "owner")
+
+    def __init__(self, location: pathlib.Path, owner: Optional["RootEntry"] = None) -> None:
+        super().__init__(location.name, DIRECTORY, None)
+        self.location = location
+        self.owner: RootEntry = owner or self
+
+
+def _key(name: str) -> str:
+    """Return the key under which an entry is stored in its parent."""
+    return os.path.normcase(name)
+
+
+# A directory of the snapshot together with its path
+_Task = Tuple[Entry, str]
+
+
+class TreeSnapshot:
+    """All entries of one or more directory trees, read in a single walk.
+
+    Rules that change the file system have to update the snapshot using move() and remove()
+    so that the following rules see the current state without listing the directories again.
+    The changed attribute tells whether any directory had to be listed because it was not
+    recorded in the manifest or changed since then. The number of entries, directory listings
+    and stats that reading the trees took are counted.
+    With more than one worker the trees are read concurrently. With parallel traversal every
+    single directory is read as a task of its own, so that a single big tree is read by all
+    workers. Each directory is only ever filled by the task that lists it and the items are
+    sorted, so the snapshot is the same no matter in which order the tasks run.
+    The checkpoint is called before every directory is read and can stop the reading by
+    raising an exception. Roots that can not be read are logged and left out of the snapshot.
+    """
+
+    def __init__(self, roots: Iterable[pathlib.Path], manifest: Optional[DirectoryManifest] = None,
+                 workers: int = 1, parallel_traversal: bool = False,
+                 checkpoint: Optional[Callable[[], None]] = None) -> None:
+        self.changed = False
+        self.entries = 0
+        self.listings = 0
+        self.stats = 0
+        self._manifest = manifest
+        self._checkpoint = checkpoint
+        self._lock = threading.Lock()
+        self._modified_directories: Set[Entry] = set()
+        self.roots: List[RootEntry] = []
+        for root in roots:
+            self.stats += 1
+            try:
+                mtime_ns = os.stat(root).st_mtime_ns
+            except OSError as error:
+                logging.warning("Could not read %s: %s", root, error)
+                continue
+            root_entry = RootEntry(root)
+            root_entry.mtime_ns = mtime_ns
+            self.roots.append(root_entry)
+
+        tasks: List[_Task] = [(root, os.fspath(root.location)) for root in self.roots]
+        if workers > 1 and (parallel_traversal or len(tasks) > 1):
+            process = self._read_directory if parallel_traversal else self._read_subtree
+            WorkStealingPool[_Task](workers).run(tasks, process)
+        else:
+            for task in tasks:
+                self._read_subtree(task)
+
+    def _read_subtree(self, task: _Task) -> List[_Task]:
+        """Read the whole tree below the directory of the task."""
+        pending = [task]
+        while pending:
+            pending.extend(self._read_directory(pending.pop()))
+        return []
+
+    def _read_directory(self, task: _Task) -> List[_Task]:
+        """Read the items of one directory and return the tasks for its subdirectories.
+
+        Directories that did not change since they were recorded in the manifest are not listed.
+        """
+        if self._checkpoint is not None:
+            self._checkpoint()
+        directory, directory_path = task
+        items = self._manifest.lookup(directory_path, directory.mtime_ns) if self._manifest else None
+        from_manifest = items is not None
+        changed = False
+        listings, stats = 0, 0
+        if items is None:
+            changed = True
+            items = self._list_directory(directory_path)
+            listings += 1
+            stats += len(items)
+        subdirectories = []
+        for name, kind, mtime_ns, size in items:
+            entry = Entry(name, kind, directory, mtime_ns, size)
+            item_path = os.path.join(directory_path, name)
+            if kind == DIRECTORY:
+                if from_manifest:
+                    try:
+                        stats += 1
+                        entry.mtime_ns = os.stat(item_path).st_mtime_ns
+                    except FileNotFoundError:
+                        changed = True
+                        continue
+                subdirectories.append((entry, item_path))
+            directory.children[_key(name)] = entry  # type: ignore[index]
+        with self._lock:
+            self.changed = self.changed or changed
+            self.entries += len(items)
+            self.listings += listings
+            self.stats += stats
+        return subdirectories
+
+    @staticmethod
+    def _list_directory(directory: str) -> List[Item]:
+        """Return the names, kinds, modification times and sizes of the items in a directory."""
+        items = []
+        with os.scandir(directory) as listing:
+            for item in listing:
+                if item.is_symlink():
+                    kind = SYMLINK
+                elif item.is_dir():
+                    kind = DIRECTORY
+                elif item.is_file():
+                    kind = FILE
+                else:
+                    continue
+                stat = item.stat(follow_symlinks=False)
+                items.append((item.name, kind, stat.st_mtime_ns, stat.st_size))
+        items.sort()
+        return items
+
+    def unmodified_directories(self) -> Dict[str, Tuple[int, List[Item]]]:
+        """Return the modification times and items of all directories that were not modified.
+
+        Directories that were modified since the snapshot was read are left out, so they are
+        listed again the next time the tree is read using a manifest.
+        """
+        directories = {}
+        for root in self.roots:
+            for directory in [root, *self.directories(root)]:
+                if directory in self._modified_directories:
+                    continue
+                directories[os.fspath(directory.path)] = (
+                    directory.mtime_ns,
+                    [(item.name, item.kind, item.mtime_ns, item.size)
+                     for item in self.children(directory)]
+                )
+        return directories
+
+    def siblings(self, root: RootEntry) -> List[Entry]:
+        """Return the entries next to the root in its parent directory.
+
+        The entries are not part of the snapshot until they are moved into it. The trees of
+        directories are read as well, so they are complete once they are moved.
+        """
+        parent = RootEntry(root.location.parent, root)
+        parent_path = os.fspath(parent.location)
+        try:
+            items = self._list_directory(parent_path)
+        except OSError as error:
+            logging.warning("Could not read %s: %s", parent_path, error)
+            return []
+        self.entries += len(items)
+        self.listings += 1
+        self.stats += len(items)
+        for name, kind, mtime_ns, size in items:
+            if _key(name) == _key(root.name):
+                continue
+            entry = Entry(name, kind, parent, mtime_ns, size)
+            parent.children[_key(name)] = entry  # type: ignore[index]
+            if kind == DIRECTORY:
+                self._read_subtree((entry, os.path.join(parent_path, name)))
+        return self.children(parent)
+
+    def root(self, location: pathlib.Path) -> RootEntry:
+        """Return the root entry for the location."""
+        for root in self.roots:
+            if root.location == location:
+                return root
+        raise KeyError(location)
+
+    @staticmethod
+    def children(directory: Entry) -> List[Entry]:
+        """Return the entries directly inside the directory."""
+        return list(directory.children.values()) if directory.children else []
+
+    @staticmethod
+    def _descendants(directory: Entry) -> Iterator[Entry]:
+        """Iterate over all entries below the directory in pre-order."""
+        pending = [iter(list(directory.children.values()))] if directory.children else []
+        while pending:
+            entry = next(pending[-1], None)
+            if entry is None:
+                pending.pop()
+                continue
+            yield entry
+            if entry.children:
+                pending.append(iter(list(entry.children.values())))
+
+    def directories(self, root: Entry) -> List[Entry]:
+        """Return all directories below root in pre-order."""
+        return [entry for entry in self._descendants(root) if entry.kind == DIRECTORY]
+
+    def files(self, root: Entry) -> List[Entry]:
+        """Return all files and symbolic links below root."""
+        return [entry for entry in self._descendants(root) if entry.kind != DIRECTORY]
+
+    def links(self, root: Entry) -> List[Entry]:
+        """Return all symbolic links and windows shortcuts below root."""
+        return [entry for entry in self._descendants(root) if entry.is_link]
+
+    def move(self, entry: Entry, destination: Entry) -> None:
+        """Record that the entry was moved into the destination directory.
+
+        An entry with the same name in the destination is replaced.
+        """
+        if entry.parent is not None and entry.parent.children is not None:
+            entry.parent.children.pop(_key(entry.name), None)
+            self._modified_directories.add(entry.parent)
+        if destination.children is None:
+            raise ValueError(f"{destination.name} is not a directory")
+        replaced = destination.children.get(_key(entry.name))
+        if replaced is not None:
+            replaced.parent = None
+        destination.children[_key(entry.name)] = entry
+        entry.parent = destination
+        self._modified_directories.add(destination)
+
+    def remove(self, entry: Entry) -> None:
+        """Record that the entry was deleted."""
+        if entry.parent is not None and entry.parent.children is not None:
+            entry.parent.children.pop(_key(entry.name), None)
+            self._modified_directories.add(entry.parent)
+        entry.parent = None
@@ -1,22 +1,45 @@
 """Work with windows shortcuts."""
 import pathlib
-from typing import Optional
+from typing import Optional, Tuple
 
-import pythoncom
-import win32com.client
+from library.helpers import shell_link
 
 
-def is_shortcut(file: pathlib.WindowsPath) -> bool:
+def is_shortcut(file: pathlib.Path) -> bool:
     """Determines whether a file is a windows shortcut."""
     return file.name.endswith(".lnk")
 
 
-def read_shortcut(link: pathlib.WindowsPath) -> pathlib.WindowsPath:
+def read_shortcut(link: pathlib.Path) -> pathlib.Path:
     """Read the destination of a windows shortcut file."""
+    return read_shortcut_and_arguments(link)[0]
+
+
+def read_shortcut_and_arguments(link: pathlib.Path) -> Tuple[pathlib.Path, str]:
+    """Read the destination and the command line arguments of a windows shortcut file.
+
+    The file is parsed directly and COM is only used for shortcuts whose target can not be
+    read from the file itself, e.g. advertised shortcuts of Windows Installer packages.
+    """
+    try:
+        parsed_link = shell_link.read(link)
+    except (OSError, shell_link.ShellLinkError):
+        parsed_link = None
+    if parsed_link and parsed_link.target and not parsed_link.advertised:
+        return pathlib.Path(parsed_link.target), parsed_link.arguments
+    return _read_shortcut_using_com(link)
+
+
+def _read_shortcut_using_com(link: pathlib.Path) -> Tuple[pathlib.Path, str]:
+    """Read a windows shortcut file using the WScript.Shell COM object."""
+    # pylint: disable=C0415
+    import pythoncom
+    import win32com.client
+
     pythoncom.CoInitialize()  # pylint: disable=E1101
     shell = win32com.client.Dispatch("WScript.Shell")
     shortcut = shell.CreateShortCut(str(link))
-    return pathlib.WindowsPath(shortcut.Targetpath)
+    return pathlib.Path(shortcut.Targetpath), shortcut.Arguments
 
 
 def create_shortcut(
@@ -25,6 +48,8 @@ def create_shortcut(
         arguments: Optional[str] = ""
 ) -> None:
     """Create a windows shortcut file."""
+    import win32com.client  # pylint: disable=C0415
+
     shell = win32com.client.Dispatch('WScript.Shell')
     shortcut = shell.CreateShortCut(str(link_path))
     shortcut.Targetpath = str(item_to_link_to)
@@ -0,0 +1,83 @@
+"""Run tasks that create more tasks on threads that steal work from each other."""
+import collections
+import threading
+from typing import Callable, Deque, Generic, Iterable, List, Optional, TypeVar
+
+T = TypeVar("T")
+
+
+class WorkStealingPool(Generic[T]):
+    """Processes tasks that can add new tasks, e.g. directories that contain more directories.
+
+    Every worker takes the newest task of its own queue first, so it keeps working on the part
+    of the tree it already is in. Workers without tasks steal the oldest task of another
+    worker, which usually is the biggest piece of work that is left.
+    """
+    def __init__(self, workers: int) -> None:
+        self._workers = max(1, workers)
+        self._condition = threading.Condition()
+        self._queues: List[Deque[T]] = []
+        self._outstanding = 0
+        self._error: Optional[BaseException] = None
+
+    def run(self, tasks: Iterable[T], process: Callable[[T], Iterable[T]]) -> None:
+        """Process the tasks and all tasks they add until none are left.
+
+        The first exception raised by process stops all workers and is raised again.
+        """
+        self._queues = [collections.deque() for _ in range(self._workers)]
+        self._outstanding = 0
+        self._error = None
+        for index, task in enumerate(tasks):
+            self._queues[index % self._workers].append(task)
+            self._outstanding += 1
+        threads = [threading.Thread(target=self._work, args=(index, process), daemon=True)
+                   for index in range(1, self._workers)]
+        for thread in threads:
+            thread.start()
+        self._work(0, process)
+        for thread in threads:
+            thread.join()
+        if self._error is not None:
+            raise self._error
+
+    def _take(self, index: int) -> Optional[T]:
+        """Return the newest task of the worker or steal the oldest task of another worker."""
+        try:
+            return self._queues[index].pop()
+        except IndexError:
+            pass
+        for offset in range(1, self._workers):
+            try:
+                return self._queues[(index + offset) % self._workers].popleft()
+            except IndexError:
+                continue
+        return None
+
+    def _work(self, index: int, process: Callable[[T], Iterable[T]]) -> None:
+        """Process tasks until all tasks are done or one of them failed."""
+        while True:
+            task = self._take(index)
+            if task is None:
+                with self._condition:
+                    if self._outstanding == 0 or self._error is not None:
+                        return
+                    # Tasks are only added while holding the lock, so none can be missed here
+                    if not any(self._queues):
+                        self._condition.wait()
+                continue
+            try:
+                new_tasks = list(process(task))
+            except BaseException as error:  # pylint: disable=W0703
+                with self._condition:
+                    if self._error is None:
+                        self._error = error
+                    self._condition.notify_all()
+                return
+            with self._condition:
+                self._queues[index].extend(new_tasks)
+                self._outstanding += len(new_tasks) - 1
+                if self._outstanding == 0:
+                    self._condition.notify_all()
+                elif new_tasks:
+                    self._condition.notify(len(new_tasks))
@@ -1,29 +1,64 @@
 """Reorganize the start menu folder."""
+import glob
+import json
 import logging
-import re
+import os
+import pathlib
+import sqlite3
 import time
+from typing import Callable, Dict, Hashable, Iterator, List, Optional, Tuple
 
 from library import constants
-from library.configuration import Configuration
+from library.configuration import Configuration, ConfigurationSnapshot
 from library.helpers import windows_shortcuts
-from library.helpers.file_system import (
-    get_nested_directories,
-    get_nested_files,
-    get_nested_links,
-    resolve_files,
-    file_is_writable
-)
+from library.helpers.cancellation import Checkpoint, CycleCancelled
+from library.helpers.cleaning_plan import CleaningPlan
+from library.helpers.directory_manifest import DirectoryManifest
+from library.helpers.file_system import LinkTarget, file_is_writable, resolve_links
+from library.helpers.file_system_watcher import FileSystemWatcher, create_watcher
+from library.helpers.history import HistoryAction, HistoryStore
+from library.helpers.metrics import (ACTIONS, DIRECTORY_LISTINGS, ENTRIES_VISITED, FAILED_ACTIONS,
+                                     RESOLVE_LINKS, SHORTCUT_RESOLUTIONS, SKIPPED_ACTIONS, STATS,
+                                     CycleStatistics, MetricsRegistry)
+from library.helpers.operation_journal import OperationJournal
+from library.helpers.rule_pipeline import Cursor, Details, Rule, RulePipeline
+from library.helpers.scan_scheduler import ScanScheduler
+from library.helpers.shortcut_cache import ShortcutCache
 from library.helpers.stopable_thread import StoppableThread
+from library.helpers.target_oracle import TargetOracle
+from library.helpers.throttle import Throttle, lower_priority
+from library.helpers.tree_snapshot import DIRECTORY, SYMLINK, Entry, RootEntry, TreeSnapshot
+
+# The location of a programs directory and the names of the path below it
+SavedCursor = Tuple[str, Tuple[str, ...]]
 
 
 class StartMenuHelper:
     """Starts and stops cleaning."""
     def __init__(self, config: Configuration) -> None:
         self._config = config
+        self._current_settings: Optional[ConfigurationSnapshot] = None
         self._cleaner_thread: StoppableThread = StoppableThread()
+        self._scheduler = self._create_scheduler()
+        self._snapshot: Optional[TreeSnapshot] = None
+        self._current_plan: Optional[CleaningPlan] = None
+        self._manifest: Optional[DirectoryManifest] = None
+        self._shortcut_cache: Optional[ShortcutCache] = None
+        self._operation_journal: Optional[OperationJournal] = None
+        self._start_menus: List[pathlib.Path] = list(constants.START_MENU_PATHS)
+        self.metrics = MetricsRegistry()
+        self._statistics = CycleStatistics()
+        self._history_actions: List[HistoryAction] = []
+        self._target_oracle = TargetOracle(before_read=self._before_read)
+        self._checkpoint = Checkpoint()
+        self._throttle = Throttle()
+        self._cursor: Optional[SavedCursor] = None
+        self._cursor_loaded = False
+        self._priority_lowered = False
 
     def start_cleaning(self) -> None:
         """Starts the cleaning based on the configuration."""
+        self._scheduler = self._create_scheduler()
         self._cleaner_thread = StoppableThread(target=self._clean, daemon=True)
         self._cleaner_thread.start()
         logging.debug("Cleaning started")
@@ -31,190 +66,719 @@ class StartMenuHelper:
     def stop_cleaning(self) -> None:
         """Stops the cleaning."""
         self._cleaner_thread.stop()
+        self._scheduler.stop()
         self._cleaner_thread.join()
 
+    def scan_now(self) -> None:
+        """Start the next scan right away instead of waiting for it."""
+        self._scheduler.trigger()
+
+    @staticmethod
+    def _create_scheduler() -> ScanScheduler:
+        """Create the scheduler that decides when the next scan happens."""
+        return ScanScheduler(
+            constants.TIME_BETWEEN_SCANS_IN_MINUTES * 60,
+            adaptive=True,
+            jitter=constants.SCAN_INTERVAL_JITTER
+        )
+
     def _clean(self) -> None:
         """Cleans based on configuration.
 
         This method is supposed to be run by the _cleaner_thread.
         """
-        self._config.reload()
-        while not self._cleaner_thread.stopped():
-            self.move_files_to_programs_directory()
-
-            self.delete_files_with_names_containing()
-            cleaning_functions = {
-                self.delete_files_matching_file_types:
-                    self._config.get("delete_files_based_on_file_type_str") == "in the list",
-                self.delete_files_not_matching_file_types:
-                    self._config.get("delete_files_based_on_file_type_str") == "not in the list",
-                self.delete_broken_links:
-                    self._config.get("delete_broken_links_bool"),
-                self.delete_links_to_folders:
-                    self._config.get("delete_links_to_folders_bool"),
-                self.delete_duplicates:
-                    self._config.get("delete_duplicates_bool"),
-                self.flatten_folders_with_whitelist:
-                    self._config.get("flatten_folders_list_type_str") == "whitelist",
-                self.flatten_folders_with_blacklist:
-                    self._config.get("flatten_folders_list_type_str") == "blacklist",
-                self.flatten_folders_containing_one_file:
-                    self._config.get("flatten_folders_containing_only_one_item_bool"),
-                self.delete_empty_folders:
-                    self._config.get("delete_empty_folders_bool")
-            }
-
-            for function, turned_on in cleaning_functions.items():
-                if turned_on:
-                    function()
-
-            for _ in range(constants.TIME_BETWEEN_SCANS_IN_MINUTES * 60 * 1000):
-                if not self._cleaner_thread.stopped():
-                    time.sleep(0.001)
+        watcher: Optional[FileSystemWatcher] = None
+        try:
+            while not self._cleaner_thread.stopped():
+                try:
+                    changed = self.run_cycle()
+                except CycleCancelled:
+                    logging.debug("Cleaning stopped in the middle of a cycle")
+                    break
+                except Exception:  # pylint: disable=W0703
+                    logging.exception("Cleaning cycle failed, trying again at the next scan")
+                    changed = False
+                self._scheduler.configure(
+                    int(self._settings.get("time_between_scans_in_minutes_int")) * 60,
+                    bool(self._settings.get("adaptive_scan_interval_bool"))
+                )
+                self._scheduler.record_scan(changed)
+                logging.debug("Next scan in %.0f seconds", self._scheduler.seconds_until_next_scan())
+
+                watcher = self._update_watcher(watcher)
+                if watcher:
+                    watcher.clear()  # Ignore the changes made by the cycle itself
+                    self._wait_for_changes(watcher)
+                else:
+                    self._scheduler.wait()
+        finally:
+            if watcher:
+                watcher.close()
+
+    def _load_cursor(self) -> None:
+        """Read where the last cycle stopped because it took longer than its time budget."""
+        self._cursor_loaded = True
+        self._cursor = None
+        try:
+            with self._config.directory.joinpath(constants.CURSOR_FILE_NAME).open(encoding="utf-8") as file:
+                cursor = json.load(file)
+            self._cursor = (str(cursor["root"]), tuple(str(name) for name in cursor["path"]))
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError, KeyError, TypeError) as error:
+            logging.warning("Could not read where the last cycle stopped: %s", error)
+
+    def _save_cursor(self) -> None:
+        """Write where the current cycle stopped or delete the file if it handled everything."""
+        file = self._config.directory.joinpath(constants.CURSOR_FILE_NAME)
+        try:
+            if self._cursor is None:
+                if file.exists():
+                    file.unlink()
+                return
+            temporary_file = file.with_suffix(".tmp")
+            with temporary_file.open("w", encoding="utf-8") as output:
+                json.dump({"root": self._cursor[0], "path": list(self._cursor[1])}, output)
+            os.replace(temporary_file, file)
+        except OSError as error:
+            logging.warning("Could not write where the cycle stopped: %s", error)
+
+    def _update_watcher(self, watcher: Optional[FileSystemWatcher]) -> Optional[FileSystemWatcher]:
+        """Return a watcher of the current start menus if watching for changes is turned on."""
+        watch_for_changes = bool(self._settings.get("watch_for_changes_bool"))
+        if watcher and (not watch_for_changes or watcher.directories != self._start_menus):
+            watcher.close()
+            watcher = None
+        if watch_for_changes and watcher is None:
+            watcher = create_watcher(self._start_menus, constants.WATCHER_POLLING_INTERVAL_IN_SECONDS)
+        return watcher
+
+    def run_cycle(self) -> bool:
+        """Run one cycle, record its metrics and return whether anything was changed."""
+        self._prepare_cycle()
+        self._statistics = CycleStatistics()
+        self._history_actions = []
+        start = time.perf_counter()
+        try:
+            return self._clean_once()
+        finally:
+            self._statistics.seconds = time.perf_counter() - start
+            self.metrics.record(self._statistics)
+            if self._settings.get("write_metrics_bool"):
+                self._save_metrics()
+            if self._settings.get("history_bool"):
+                self._save_history()
+
+    def _prepare_cycle(self) -> None:
+        """Lower the priority and wait before the first cycle if the configuration asks for it.
+
+        The priority is lowered at most once, because it can not be raised again anyway.
+        """
+        if self._settings.get("low_priority_bool") and not self._priority_lowered:
+            self._priority_lowered = lower_priority()
+        first_cycle_delay = int(self._settings.get("first_cycle_delay_in_seconds_int"))
+        if self.metrics.cycles == 0 and first_cycle_delay > 0:
+            logging.debug("Starting the first cycle in %d seconds", first_cycle_delay)
+            if self._cleaner_thread.wait(first_cycle_delay):
+                raise CycleCancelled()
+
+    def _save_metrics(self) -> None:
+        """Write the metrics to the configuration directory."""
+        try:
+            self.metrics.save(
+                self._config.directory.joinpath(constants.METRICS_FILE_NAME),
+                self._config.directory.joinpath(constants.PROMETHEUS_METRICS_FILE_NAME)
+            )
+        except OSError as error:
+            logging.warning("Could not write the metrics: %s", error)
+
+    @property
+    def history(self) -> HistoryStore:
+        """Return the history of all cycles and their changes."""
+        return HistoryStore(
+            self._config.directory.joinpath(constants.HISTORY_FILE_NAME),
+            int(self._settings.get("history_retention_in_days_int"))
+        )
+
+    def _save_history(self) -> None:
+        """Record the summary and the changes of the current cycle in the history."""
+        try:
+            self.history.record(self._statistics, self._history_actions)
+        except sqlite3.Error as error:
+            logging.warning("Could not write the history: %s", error)
+
+    def _clean_once(self) -> bool:
+        """Apply all rules that are turned on once and return whether anything was changed.
+
+        With incremental scanning only the rules that check the targets of links are applied if
+        neither the start menu nor the configuration changed since the last cycle and the last
+        full scan is not too long ago.
+        If the last cycle ran out of its time budget, this cycle continues where it stopped.
+        """
+        self._update_settings()
+        self._checkpoint = Checkpoint(self._cleaner_thread.stopped,
+                                      int(self._settings.get("time_budget_in_seconds_int")))
+        self._throttle = Throttle(int(self._settings.get("reads_per_second_int")),
+                                  int(self._settings.get("changes_per_second_int")),
+                                  sleep=self._cleaner_thread.wait)
+        if not self._cursor_loaded:
+            self._load_cursor()
+        journal = self._journal()
+
+        manifest = None
+        if self._settings.get("incremental_scanning_bool"):
+            if self._manifest is None:
+                self._manifest = DirectoryManifest(
+                    self._config.directory.joinpath(constants.MANIFEST_FILE_NAME)
+                )
+            manifest = self._manifest
+        fingerprint = self._settings.fingerprint
+        full_scan = (manifest is None or
+                     manifest.fingerprint != fingerprint or
+                     time.time() - manifest.full_scan_time >
+                     constants.FULL_SCAN_INTERVAL_IN_HOURS * 60 * 60)
+        plan = self._plan_cycle(None if full_scan else manifest, self._cursor)
+        if plan is None:
+            logging.debug("Start menu did not change since the last cycle and no rule checks the targets of links")
+            return False
+
+        self._execute(plan, journal)
+        self._checkpoint.check()
+        self._save_cursor()
+        if self._cursor is not None:
+            logging.debug("Cycle ran out of time, continuing at %s next cycle", os.path.join(*self._cursor[1]))
+
+        if self._shortcut_cache:
+            logging.debug("Shortcut cache: %d hits, %d misses",
+                          self._shortcut_cache.hits, self._shortcut_cache.misses)
+            self._save_shortcut_cache(self._shortcut_cache)
+
+        if manifest and (full_scan or self._tree.changed or plan):
+            manifest.fingerprint = fingerprint
+            if full_scan:
+                manifest.full_scan_time = time.time()
+            self._save_manifest(manifest)
+        self._snapshot = None
+        self._current_plan = None
+        return len(plan) > 0
+
+    @staticmethod
+    def _save_shortcut_cache(shortcut_cache: ShortcutCache) -> None:
+        """Write the shortcut cache to the configuration directory."""
+        try:
+            shortcut_cache.save()
+        except OSError as error:
+            logging.warning("Could not write the shortcut cache: %s", error)
+
+    def _save_manifest(self, manifest: DirectoryManifest) -> None:
+        """Write the directories of the start menu that were not modified to the manifest."""
+        try:
+            manifest.save(self._tree.unmodified_directories())
+        except OSError as error:
+            logging.warning("Could not write the directory manifest: %s", error)
+
+    def _execute(self, plan: CleaningPlan, journal: Optional[OperationJournal]) -> None:
+        """Apply the plan and record its results in the statistics and the history."""
+        applied, skipped = plan.execute(self._workers, journal, self._checkpoint.stopped, self._throttle.change)
+        self._statistics.count(ACTIONS, applied)
+        self._statistics.count(SKIPPED_ACTIONS, skipped)
+        self._statistics.count(FAILED_ACTIONS, plan.failed)
+        if self._settings.get("history_bool"):
+            self._history_actions.extend(
+                HistoryAction(operation.rule, operation.kind, recorded_operation.path, recorded_operation.destination,
+                              applied, operation.describe(recorded_operation.path, recorded_operation.destination))
+                for operation, recorded_operation, applied in plan.results()
+            )
+        logging.debug("Applied %d of %d planned operations, skipped %d",
+                      applied, len(plan), skipped)
+        if self._throttle.reads.waited or self._throttle.changes.waited:
+            logging.debug("Reads waited %.1f seconds and changes waited %.1f seconds in total for the throttle",
+                          self._throttle.reads.waited, self._throttle.changes.waited)
+
+    def _plan_cycle(self, manifest: Optional[DirectoryManifest],
+                    cursor: Optional[SavedCursor] = None) -> Optional[CleaningPlan]:
+        """Plan the operations of all rules that are turned on without changing anything.
+
+        Files next to the programs directories are moved into them first. If there are no such
+        files, the manifest shows that the start menu did not change and there is no cursor of a
+        cycle that ran out of time, only the rules that check the targets of links are applied,
+        because links break when their targets are removed without the start menu changing.
+        None is returned if there are no such rules. The rules for folders are then only applied
+        if a link was deleted. With a cursor only the links at or after it are resolved. Where
+        the rules stopped this time is kept as the cursor of the next cycle.
+        """
+        self._snapshot = TreeSnapshot(
+            self._programs_directories,
+            manifest,
+            self._workers,
+            bool(self._settings.get("parallel_traversal_bool")),
+            self._before_directory_read
+        )
+        self._current_plan = None
+        self.move_files_to_programs_directory()
+        self._statistics.count(ENTRIES_VISITED, self._snapshot.entries)
+        self._statistics.count(DIRECTORY_LISTINGS, self._snapshot.listings)
+        self._statistics.count(STATS, self._snapshot.stats)
+        unchanged = not self._snapshot.changed and cursor is None and not self._plan
+        file_rules = self._file_rules()
+        if unchanged:
+            file_rules = [rule for rule in file_rules if rule.needs_target]
+            if not file_rules:
+                self._snapshot = None
+                return None
+
+        pipeline = RulePipeline(file_rules, self._directory_rules(), self._statistics, self._plan,
+                                self._checkpoint.check)
+        listings, stats = self._target_oracle.listings, self._target_oracle.stats
+        self._checkpoint.start_budget()  # Reading the tree must not use up the time for resolving links
+        stopped_at = pipeline.run_file_rules(self._tree, self._resolve_all, self._tree_cursor(cursor),
+                                             self._checkpoint.over_budget)
+        self._cursor = None
+        if stopped_at is not None:
+            root_index, names = stopped_at
+            self._cursor = (os.fspath(self._tree.roots[root_index].location), names)
+        listings, stats = self._target_oracle.listings - listings, self._target_oracle.stats - stats
+        resolution = self._statistics.rule(RESOLVE_LINKS)
+        resolution.directory_listings += listings
+        resolution.stats += stats
+        self._statistics.count(DIRECTORY_LISTINGS, listings)
+        self._statistics.count(STATS, stats)
+        if unchanged:
+            logging.debug("Start menu did not change since the last cycle, only checked the targets of links")
+            if not self._plan:
+                return self._plan
+        elif self._settings.get("delete_duplicates_bool"):
+            self.delete_duplicates()
+        pipeline.run_directory_rules(self._tree)
+        return self._plan
+
+    def _tree_cursor(self, cursor: Optional[SavedCursor]) -> Optional[Cursor]:
+        """Return the cursor in the current snapshot or None if its start menu is not cleaned anymore."""
+        if cursor is None:
+            return None
+        location, names = cursor
+        for root_index, root in enumerate(self._tree.roots):
+            if os.fspath(root.location) == location:
+                return root_index, names
+        return None
+
+    def dry_run(self) -> List[str]:
+        """Return a description of every change one cycle would make without changing anything."""
+        self._update_settings()
+        self._checkpoint = Checkpoint()
+        self._throttle = Throttle()
+        descriptions: List[str] = []
+        plan = self._plan_cycle(None)
+        if plan is not None:
+            descriptions.extend("Would apply: " + operation.describe() for operation in plan.operations)
+        self._snapshot = None
+        self._current_plan = None
+        return descriptions
+
+    @property
+    def _settings(self) -> ConfigurationSnapshot:
+        """Return the configuration that the current cycle uses."""
+        if self._current_settings is None:
+            self._current_settings = self._config.snapshot()
+        return self._current_settings
+
+    def _update_settings(self) -> None:
+        """Switch to the saved configuration if it changed since the last cycle."""
+        settings = self._config.snapshot()
+        if self._current_settings is not None and settings is not self._current_settings:
+            logging.info("Configuration changed, using the new configuration")
+        self._current_settings = settings
+        self._start_menus = self._find_start_menus()
+
+    def _find_start_menus(self) -> List[pathlib.Path]:
+        """Return the start menus that are cleaned with the one of all users first.
+
+        Without any start menus in the configuration the ones of all users and of the current
+        user are cleaned. Otherwise the one of all users and the directories that match the
+        configured paths or glob patterns are cleaned. Every start menu is only returned once.
+        """
+        start_menus = list(constants.START_MENU_PATHS)
+        if self._settings.start_menus:
+            start_menus = start_menus[:1]
+            for pattern in self._settings.start_menus:
+                start_menus.extend(sorted(pathlib.Path(path) for path in glob.glob(pattern) if os.path.isdir(path)))
+        unique_start_menus: Dict[str, pathlib.Path] = {}
+        for start_menu in start_menus:
+            unique_start_menus.setdefault(os.path.normcase(os.path.abspath(start_menu)), start_menu)
+        return list(unique_start_menus.values())
+
+    @property
+    def _programs_directories(self) -> List[pathlib.Path]:
+        """Return the programs directories of the start menus that are cleaned and exist."""
+        programs_directories = [start_menu.joinpath("Programs") for start_menu in self._start_menus]
+        return [directory for directory in programs_directories if directory.is_dir()]
+
+    @property
+    def _workers(self) -> int:
+        """Return how many start menus are read and changed at the same time, at least one."""
+        return max(1, int(self._settings.get("start_menu_workers_int")))
+
+    def _wait_for_changes(self, watcher: FileSystemWatcher) -> None:
+        """Wait until the start menu changed or it is time for the next scan."""
+        while not self._scheduler.interrupted() and self._scheduler.seconds_until_next_scan() > 0:
+            if watcher.wait(min(1.0, self._scheduler.seconds_until_next_scan())):
+                logging.debug("Start menu changed")
+                # Wait until no more changes happen, e.g. while a program is being installed
+                while (not self._scheduler.interrupted() and
+                       watcher.wait(constants.WATCHER_SETTLE_TIME_IN_SECONDS)):
+                    pass
+                break
+        self._scheduler.wait(0)  # Reset the trigger if a scan was requested
 
     def move_files_to_programs_directory(self) -> None:
-        """Move all files to the programs directory."""
-        for path in constants.START_MENU_PATHS:
-            for item in path.iterdir():
-                if item.name != "Programs" and file_is_writable(item):
-                    item.replace(path.joinpath("Programs").joinpath(item.name))
+        """Move all files next to the programs directories into them."""
+        self._plan.rule = "move_files_to_programs_directory"
+        for root in self._tree.roots:
+            for entry in self._tree.siblings(root):
+                if file_is_writable(entry.path):
+                    self._plan.move(entry, root, "Moved %s to %s")
+
+    @property
+    def _tree(self) -> TreeSnapshot:
+        """Return the snapshot of the programs directories for the current cycle."""
+        if self._snapshot is None:
+            self._snapshot = TreeSnapshot(self._programs_directories)
+        return self._snapshot
+
+    @property
+    def _plan(self) -> CleaningPlan:
+        """Return the plan that the rules of the current cycle add their operations to."""
+        if self._current_plan is None:
+            self._current_plan = CleaningPlan(self._tree)
+        return self._current_plan
+
+    def _journal(self) -> Optional[OperationJournal]:
+        """Return the journal of operations if it is turned on.
+
+        When the journal is opened the first time, the operations that are left of a cycle that
+        was interrupted, e.g. because the computer was shut down, are applied.
+        """
+        if not self._settings.get("journal_bool"):
+            return None
+        if self._operation_journal is None:
+            self._operation_journal = OperationJournal(self._config.directory.joinpath(constants.JOURNAL_FILE_NAME))
+            resumed = self._operation_journal.resume()
+            if resumed:
+                logging.info("Applied %d operations of an interrupted cycle", resumed)
+        return self._operation_journal
+
+    def undo_last_cycle(self) -> int:
+        """Revert the changes of the last cycle that was not undone yet and return how many were reverted.
+
+        Deleted files can only be restored if they were small enough for their content to be recorded.
+        """
+        return OperationJournal(self._config.directory.joinpath(constants.JOURNAL_FILE_NAME)).undo_last_cycle()
+
+    @property
+    def _shortcuts(self) -> ShortcutCache:
+        """Return the cache of shortcut targets."""
+        if self._shortcut_cache is None:
+            self._shortcut_cache = ShortcutCache(
+                self._config.directory.joinpath(constants.SHORTCUT_CACHE_FILE_NAME),
+                int(self._settings.get("shortcut_cache_size_int")),
+                self._read_shortcut_file
+            )
+        return self._shortcut_cache
+
+    def _before_read(self) -> None:
+        """Wait until the start menu or the targets of its links may be read again."""
+        self._throttle.read()
+
+    def _before_directory_read(self) -> None:
+        """Stop the cycle if the cleaning was stopped or wait until the next directory may be read."""
+        self._checkpoint.check()
+        self._throttle.read()
+
+    def _read_shortcut_file(self, link: pathlib.Path) -> Tuple[pathlib.Path, str]:
+        """Read the target and the arguments of a shortcut that is not in the cache."""
+        self._throttle.read()
+        return windows_shortcuts.read_shortcut_and_arguments(link)
+
+    def _read_shortcut(self, link: Entry) -> pathlib.Path:
+        """Return the target of a shortcut using the shortcut cache.
+
+        The cache checks the current modification time and size of the shortcut file, because
+        the ones in the snapshot can come from the manifest and miss changes to the file itself.
+        """
+        return self._shortcuts.read_shortcut(link.path)
+
+    def _resolve(self, file: Entry) -> pathlib.Path:
+        """Return the target of a shortcut or the resolved path of any other file."""
+        if file.name.endswith(".lnk") and file.kind != SYMLINK:
+            return self._read_shortcut(file)
+        self._throttle.read()
+        return file.path.resolve()
+
+    def _resolve_all(self, files: List[Entry]) -> Iterator[Tuple[Entry, LinkTarget]]:
+        """Resolve the files concurrently and yield them together with their targets in order."""
+        return resolve_links(
+            files,
+            self._resolve,
+            max(1, int(self._settings.get("shortcut_resolution_workers_int"))),
+            self._target_oracle.check
+        )
+
+    def _duplicate_rank(self, root_index: int, file: Entry, shared: bool) -> Tuple[bool, int]:
+        """Return how much a file should be preferred over its duplicates.
+
+        A shared file, which is in the start menu of all users while there are the start menus
+        of several users, is always kept, because the other users would lose it otherwise.
+        """
+        keep = self._settings.get("delete_duplicates_keep_str")
+        if keep == "newest":
+            return shared, file.mtime_ns
+        if keep == "current user":
+            return shared, root_index
+        return shared, -root_index
+
+    def _shortcut_key(self, link: Entry) -> Optional[Tuple[str, str]]:
+        """Return the normalized target and the arguments of a shortcut.
+
+        None is returned if the shortcut could not be read or has no target, like shortcuts to
+        shell folders, because those can not be told apart by their target.
+        """
+        try:
+            target, arguments = self._shortcuts.read_shortcut_and_arguments(link.path)
+        except Exception as error:  # pylint: disable=W0703
+            logging.warning("Could not read the target of %s: %s", link.path, error)
+            return None
+        self._statistics.count(SHORTCUT_RESOLUTIONS)
+        self._statistics.rule("delete_duplicates").shortcut_resolutions += 1
+        if not target.parts:
+            return None
+        return os.path.normcase(str(target)), arguments
+
+    def _delete_duplicates_by(
+            self,
+            files: List[Tuple[int, Entry]],
+            key: Callable[[Entry], Optional[Hashable]],
+            shared_root_index: Optional[int] = None
+    ) -> None:
+        """Delete all but one of the files with the same key, files without a key are kept.
+
+        The files of the directory with the shared root index are shared with other users.
+        """
+        kept_files: Dict[Hashable, Tuple[int, Entry]] = {}
+        for root_index, file in files:
+            self._checkpoint.check()
+            file_key = key(file)
+            if file_key is None:
+                continue
+            kept_file = kept_files.get(file_key)
+            if kept_file is None:
+                kept_files[file_key] = (root_index, file)
+                continue
+            kept_index, kept_entry = kept_file
+            if (self._duplicate_rank(root_index, file, root_index == shared_root_index) >
+                    self._duplicate_rank(kept_index, kept_entry, kept_index == shared_root_index)):
+                kept_files[file_key] = (root_index, file)
+                root_index, file = kept_file
+            self._plan.unlink(file, "Deleted duplicate: %s")
+
+    def _duplicate_groups(self) -> List[List[RootEntry]]:
+        """Return the groups of programs directories whose files are compared with each other.
+
+        Every start menu of a user is paired with the one of all users. If the start menu of
+        all users is not part of the snapshot, e.g. because it could not be read, the start
+        menus of the users are only compared with themselves.
+        """
+        roots = self._tree.roots
+        all_users_programs = constants.START_MENU_PATHS[0].joinpath("Programs")
+        if not roots or roots[0].location != all_users_programs:
+            return [[root] for root in roots]
+        all_users, *users = roots
+        return [[all_users, user] for user in users] or [[all_users]]
 
     def delete_duplicates(self) -> None:
-        """Delete duplicates of files."""
-        found_files = []
-        for path in constants.START_MENU_PROGRAMS_PATHS:
-            files = [item for item in path.iterdir() if item.is_file()]
-            for file in files:
-                if file.name in found_files:
-                    file.unlink()
-                    logging.info("Deleted duplicate: %s", file)
-                else:
-                    found_files.append(file.name)
-
-    def flatten_folders_containing_one_file(self) -> None:
-        """Flatten folders that only contain one file."""
-        blacklist = self._config.flatten_folders_containing_one_file_exceptions
-        for path in constants.START_MENU_PROGRAMS_PATHS:
-            nested_directories = get_nested_directories(path)
-            nested_directories.reverse()  # Reverse the list to flatten the deepest folders first
-            for directory in nested_directories:
-                if (directory.exists() and
-                        len(list(directory.iterdir())) <= 1 and
-                        directory.name not in blacklist and
-                        directory.name not in constants.PROTECTED_FOLDERS):
-                    for item in directory.iterdir():
-                        item.replace(item.parents[1].joinpath(item.name))
-                    logging.info("Flattened folder: %s", directory)
-
-    def flatten_folders_with_whitelist(self) -> None:
-        """Flatten folders while respecting exceptions as a whitelist."""
-        whitelist = self._config.flatten_folders_exceptions
-
-        for path in constants.START_MENU_PROGRAMS_PATHS:
-            nested_directories = get_nested_directories(path)
-            nested_directories.reverse()  # Reverse the list to flatten the deepest folders first
-            for directory in nested_directories:
-                if directory.name in constants.PROTECTED_FOLDERS:
-                    continue
-                for word in whitelist:
-                    if word in directory.name:
-                        for item in directory.iterdir():
-                            item.replace(path.joinpath(item.name))
-                        logging.info("Flattened folder: %s", directory)
-                        break
-
-    def flatten_folders_with_blacklist(self) -> None:
-        """Flatten folders while respecting exceptions as a blacklist."""
-        blacklist = self._config.flatten_folders_exceptions
-
-        for path in constants.START_MENU_PROGRAMS_PATHS:
-            nested_directories = get_nested_directories(path)
-            nested_directories.reverse()  # Reverse the list to flatten the deepest folders first
-            for directory in nested_directories:
-                if directory.name in constants.PROTECTED_FOLDERS:
-                    continue
-                for word in blacklist:
-                    if word in directory.name:
-                        break
-                else:
-                    for item in directory.iterdir():
-                        item.replace(path.joinpath(item.name))
-                    logging.info("Flattened folder: %s", directory)
-
-    def delete_empty_folders(self) -> None:
-        """Delete empty folders."""
-        for path in constants.START_MENU_PROGRAMS_PATHS:
-            for directory in get_nested_directories(path):
-                if (len(list(directory.iterdir())) == 0 and
-                        directory.name not in constants.PROTECTED_FOLDERS):
-                    directory.rmdir()
-                    logging.info("Deleted empty folder: %s", directory)
-
-    def delete_broken_links(self) -> None:
-        """Delete links that point to a non-existing file."""
-        for path in constants.START_MENU_PROGRAMS_PATHS:
-            for link in get_nested_links(path):
-                if not link.exists() or not windows_shortcuts.read_shortcut(link).exists():
-                    link.unlink()
-                    logging.info(
-                        "Deleted broken link: %s",
-                        link
-                    )
-
-    def delete_files_with_names_containing(self) -> None:
-        """Deletes files whose names contain the strings from the list."""
-        match_strings = self._config.delete_files_with_names_containing_list
-        for path in constants.START_MENU_PROGRAMS_PATHS:
-            for file in get_nested_files(path):
-                for match_string in match_strings:
-                    if re.search(re.escape(match_string), file.name, flags=re.IGNORECASE):
-                        file.unlink()
-                        logging.info(
-                            "Deleted file \"%s\" "
-                            "because the file name contained \"%s\"",
-                            file,
-                            match_string
-                        )
-
-    def delete_files_matching_file_types(self) -> None:
-        """Delete files that match the file types."""
-        file_types = self._config.delete_matching_file_types_exceptions
-
-        for path in constants.START_MENU_PROGRAMS_PATHS:
-            for file_type in file_types:
-                files = get_nested_files(path)
-                for file, resolved_file in zip(files, resolve_files(files)):
-                    if resolved_file.name.endswith(file_type) and resolved_file.is_file():
-                        file.unlink()
-                        logging.info(
-                            "Deleted file \"%s\" "
-                            "because it had the extension \"%s\"",
-                            file,
-                            file_type
-                        )
-
-    def delete_files_not_matching_file_types(self) -> None:
-        """Delete files that do not match the file types."""
-        file_types = self._config.delete_matching_file_types_exceptions
-
-        for path in constants.START_MENU_PROGRAMS_PATHS:
-            for file_type in file_types:
-                for file in get_nested_files(path):
-                    if not file.name.endswith(file_type) and file.is_file():
-                        file.unlink()
-                        logging.info(
-                            "Deleted file \"%s\" because it did not have any of "
-                            "the required extensions",
-                            file
-                        )
-
-    def delete_links_to_folders(self) -> None:
-        """Delete links that link to folders."""
-        for path in constants.START_MENU_PROGRAMS_PATHS:
-            for link in get_nested_links(path):
-                if windows_shortcuts.read_shortcut(link).is_dir():
-                    link.unlink()
-                    logging.info(
-                        "Deleted link to folder: %s",
-                        link
-                    )
+        """Delete files with the same name and shortcuts with the same target and arguments.
+
+        Only the files directly inside the programs directories are compared by their names,
+        because files in different folders often share a name like "Uninstall" without being
+        the same. Shortcuts in any folder are compared by their targets and arguments.
+        Which of the duplicates is kept depends on the delete_duplicates_keep_str option.
+        The start menu of every user is compared with the one of all users, but not with the
+        start menus of other users. If there are several users, only their own copies are deleted.
+        """
+        statistics = self._statistics.rule("delete_duplicates")
+        start = time.perf_counter()
+        self._plan.rule = "delete_duplicates"
+        planned = len(self._plan)
+        groups = self._duplicate_groups()
+        shared_root_index = 0 if len(groups) > 1 and len(groups[0]) > 1 else None
+        for roots in groups:
+            top_level_files = [(root_index, file)
+                               for root_index, root in enumerate(roots)
+                               for file in self._tree.children(root) if file.kind != DIRECTORY]
+            self._delete_duplicates_by(top_level_files, lambda file: os.path.normcase(file.name), shared_root_index)
+            shortcuts = [(root_index, file)
+                         for root_index, root in enumerate(roots)
+                         for file in self._tree.files(root) if file.is_link and file.kind != SYMLINK]
+            statistics.visited += len(top_level_files) + len(shortcuts)
+            self._delete_duplicates_by(shortcuts, self._shortcut_key, shared_root_index)
+        statistics.actions += len(self._plan) - planned
+        statistics.seconds += time.perf_counter() - start
+
+    def _file_rules(self) -> List[Rule]:
+        """Return the rules for single files that are turned on in the order they are applied.
+
+        Rules with an empty list are left out, because they can not match any file.
+        """
+        file_types = self._settings.get("delete_files_based_on_file_type_str")
+        has_file_types = bool(self._settings.delete_matching_file_types_matcher.suffixes)
+        rules = [
+            (bool(self._settings.delete_files_with_names_containing_matcher.phrases), Rule(
+                "delete_files_with_names_containing",
+                self._name_contains_phrase,
+                self._delete("Deleted file \"%s\" because the file name contained \"%s\"")
+            )),
+            (file_types == "in the list" and has_file_types, Rule(
+                "delete_files_matching_file_types",
+                self._has_listed_file_type,
+                self._delete("Deleted file \"%s\" because it had the extension \"%s\""),
+                needs_target=True
+            )),
+            (file_types == "not in the list" and has_file_types, Rule(
+                "delete_files_not_matching_file_types",
+                self._lacks_listed_file_types,
+                self._delete("Deleted file \"%s\" because it did not have any of the required extensions"),
+                needs_target=True
+            )),
+            (self._settings.get("delete_broken_links_bool"), Rule(
+                "delete_broken_links",
+                self._is_broken_link,
+                self._delete("Deleted broken link: %s"),
+                needs_target=True
+            )),
+            (self._settings.get("delete_links_to_folders_bool"), Rule(
+                "delete_links_to_folders",
+                self._is_link_to_folder,
+                self._delete("Deleted link to folder: %s"),
+                needs_target=True
+            )),
+        ]
+        return [rule for turned_on, rule in rules if turned_on]
+
+    def _directory_rules(self) -> List[Rule]:
+        """Return the rules for directories that are turned on in the order they are applied."""
+        list_type = self._settings.get("flatten_folders_list_type_str")
+        rules = [
+            (list_type == "whitelist" and bool(self._settings.flatten_folders_exceptions_matcher.phrases),
+             Rule("flatten_folders_with_whitelist", self._is_listed_folder, self._flatten_into_root)),
+            (list_type == "blacklist",
+             Rule("flatten_folders_with_blacklist", self._is_unlisted_folder, self._flatten_into_root)),
+            (self._settings.get("flatten_folders_containing_only_one_item_bool"),
+             Rule("flatten_folders_containing_one_file", self._has_one_item, self._flatten_into_parent)),
+            (self._settings.get("delete_empty_folders_bool"),
+             Rule("delete_empty_folders", self._is_empty_folder, self._delete_folder)),
+        ]
+        return [rule for turned_on, rule in rules if turned_on]
+
+    def _delete(self, message: str) -> Callable[[Entry, Details], None]:
+        """Return an action that deletes a file and logs the message with the details of the rule."""
+        return lambda file, details: self._plan.unlink(file, message, *details)
+
+    def _name_contains_phrase(self, file: Entry, _: Optional[LinkTarget]) -> Optional[Details]:
+        """Return the phrase of the list that the name of the file contains."""
+        phrase = self._settings.delete_files_with_names_containing_matcher.match(file.name)
+        return None if phrase is None else (phrase,)
+
+    def _file_type(self, file: Entry, target: Optional[LinkTarget]) -> Optional[str]:
+        """Return the file type of the list that the file has or None.
+
+        The file type of a shortcut to an existing file is taken from its target, every other
+        file is classified by its own name. File types are compared ignoring the case.
+        """
+        matcher = self._settings.delete_matching_file_types_matcher
+        if target is not None and target.exists and not target.is_dir:
+            return matcher.match(target.path.name)
+        return matcher.match(file.name)
+
+    def _has_listed_file_type(self, file: Entry, target: Optional[LinkTarget]) -> Optional[Details]:
+        """Return the file type of the list that the file has.
+
+        Shortcuts whose targets could not be checked are never classified.
+        """
+        if target is not None and not target.known:
+            return None
+        file_type = self._file_type(file, target)
+        return None if file_type is None else (file_type,)
+
+    def _lacks_listed_file_types(self, file: Entry, target: Optional[LinkTarget]) -> Optional[Details]:
+        """Return whether neither the file nor the target of a shortcut has one of the file types of the list.
+
+        A shortcut is kept if its own file type is listed, so a list like ".lnk" keeps all shortcuts,
+        or if its target could not be checked, e.g. because its drive is offline.
+        """
+        if target is not None and not target.known:
+            return None
+        if self._settings.delete_matching_file_types_matcher.match(file.name) is not None:
+            return None
+        return () if self._file_type(file, target) is None else None
+
+    @staticmethod
+    def _is_broken_link(_: Entry, target: Optional[LinkTarget]) -> Optional[Details]:
+        """Return whether the file is a link to a non-existing file.
+
+        Links whose targets could not be checked, e.g. because their drive is offline, are not broken.
+        """
+        return () if target is not None and target.known and not target.exists else None
+
+    @staticmethod
+    def _is_link_to_folder(_: Entry, target: Optional[LinkTarget]) -> Optional[Details]:
+        """Return whether the file is a link to a folder."""
+        return () if target is not None and target.is_dir else None
+
+    def _is_listed_folder(self, directory: Entry, _: Optional[LinkTarget]) -> Optional[Details]:
+        """Return whether the folder matches the exceptions for flattening folders."""
+        if (directory.name in constants.PROTECTED_FOLDERS or
+                self._settings.flatten_folders_exceptions_matcher.match(directory.name) is None):
+            return None
+        return (directory.name,)
+
+    def _is_unlisted_folder(self, directory: Entry, _: Optional[LinkTarget]) -> Optional[Details]:
+        """Return whether the folder matches none of the exceptions for flattening folders."""
+        if (directory.name in constants.PROTECTED_FOLDERS or
+                self._settings.flatten_folders_exceptions_matcher.match(directory.name) is not None):
+            return None
+        return (directory.name,)
+
+    def _has_one_item(self, directory: Entry, _: Optional[LinkTarget]) -> Optional[Details]:
+        """Return whether the folder contains at most one item and may be flattened."""
+        if (len(self._tree.children(directory)) > 1 or
+                directory.name in self._settings.flatten_folders_containing_one_file_exceptions or
+                directory.name in constants.PROTECTED_FOLDERS):
+            return None
+        return (directory.name,)
+
+    def _is_empty_folder(self, directory: Entry, _: Optional[LinkTarget]) -> Optional[Details]:
+        """Return whether the folder is empty and may be deleted."""
+        if self._tree.children(directory) or directory.name in constants.PROTECTED_FOLDERS:
+            return None
+        return ()
+
+    def _flatten_into_root(self, directory: Entry, details: Details) -> None:
+        """Move all items of the folder into the programs directory it belongs to."""
+        root = directory
+        while root.parent is not None:
+            root = root.parent
+        for item in self._tree.children(directory):
+            self._plan.move(item, root, "Moved %s to %s to flatten folder \"%s\"", *details)
+
+    def _flatten_into_parent(self, directory: Entry, details: Details) -> None:
+        """Move all items of the folder into its parent folder."""
+        for item in self._tree.children(directory):
+            self._plan.move(
+                item,
+                directory.parent,  # type: ignore[arg-type]
+                "Moved %s to %s to flatten folder \"%s\"",
+                *details
+            )
+
+    def _delete_folder(self, directory: Entry, _: Details) -> None:
+        """Delete an empty folder."""
+        self._plan.rmdir(directory, "Deleted empty folder: %s")
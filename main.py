@@ -1,13 +1,55 @@
 #!/usr/bin/env python3
 """Start up script for the Start-Menu-Helper program."""
 import argparse
+import atexit
 import logging
 import os
 import pathlib
+import sys
+import time
 
-import wx
+from library import constants
+from library.configuration import Configuration
+from library.helpers.history import HistoryStore
+from library.helpers.log_pipeline import LogPipeline
+from library.helpers.metrics import ACTIONS, ENTRIES_VISITED, FAILED_ACTIONS
+from library.start_menu_helper import StartMenuHelper
+
+EXIT_SUCCESS = 0
+EXIT_ERROR = 1
+EXIT_FAILED_CHANGES = 3
+
+
+def run_once(directory: pathlib.Path) -> int:
+    """Clean the start menu once without the GUI, print a summary and return the exit status."""
+    helper = StartMenuHelper(Configuration(directory))
+    try:
+        helper.run_cycle()
+    except Exception as error:  # pylint: disable=W0703
+        logging.exception("Cleaning failed")
+        print(f"Cleaning failed: {error}", file=sys.stderr)
+        return EXIT_ERROR
+    cycle = helper.metrics.last_cycle
+    if cycle is None:
+        return EXIT_ERROR
+    print(f"Scanned {cycle.counters[ENTRIES_VISITED]} items in {cycle.seconds:.2f} seconds, "
+          f"applied {cycle.counters[ACTIONS]} changes, {cycle.counters[FAILED_ACTIONS]} failed")
+    return EXIT_FAILED_CHANGES if cycle.counters[FAILED_ACTIONS] else EXIT_SUCCESS
+
+
+def print_history(history: HistoryStore, arguments: argparse.Namespace) -> None:
+    """Print the recorded changes or cycles that match the arguments, the newest first."""
+    since = None if arguments.history_days is None else time.time() - arguments.history_days * 24 * 60 * 60
+    if arguments.history_cycles:
+        for cycle in history.cycles(since, arguments.history_limit):
+            print(f"{time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(cycle.started))} "
+                  f"took {cycle.seconds:.2f} seconds, {cycle.entries} items, {cycle.actions} changes, "
+                  f"{cycle.skipped} skipped, {cycle.failed} failed")
+        return
+    for action in history.actions(arguments.history_path, arguments.history_rule, since, arguments.history_limit):
+        print(f"{time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(action.time))} [{action.rule}] "
+              f"{action.message}{'' if action.applied else ' (failed)'}")
 
-from library import constants, gui
 
 if __name__ == "__main__":
     argument_parser = argparse.ArgumentParser()
@@ -24,21 +66,79 @@ if __name__ == "__main__":
         help="Specify an alternative directory where the configuration files are located "
              f"(Default is \"{constants.DEFAULT_CONFIGURATION_PATH}\")"
     )
+    argument_parser.add_argument(
+        "--dry-run",
+        action="store_true",
+        help="Print what one cleaning cycle would change with the previous configuration and exit "
+             "without changing anything"
+    )
+    argument_parser.add_argument(
+        "--once",
+        "--headless",
+        action="store_true",
+        help="Clean the start menu once with the previous configuration without opening the GUI, "
+             f"print a summary and exit with {EXIT_SUCCESS} on success, {EXIT_ERROR} if the cleaning "
+             f"failed or {EXIT_FAILED_CHANGES} if some of the changes could not be applied"
+    )
+    argument_parser.add_argument(
+        "--undo",
+        action="store_true",
+        help="Revert the changes of the last cleaning cycle that was not undone yet and exit"
+    )
+    history_arguments = argument_parser.add_argument_group(
+        "history",
+        "Print the recorded changes to the start menu, the newest first, and exit"
+    )
+    history_arguments.add_argument("--history", action="store_true", help="Print the recorded changes")
+    history_arguments.add_argument("--history-path", metavar="PATH",
+                                   help="Only print the changes of this path or of files and folders with this name")
+    history_arguments.add_argument("--history-rule", metavar="RULE", help="Only print the changes of this rule")
+    history_arguments.add_argument("--history-days", metavar="DAYS", type=float,
+                                   help="Only print the changes of the last days")
+    history_arguments.add_argument("--history-limit", metavar="COUNT", type=int, default=50,
+                                   help="Print at most this many changes (Default is 50)")
+    history_arguments.add_argument("--history-cycles", action="store_true",
+                                   help="Print the summaries of the cleaning cycles instead of the changes")
     arguments = argument_parser.parse_args()
 
     configuration_directory = constants.DEFAULT_CONFIGURATION_PATH
     if arguments.config_directory:
-        configuration_directory = pathlib.WindowsPath(arguments.config_directory)
+        configuration_directory = pathlib.Path(arguments.config_directory)
 
     if not os.path.exists(configuration_directory):
         os.mkdir(configuration_directory)
 
-    logging.basicConfig(
-        level=logging.INFO,
-        filename=configuration_directory.joinpath(constants.LOG_FILE_NAME),
-        filemode="a",
-        format="%(asctime)s - %(levelname)s - %(message)s"
+    configuration = Configuration(configuration_directory)
+    log_pipeline = LogPipeline(
+        configuration_directory.joinpath(constants.LOG_FILE_NAME),
+        rotation=str(configuration.get("log_rotation_str")),
+        maximum_size=int(configuration.get("log_maximum_size_in_kilobytes_int")) * 1024,
+        backups=int(configuration.get("log_backups_int")),
+        json_lines=bool(configuration.get("json_log_bool"))
     )
+    log_pipeline.start()
+    atexit.register(log_pipeline.stop)
+
+    if arguments.dry_run:
+        for description in StartMenuHelper(configuration).dry_run():
+            print(description)
+        sys.exit(0)
+
+    if arguments.once:
+        sys.exit(run_once(configuration_directory))
+
+    if arguments.history or arguments.history_cycles or arguments.history_path or arguments.history_rule:
+        print_history(StartMenuHelper(configuration).history, arguments)
+        sys.exit(EXIT_SUCCESS)
+
+    if arguments.undo:
+        print(f"Reverted {StartMenuHelper(configuration).undo_last_cycle()} changes")
+        sys.exit(EXIT_SUCCESS)
+
+    # The GUI is only imported when it is used, so that the other modes start quickly
+    import wx  # pylint: disable=C0415
+
+    from library import gui  # pylint: disable=C0412,C0415
 
     app = wx.App()
     main_frame = gui.MainFrame(configuration_directory)
@@ -0,0 +1,50 @@
+"""Tests for the Checkpoint."""
+import unittest
+
+from support import FakeClock, TemporaryDirectoryTestCase
+
+from library.helpers.cancellation import Checkpoint, CycleCancelled
+from library.helpers.tree_snapshot import TreeSnapshot
+
+
+class TestCheckpoint(TemporaryDirectoryTestCase):
+    """Test stopping cycles at checkpoints."""
+    def test_time_budget(self):
+        """Test that a cycle is over budget once its time is up and never without a budget."""
+        clock = FakeClock()
+        checkpoint = Checkpoint(time_budget=10, clock=clock)
+        unlimited = Checkpoint(clock=clock)
+        clock.time += 9
+        self.assertFalse(checkpoint.over_budget())
+        clock.time += 1
+        self.assertTrue(checkpoint.over_budget())
+        self.assertFalse(unlimited.over_budget())
+
+    def test_start_budget(self):
+        """Test that the time budget can be started again."""
+        clock = FakeClock()
+        checkpoint = Checkpoint(time_budget=10, clock=clock)
+        clock.time += 20
+        checkpoint.start_budget()
+        self.assertFalse(checkpoint.over_budget())
+        clock.time += 10
+        self.assertTrue(checkpoint.over_budget())
+
+    def test_stopped_reading(self):
+        """Test that reading a tree stops at the next directory once the cycle is stopped."""
+        self.directory.joinpath("Folder", "Subfolder").mkdir(parents=True)
+        stopped = []
+        checkpoint = Checkpoint(lambda: bool(stopped))
+
+        def check():
+            """Stop the cycle after the first directory was read."""
+            checkpoint.check()
+            stopped.append(True)
+
+        with self.assertRaises(CycleCancelled):
+            TreeSnapshot([self.directory], checkpoint=check)
+        self.assertEqual(len(stopped), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
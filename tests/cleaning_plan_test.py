@@ -0,0 +1,115 @@
+"""Tests for the CleaningPlan."""
+import unittest
+
+from support import TemporaryDirectoryTestCase
+
+from library.helpers.cleaning_plan import CleaningPlan
+from library.helpers.tree_snapshot import TreeSnapshot
+
+
+class TestCleaningPlan(TemporaryDirectoryTestCase):
+    """Test planning and executing operations."""
+    def setUp(self):
+        super().setUp()
+        self.root = self.directory
+        self.root.joinpath("Outer", "Inner").mkdir(parents=True)
+        self.root.joinpath("Outer", "Inner", "App.lnk").write_bytes(b"")
+        self.root.joinpath("Outer", "Inner", "Uninstall.lnk").write_bytes(b"")
+        self.root.joinpath("Outer", "Readme.txt").write_bytes(b"")
+        self.snapshot = TreeSnapshot([self.root])
+        self.plan = CleaningPlan(self.snapshot)
+
+    def _entries(self):
+        """Return the root, outer directory, inner directory and the files of the snapshot."""
+        root = self.snapshot.root(self.root)
+        outer, inner = self.snapshot.directories(root)
+        return (root, outer, inner, *sorted(self.snapshot.files(root), key=lambda file: file.name))
+
+    def test_plan_does_not_change_file_system(self):
+        """Test that planning only changes the snapshot."""
+        root, outer, _, app, readme, _ = self._entries()
+        self.plan.move(app, root, "Moved %s to %s")
+        self.plan.unlink(readme, "Deleted %s")
+
+        self.assertTrue(self.root.joinpath("Outer", "Inner", "App.lnk").exists())
+        self.assertEqual(app.path, self.root.joinpath("App.lnk"))
+        self.assertNotIn(readme, self.snapshot.children(outer))
+        self.assertListEqual(
+            [operation.describe() for operation in self.plan.operations],
+            [
+                f"Moved {self.root.joinpath('Outer', 'Inner', 'App.lnk')} to {self.root}",
+                f"Deleted {self.root.joinpath('Outer', 'Readme.txt')}",
+            ]
+        )
+
+    def test_execute_skips_redundant_moves(self):
+        """Test that chains of moves are applied as one move and moves of deleted files are skipped."""
+        root, outer, inner, app, readme, uninstall = self._entries()
+        self.plan.move(app, outer, "Moved %s to %s")
+        self.plan.move(uninstall, outer, "Moved %s to %s")
+        self.plan.unlink(readme, "Deleted %s")
+        self.plan.move(app, root, "Moved %s to %s")
+        self.plan.unlink(uninstall, "Deleted %s")
+        self.plan.rmdir(inner, "Deleted %s")
+        self.plan.rmdir(outer, "Deleted %s")
+
+        self.assertEqual(self.plan.execute(), (5, 2))
+        self.assertEqual(self.plan.failed, 0)
+        self.assertListEqual([item.name for item in self.root.iterdir()], ["App.lnk"])
+
+    def test_execute_counts_failed_operations(self):
+        """Test that operations that can not be applied are skipped and counted as failed."""
+        _, _, _, app, readme, _ = self._entries()
+        self.plan.unlink(readme, "Deleted %s")
+        self.plan.unlink(app, "Deleted %s")
+        self.root.joinpath("Outer", "Readme.txt").unlink()
+
+        with self.assertLogs(level="WARNING"):
+            self.assertEqual(self.plan.execute(), (1, 1))
+        self.assertEqual(self.plan.failed, 1)
+
+    def test_execute_stops_between_operations(self):
+        """Test that the operations after a stop are left out instead of failing."""
+        root, _, _, app, readme, _ = self._entries()
+        self.plan.move(app, root, "Moved %s to %s")
+        self.plan.unlink(readme, "Deleted %s")
+
+        self.assertEqual(self.plan.execute(stopped=lambda: self.root.joinpath("App.lnk").exists()), (1, 1))
+        self.assertEqual(self.plan.failed, 0)
+        self.assertTrue(self.root.joinpath("Outer", "Readme.txt").exists())
+        self.assertListEqual([applied for _, _, applied in self.plan.results()], [True])
+
+    def test_execute_is_throttled(self):
+        """Test that the throttle is asked before every operation, including grouped deletions."""
+        _, outer, inner, app, readme, uninstall = self._entries()
+        self.plan.unlink(app, "Deleted %s")
+        self.plan.unlink(uninstall, "Deleted %s")
+        self.plan.unlink(readme, "Deleted %s")
+        self.plan.rmdir(inner, "Deleted %s")
+        self.plan.rmdir(outer, "Deleted %s")
+        throttled = []
+
+        self.assertEqual(self.plan.execute(throttle=lambda: throttled.append(True)), (5, 0))
+        self.assertEqual(len(throttled), 5)
+
+    def test_execute_keeps_moves_out_of_deleted_directories(self):
+        """Test that moves are not skipped if a directory is deleted before the entry is moved again."""
+        root, outer, inner, app, _, uninstall = self._entries()
+        self.plan.move(app, outer, "Moved %s to %s")
+        self.plan.move(uninstall, outer, "Moved %s to %s")
+        self.plan.rmdir(inner, "Deleted %s")
+        self.plan.move(app, root, "Moved %s to %s")
+
+        self.assertEqual(self.plan.execute(), (4, 0))
+        self.assertCountEqual(
+            [item.name for item in self.root.iterdir()],
+            ["App.lnk", "Outer"]
+        )
+        self.assertCountEqual(
+            [item.name for item in self.root.joinpath("Outer").iterdir()],
+            ["Readme.txt", "Uninstall.lnk"]
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,68 @@
+"""Tests for the Configuration class."""
+import os
+import unittest
+
+from support import TemporaryDirectoryTestCase
+
+from library.configuration import Configuration
+
+
+class TestConfigurationSnapshot(TemporaryDirectoryTestCase):
+    """Test the snapshots of the configuration."""
+    def setUp(self):
+        super().setUp()
+        self.configuration_directory = self.directory.joinpath("config")
+        self.config = Configuration(self.configuration_directory)
+
+    def _touch(self, file_path):
+        """Make sure that a change to the file is noticed even on coarse file system clocks."""
+        modification_time = file_path.stat().st_mtime_ns + 10 ** 9
+        os.utime(file_path, ns=(modification_time, modification_time))
+
+    def test_snapshot_is_cached(self):
+        """Test that the snapshot is reused while no file changes."""
+        snapshot = self.config.snapshot()
+        self.assertIs(self.config.snapshot(), snapshot)
+        self.assertIs(snapshot.get("delete_duplicates_bool"), False)
+        self.assertEqual(snapshot.get("shortcut_cache_size_int"), 10000)
+
+    def test_snapshot_follows_saved_options(self):
+        """Test that saving the configuration creates a new snapshot."""
+        snapshot = self.config.snapshot()
+        self.config.set("delete_duplicates_bool", True)
+        self.assertIs(self.config.snapshot(), snapshot)  # Not saved yet
+        self.config.save()
+        self._touch(self.configuration_directory.joinpath("config.ini"))
+        new_snapshot = self.config.snapshot()
+        self.assertIsNot(new_snapshot, snapshot)
+        self.assertIs(new_snapshot.get("delete_duplicates_bool"), True)
+        self.assertNotEqual(new_snapshot.fingerprint, snapshot.fingerprint)
+        self.assertIs(
+            new_snapshot.delete_files_with_names_containing_matcher,
+            snapshot.delete_files_with_names_containing_matcher
+        )
+
+    def test_snapshot_follows_lists(self):
+        """Test that changing a list only rebuilds its own matcher."""
+        snapshot = self.config.snapshot()
+        self.config.delete_files_with_names_containing_list = ["Uninstall"]
+        self._touch(self.configuration_directory.joinpath("delete_files_with_names_containing.txt"))
+        new_snapshot = self.config.snapshot()
+        self.assertEqual(new_snapshot.delete_files_with_names_containing_matcher.phrases, ["Uninstall"])
+        self.assertIs(
+            new_snapshot.flatten_folders_exceptions_matcher,
+            snapshot.flatten_folders_exceptions_matcher
+        )
+
+    def test_snapshot_start_menus(self):
+        """Test that the configured start menus are part of the snapshot without blank lines."""
+        self.assertEqual(self.config.snapshot().start_menus, ())
+        self.config.start_menus = ["C:\\Users\\*\\AppData\\Roaming\\Microsoft\\Windows\\Start Menu", ""]
+        self.assertEqual(
+            self.config.snapshot().start_menus,
+            ("C:\\Users\\*\\AppData\\Roaming\\Microsoft\\Windows\\Start Menu",)
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
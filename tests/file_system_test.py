@@ -1,54 +1,99 @@
 """Tests for the file_system functions."""
+import pathlib
+import time
 import unittest
-from pathlib import WindowsPath
-from unittest.mock import Mock
+
+from support import TemporaryDirectoryTestCase
 
 from library.helpers import file_system
 
 
-class TestFileSystemHelpers(unittest.TestCase):
+class TestFileSystemHelpers(TemporaryDirectoryTestCase):
     """Test the file_system helper functions."""
-    def test_get_nested_directories(self):
-        """Test get_nested_directories."""
-        start_menu_directory = Mock(WindowsPath)
-        start_menu_directory.__repr__ = Mock(return_value="Start Menu")
-        programs_directory = Mock(WindowsPath)
-        programs_directory.__repr__ = Mock(return_value="Programs")
-        test_directory_one = Mock(WindowsPath)
-        test_directory_one.__repr__ = Mock(return_value="Test Directory One")
-        nested_test_directory_one = Mock(WindowsPath)
-        nested_test_directory_one.__repr__ = Mock(return_value="Nested Test Directory One")
-        nested_test_directory_two = Mock(WindowsPath)
-        nested_test_directory_two.__repr__ = Mock(return_value="Nested Test Directory Two")
-
-        start_menu_directory.iterdir = Mock(
-            return_value=[programs_directory]
+    def setUp(self):
+        super().setUp()
+        self.start_menu_directory = self.directory
+        self.programs_directory = self.start_menu_directory.joinpath("Programs")
+        self.test_directory_one = self.programs_directory.joinpath("Test Directory One")
+        self.nested_test_directory_one = self.test_directory_one.joinpath("Nested Test Directory One")
+        self.nested_test_directory_two = self.test_directory_one.joinpath("Nested Test Directory Two")
+        self.nested_test_directory_one.mkdir(parents=True)
+        self.nested_test_directory_two.mkdir(parents=True)
+        self.programs_directory.joinpath("Program.lnk").write_bytes(b"")
+        self.nested_test_directory_two.joinpath("Readme.txt").write_bytes(b"")
+
+    def test_walk(self):
+        """Test that walk yields all items inside the directory with every directory before its items."""
+        items = [pathlib.Path(item.path) for item in file_system.walk(self.start_menu_directory)]
+        self.assertCountEqual(
+            items,
+            [
+                self.programs_directory,
+                self.programs_directory.joinpath("Program.lnk"),
+                self.test_directory_one,
+                self.nested_test_directory_one,
+                self.nested_test_directory_two,
+                self.nested_test_directory_two.joinpath("Readme.txt"),
+            ],
         )
-        start_menu_directory.is_dir = Mock(return_value=True)
-        programs_directory.iterdir = Mock(
-            return_value=[test_directory_one]
+        for item in items[1:]:
+            self.assertLess(items.index(item.parent), items.index(item))
+
+    def test_walk_prune(self):
+        """Test that walk does not descend into pruned directories."""
+        items = file_system.walk(
+            self.start_menu_directory,
+            prune=lambda item: item.name == "Test Directory One"
         )
-        programs_directory.is_dir = Mock(return_value=True)
-        test_directory_one.iterdir = Mock(
-            return_value=[nested_test_directory_one, nested_test_directory_two]
+        self.assertCountEqual(
+            [pathlib.Path(item.path) for item in items],
+            [
+                self.programs_directory,
+                self.programs_directory.joinpath("Program.lnk"),
+                self.test_directory_one,
+            ],
         )
-        test_directory_one.is_dir = Mock(return_value=True)
-        nested_test_directory_one.iterdir = Mock(return_value=[])
-        nested_test_directory_one.is_dir = Mock(return_value=True)
-        nested_test_directory_two.iterdir = Mock(return_value=[])
-        nested_test_directory_two.is_dir = Mock(return_value=True)
 
-        nested_directories = file_system.get_nested_directories(start_menu_directory)
+    def test_resolve_links(self):
+        """Test that resolve_links keeps the order and checks the targets."""
+        targets = {
+            "Slow.lnk": self.nested_test_directory_two.joinpath("Readme.txt"),
+            "Folder.lnk": self.test_directory_one,
+            "Broken.lnk": self.programs_directory.joinpath("Missing.exe"),
+        }
+
+        def read_target(link):
+            if link == "Slow.lnk":
+                time.sleep(0.05)
+            return targets[link]
+
+        results = list(file_system.resolve_links(
+            ["Slow.lnk", "Folder.lnk", "Broken.lnk"] * 3,
+            read_target,
+            max_workers=2
+        ))
+        self.assertListEqual([link for link, _ in results], ["Slow.lnk", "Folder.lnk", "Broken.lnk"] * 3)
         self.assertListEqual(
-            nested_directories,
-            [
-                programs_directory,
-                test_directory_one,
-                nested_test_directory_one,
-                nested_test_directory_two,
-            ],
+            [(target.exists, target.is_dir) for _, target in results[:3]],
+            [(True, False), (True, True), (False, False)]
         )
 
+    def test_resolve_links_stopped_early(self):
+        """Test that the links that are left are dropped without waiting for the ones being resolved."""
+        started = []
+
+        def read_target(link):
+            started.append(link)
+            time.sleep(0.3)
+            return self.programs_directory.joinpath(link)
+
+        results = file_system.resolve_links([f"{index}.lnk" for index in range(10)], read_target, max_workers=2)
+        next(results)
+        start = time.monotonic()
+        results.close()
+        self.assertLess(time.monotonic() - start, 0.2)
+        self.assertLessEqual(len(started), 4)
+
 
 if __name__ == "__main__":
     unittest.main()
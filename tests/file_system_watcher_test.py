@@ -0,0 +1,80 @@
+"""Tests for the file system watchers."""
+import sys
+import threading
+import unittest
+from abc import ABC, abstractmethod
+
+from support import TemporaryDirectoryTestCase
+
+from library.helpers import file_system_watcher
+
+
+class WatcherTests(ABC):
+    """Tests that every watcher backend has to pass."""
+    def setUp(self):
+        super().setUp()
+        self.directory.joinpath("Folder").mkdir()
+        self.watcher = self.create_watcher([self.directory])
+
+    def tearDown(self):
+        self.watcher.close()
+
+    @abstractmethod
+    def create_watcher(self, directories):
+        """Return the watcher that is tested."""
+
+    def test_no_changes(self):
+        """Test that waiting times out when nothing changed."""
+        self.assertFalse(self.watcher.wait(0.1))
+
+    def test_nested_change(self):
+        """Test that changes inside child directories are noticed."""
+        self.directory.joinpath("Folder", "Program.lnk").write_bytes(b"")
+        self.assertTrue(self.watcher.wait(1))
+
+    def test_clear(self):
+        """Test that cleared changes are not reported again."""
+        self.directory.joinpath("Program.lnk").write_bytes(b"")
+        self.watcher.clear()
+        self.assertFalse(self.watcher.wait(0.1))
+
+
+class TestPollingWatcher(WatcherTests, TemporaryDirectoryTestCase):
+    """Test the PollingWatcher."""
+    def create_watcher(self, directories):
+        return file_system_watcher.PollingWatcher(directories, interval=0.01)
+
+
+@unittest.skipUnless(sys.platform.startswith("linux"), "inotify is only available on Linux")
+class TestInotifyWatcher(WatcherTests, TemporaryDirectoryTestCase):
+    """Test the InotifyWatcher."""
+    def create_watcher(self, directories):
+        return file_system_watcher.InotifyWatcher(directories)
+
+    def test_new_directory(self):
+        """Test that directories created after the watcher started are watched too."""
+        self.directory.joinpath("New Folder").mkdir()
+        self.assertTrue(self.watcher.wait(1))
+        self.directory.joinpath("New Folder", "Program.lnk").write_bytes(b"")
+        self.assertTrue(self.watcher.wait(1))
+
+
+@unittest.skipUnless(sys.platform == "win32", "ReadDirectoryChangesW is only available on Windows")
+class TestReadDirectoryChangesWatcher(WatcherTests, TemporaryDirectoryTestCase):
+    """Test the ReadDirectoryChangesWatcher."""
+    def create_watcher(self, directories):
+        return file_system_watcher.ReadDirectoryChangesWatcher(directories)
+
+    def test_close(self):
+        """Test that closing the watcher ends its threads and releases the directories."""
+        threads = threading.active_count()
+        watcher = self.create_watcher([self.directory.joinpath("Folder")])
+        self.assertEqual(threading.active_count(), threads + 1)
+
+        watcher.close()
+        self.assertEqual(threading.active_count(), threads)
+        self.directory.joinpath("Folder").rmdir()
+
+
+if __name__ == "__main__":
+    unittest.main()
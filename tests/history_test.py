@@ -0,0 +1,74 @@
+"""Tests for the HistoryStore."""
+import os
+import sqlite3
+import time
+import unittest
+
+from support import TemporaryDirectoryTestCase
+
+from library.helpers.history import HistoryAction, HistoryStore
+from library.helpers.metrics import ACTIONS, CycleStatistics
+
+
+class TestHistoryStore(TemporaryDirectoryTestCase):
+    """Test recording and looking up cycles and their changes."""
+    def setUp(self):
+        super().setUp()
+        self.file = self.directory.joinpath("history.sqlite3")
+        self.history = HistoryStore(self.file, retention_in_days=30)
+        self.app = os.path.join("Programs", "Folder", "App.lnk")
+
+    def _cycle(self, started, actions):
+        """Record a cycle that started at the given time with the actions."""
+        cycle = CycleStatistics()
+        cycle.started = started
+        cycle.count(ACTIONS, len(actions))
+        self.history.record(cycle, actions)
+
+    def test_look_up_changes(self):
+        """Test that changes can be looked up by path, name and rule, the newest first."""
+        now = time.time()
+        self._cycle(now - 60, [
+            HistoryAction("flatten_folders_containing_one_file", "move", self.app, "Programs", True, "Moved App"),
+            HistoryAction("delete_empty_folders", "rmdir", os.path.join("Programs", "Folder"), None, True,
+                          "Deleted Folder"),
+        ])
+        self._cycle(now, [
+            HistoryAction("delete_broken_links", "unlink", os.path.join("Programs", "App.lnk"), None, False,
+                          "Deleted App"),
+        ])
+
+        self.assertListEqual([action.message for action in self.history.actions(path="app.LNK")],
+                             ["Deleted App", "Moved App"])
+        self.assertListEqual([action.rule for action in self.history.actions(path=self.app)],
+                             ["flatten_folders_containing_one_file"])
+        self.assertListEqual([action.applied for action in self.history.actions(rule="delete_broken_links")],
+                             [False])
+        self.assertEqual(len(self.history.actions(since=now - 30)), 1)
+        self.assertListEqual([cycle.actions for cycle in self.history.cycles()], [1, 2])
+
+    def test_old_records_are_deleted(self):
+        """Test that cycles and changes older than the retention are deleted when a cycle is recorded."""
+        self._cycle(time.time() - 31 * 24 * 60 * 60, [HistoryAction("rule", "unlink", self.app, None, True, "Old")])
+        self._cycle(time.time(), [HistoryAction("rule", "unlink", self.app, None, True, "New")])
+
+        self.assertListEqual([action.message for action in self.history.actions()], ["New"])
+        self.assertEqual(len(self.history.cycles()), 1)
+
+    def test_look_ups_use_indices(self):
+        """Test that looking up changes by path, name and rule does not read the whole table."""
+        self._cycle(time.time(), [])
+        connection = sqlite3.connect(self.file)
+        try:
+            for condition in ["path = ? COLLATE NOCASE", "name = ? COLLATE NOCASE", "rule = ?"]:
+                plan = connection.execute(
+                    f"EXPLAIN QUERY PLAN SELECT * FROM actions WHERE {condition} ORDER BY time DESC LIMIT 50",
+                    ("x",)
+                ).fetchall()
+                self.assertIn("USING INDEX", " ".join(str(row[-1]) for row in plan))
+        finally:
+            connection.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
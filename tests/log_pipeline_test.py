@@ -0,0 +1,57 @@
+"""Tests for the LogPipeline."""
+import gzip
+import json
+import logging
+import unittest
+
+from support import TemporaryDirectoryTestCase
+
+from library.helpers.log_pipeline import NO_ROTATION, ROTATE_BY_SIZE, LogPipeline
+
+
+class TestLogPipeline(TemporaryDirectoryTestCase):
+    """Test writing, rotating and compressing the log in the background."""
+    def setUp(self):
+        super().setUp()
+        self.log_file = self.directory.joinpath("log.txt")
+
+    def test_records_are_written_in_the_background(self):
+        """Test that every record is in the log file once the pipeline is stopped."""
+        with LogPipeline(self.log_file, rotation=NO_ROTATION):
+            for number in range(1000):
+                logging.info("Deleted %s", number)
+
+        lines = self.log_file.read_text(encoding="utf-8").splitlines()
+        self.assertEqual(len(lines), 1000)
+        self.assertTrue(lines[-1].endswith(" - INFO - Deleted 999"))
+
+    def test_rotated_files_are_compressed(self):
+        """Test that full log files are rotated into compressed archives and old archives are removed."""
+        with LogPipeline(self.log_file, rotation=ROTATE_BY_SIZE, maximum_size=1000, backups=2):
+            for number in range(200):
+                logging.info("Moved %s", number)
+
+        archives = sorted(file.name for file in self.directory.iterdir() if file.name != "log.txt")
+        self.assertListEqual(archives, ["log.txt.1.gz", "log.txt.2.gz"])
+        with gzip.open(self.directory.joinpath("log.txt.1.gz"), "rt", encoding="utf-8") as archive:
+            archived_lines = archive.read().splitlines()
+        current_lines = self.log_file.read_text(encoding="utf-8").splitlines()
+        self.assertEqual(int(archived_lines[-1].split()[-1]) + 1, int(current_lines[0].split()[-1]))
+
+    def test_json_lines(self):
+        """Test that records can be written as one JSON object per line."""
+        with LogPipeline(self.log_file, rotation=NO_ROTATION, json_lines=True):
+            logging.warning("Could not delete %s", "App.lnk")
+            try:
+                raise OSError("in use")
+            except OSError:
+                logging.exception("Cleaning failed")
+
+        entries = [json.loads(line) for line in self.log_file.read_text(encoding="utf-8").splitlines()]
+        self.assertEqual(entries[0]["level"], "WARNING")
+        self.assertEqual(entries[0]["message"], "Could not delete App.lnk")
+        self.assertIn("OSError: in use", entries[1]["exception"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,62 @@
+"""Tests for the metrics of the cleaning cycles."""
+import json
+import pathlib
+import tempfile
+import unittest
+
+from library.helpers.metrics import ACTIONS, ENTRIES_VISITED, CycleStatistics, MetricsRegistry
+
+
+def _cycle(entries, actions, seconds):
+    """Return the statistics of a cycle with one rule."""
+    cycle = CycleStatistics()
+    cycle.seconds = seconds
+    cycle.count(ENTRIES_VISITED, entries)
+    cycle.count(ACTIONS, actions)
+    rule = cycle.rule("delete_broken_links")
+    rule.visited += entries
+    rule.actions += actions
+    rule.seconds += seconds / 2
+    return cycle
+
+
+class TestMetricsRegistry(unittest.TestCase):
+    """Test recording and writing metrics."""
+    def test_totals(self):
+        """Test that the last cycle is kept and all cycles are added up."""
+        registry = MetricsRegistry()
+        registry.record(_cycle(100, 3, 0.5))
+        registry.record(_cycle(90, 0, 0.25))
+
+        metrics = registry.to_dict()
+        self.assertEqual(metrics["cycles"], 2)
+        self.assertEqual(metrics["last_cycle"]["counters"][ENTRIES_VISITED], 90)
+        self.assertEqual(metrics["totals"]["counters"][ENTRIES_VISITED], 190)
+        self.assertEqual(metrics["totals"]["rules"]["delete_broken_links"],
+                         {"seconds": 0.375, "visited": 190, "actions": 3, "directory_listings": 0, "stats": 0,
+                          "shortcut_resolutions": 0})
+        self.assertIn("90 items, 0 changes, 2 scans in total", registry.summary())
+
+    def test_save(self):
+        """Test that the metrics are written as JSON and in the text format of Prometheus."""
+        registry = MetricsRegistry()
+        registry.record(_cycle(100, 3, 0.5))
+        with tempfile.TemporaryDirectory() as directory:
+            json_file = pathlib.Path(directory, "metrics.json")
+            prometheus_file = pathlib.Path(directory, "metrics.prom")
+            registry.save(json_file, prometheus_file)
+
+            self.assertEqual(json.loads(json_file.read_text(encoding="utf-8"))["cycles"], 1)
+            lines = prometheus_file.read_text(encoding="utf-8").splitlines()
+        self.assertIn("start_menu_helper_cycles_total 1", lines)
+        self.assertIn("# TYPE start_menu_helper_actions_total counter", lines)
+        self.assertIn("start_menu_helper_rule_visited_total{rule=\"delete_broken_links\"} 100", lines)
+        self.assertIn("start_menu_helper_last_cycle_seconds 0.5", lines)
+
+    def test_summary_without_cycles(self):
+        """Test the summary before the first cycle."""
+        self.assertEqual(MetricsRegistry().summary(), "No scan yet")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,42 @@
+"""Tests for the NameMatcher."""
+import unittest
+
+from library.helpers.name_matcher import NameMatcher, SuffixMatcher
+
+
+class TestNameMatcher(unittest.TestCase):
+    """Test matching names against lists of phrases."""
+    def test_match(self):
+        """Test that the first matching phrase of the list is returned."""
+        matcher = NameMatcher(["Uninstall", "Help", "Read me", "Un"], ignore_case=True)
+        self.assertEqual(matcher.match("Uninstall Editor.lnk"), "Uninstall")
+        self.assertEqual(matcher.match("editor help.lnk"), "Help")
+        self.assertEqual(matcher.match("Tuner.lnk"), "Un")
+        self.assertIsNone(matcher.match("Editor.lnk"))
+
+    def test_case_sensitive(self):
+        """Test that case-sensitive matchers respect the case."""
+        matcher = NameMatcher(["Tools", "a.b"], ignore_case=False)
+        self.assertEqual(matcher.match("Vendor Tools"), "Tools")
+        self.assertIsNone(matcher.match("Vendor tools"))
+        self.assertIsNone(matcher.match("axb"))
+
+    def test_empty_list(self):
+        """Test that an empty list never matches."""
+        self.assertIsNone(NameMatcher([], ignore_case=True).match("Editor.lnk"))
+
+
+class TestSuffixMatcher(unittest.TestCase):
+    """Test matching names against lists of suffixes."""
+    def test_match(self):
+        """Test that the first matching suffix of the list is returned ignoring the case."""
+        matcher = SuffixMatcher([".txt", ".url", "me.txt", ".exe"], ignore_case=True)
+        self.assertEqual(matcher.match("Readme.txt"), ".txt")
+        self.assertEqual(matcher.match("Website.URL"), ".url")
+        self.assertEqual(matcher.match("Setup.exe"), ".exe")
+        self.assertIsNone(matcher.match("Editor.lnk"))
+        self.assertIsNone(matcher.match("exe"))
+
+
+if __name__ == "__main__":
+    unittest.main()
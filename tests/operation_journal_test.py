@@ -0,0 +1,99 @@
+"""Tests for the OperationJournal."""
+import json
+import unittest
+
+from support import TemporaryDirectoryTestCase
+
+from library.helpers.cleaning_plan import CleaningPlan
+from library.helpers.operation_journal import MOVE, RMDIR, UNLINK, OperationJournal, RecordedOperation
+from library.helpers.tree_snapshot import TreeSnapshot
+
+
+class TestOperationJournal(TemporaryDirectoryTestCase):
+    """Test recording, resuming and undoing operations."""
+    def setUp(self):
+        super().setUp()
+        self.root = self.directory.joinpath("Programs")
+        self.root.joinpath("Folder").mkdir(parents=True)
+        self.root.joinpath("Folder", "App.lnk").write_bytes(b"app")
+        self.root.joinpath("Readme.txt").write_bytes(b"readme")
+        self.journal_file = self.directory.joinpath("journal.jsonl")
+        self.operations = [
+            RecordedOperation(MOVE, str(self.root.joinpath("Folder", "App.lnk")), str(self.root)),
+            RecordedOperation(UNLINK, str(self.root.joinpath("Readme.txt")), content="cmVhZG1l"),
+            RecordedOperation(RMDIR, str(self.root.joinpath("Folder"))),
+        ]
+
+    def _events(self):
+        """Return the events of the records in the journal."""
+        return [json.loads(line)["event"] for line in self.journal_file.read_text(encoding="utf-8").splitlines()]
+
+    def test_applied_operations_are_written_in_groups(self):
+        """Test that applied operations are only written once a group is full or the cycle is committed."""
+        journal = OperationJournal(self.journal_file, group_size=2)
+        journal.begin(self.operations)
+        journal.applied(0)
+        self.assertListEqual(self._events(), ["plan"])
+        journal.applied(1)
+        journal.applied(2)
+        self.assertListEqual(self._events(), ["plan", "applied"])
+        journal.commit()
+        self.assertListEqual(self._events(), ["plan", "applied", "applied", "commit"])
+        self.assertIsNone(journal.interrupted())
+
+    def test_resume_interrupted_cycle(self):
+        """Test that the operations that are left of an interrupted cycle are applied once."""
+        journal = OperationJournal(self.journal_file, group_size=10)
+        journal.begin(self.operations)
+        self.operations[0].apply()
+        journal.applied(0)  # Lost in the crash, because the group was never written
+        with open(self.journal_file, "a", encoding="utf-8") as file:
+            file.write("{\"cycle\": ")  # Incomplete record
+
+        resumed_journal = OperationJournal(self.journal_file)
+        self.assertEqual(len(resumed_journal.interrupted()[1]), 3)
+        self.assertEqual(resumed_journal.resume(), 2)
+        self.assertListEqual([item.name for item in self.root.iterdir()], ["App.lnk"])
+        self.assertIsNone(resumed_journal.interrupted())
+
+    def test_resume_with_reused_path(self):
+        """Test that resuming does not delete a file that was moved to the path of a deleted one."""
+        self.root.joinpath("App.lnk").write_bytes(b"old")
+        snapshot = TreeSnapshot([self.root])
+        root = snapshot.roots[0]
+        old_app = [file for file in snapshot.files(root) if file.name == "App.lnk"][0]
+        app = snapshot.children(snapshot.directories(root)[0])[0]
+        plan = CleaningPlan(snapshot)
+        plan.unlink(old_app, "Deleted %s")
+        plan.move(app, root, "Moved %s to %s")
+        self.assertEqual(plan.execute(journal=OperationJournal(self.journal_file)), (2, 0))
+        plan_record = self.journal_file.read_text(encoding="utf-8").splitlines()[0]
+        self.journal_file.write_text(plan_record + "\n", encoding="utf-8")  # The other records were lost
+
+        with self.assertLogs(level="WARNING"):
+            self.assertEqual(OperationJournal(self.journal_file).resume(), 0)
+        self.assertEqual(self.root.joinpath("App.lnk").read_bytes(), b"app")
+
+    def test_undo_executed_plan(self):
+        """Test that undoing the last cycle restores moved and small deleted files."""
+        snapshot = TreeSnapshot([self.root])
+        root = snapshot.roots[0]
+        folder = snapshot.directories(root)[0]
+        app = snapshot.children(folder)[0]
+        readme = [file for file in snapshot.files(root) if file.name == "Readme.txt"][0]
+        plan = CleaningPlan(snapshot)
+        plan.move(app, root, "Moved %s to %s")
+        plan.unlink(readme, "Deleted %s")
+        plan.rmdir(folder, "Deleted %s")
+        journal = OperationJournal(self.journal_file)
+
+        self.assertEqual(plan.execute(journal=journal), (3, 0))
+        self.assertListEqual([item.name for item in self.root.iterdir()], ["App.lnk"])
+        self.assertEqual(journal.undo_last_cycle(), 3)
+        self.assertEqual(self.root.joinpath("Folder", "App.lnk").read_bytes(), b"app")
+        self.assertEqual(self.root.joinpath("Readme.txt").read_bytes(), b"readme")
+        self.assertEqual(journal.undo_last_cycle(), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
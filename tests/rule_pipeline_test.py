@@ -0,0 +1,88 @@
+"""Tests for the RulePipeline."""
+import unittest
+
+from support import TemporaryDirectoryTestCase
+
+from library.helpers.cleaning_plan import CleaningPlan
+from library.helpers.file_system import LinkTarget
+from library.helpers.metrics import RESOLVE_LINKS, SHORTCUT_RESOLUTIONS, CycleStatistics
+from library.helpers.rule_pipeline import Rule, RulePipeline
+from library.helpers.tree_snapshot import TreeSnapshot
+
+
+class TestRulePipeline(TemporaryDirectoryTestCase):
+    """Test applying fused rules."""
+    def setUp(self):
+        super().setUp()
+        self.root = self.directory
+        self.root.joinpath("Folder").mkdir()
+        self.root.joinpath("Folder", "Uninstall.lnk").write_bytes(b"")
+        self.root.joinpath("Folder", "Broken.lnk").write_bytes(b"")
+        self.root.joinpath("App.lnk").write_bytes(b"")
+        self.snapshot = TreeSnapshot([self.root])
+        self.plan = CleaningPlan(self.snapshot)
+        self.resolved = []
+
+    def _resolve_all(self, links):
+        """Pretend to resolve the links and remember which ones were resolved."""
+        self.resolved.extend(link.name for link in links)
+        return iter([(link, LinkTarget(self.root, link.name == "App.lnk", False)) for link in links])
+
+    def _delete(self, file, details):
+        """Delete a file."""
+        self.plan.unlink(file, "Deleted %s")
+
+    def test_cheap_rules_first(self):
+        """Test that only links that survive the cheap rules are resolved and deleted entries are skipped."""
+        evaluated = []
+        statistics = CycleStatistics()
+
+        def broken(file, target):
+            evaluated.append(file.name)
+            return () if target is not None and not target.exists else None
+
+        pipeline = RulePipeline(
+            [
+                Rule("broken", broken, self._delete, needs_target=True),
+                Rule("broken again", broken, self._delete, needs_target=True),
+                Rule("names", lambda file, _: () if "Uninstall" in file.name else None, self._delete),
+            ],
+            [Rule("empty", lambda directory, _: () if not self.snapshot.children(directory) else None,
+                  lambda directory, _: self.plan.rmdir(directory, "Deleted %s"))],
+            statistics,
+            self.plan
+        )
+        pipeline.run_file_rules(self.snapshot, self._resolve_all)
+        pipeline.run_directory_rules(self.snapshot)
+
+        self.assertCountEqual(self.resolved, ["App.lnk", "Broken.lnk"])
+        self.assertCountEqual(evaluated, ["App.lnk", "App.lnk", "Broken.lnk"])
+        self.assertCountEqual(
+            [(operation.path.name, operation.rule) for operation in self.plan.operations],
+            [("Uninstall.lnk", "names"), ("Broken.lnk", "broken"), ("Folder", "empty")]
+        )
+        self.assertEqual(statistics.counters[SHORTCUT_RESOLUTIONS], 2)
+        self.assertEqual(statistics.rules[RESOLVE_LINKS].shortcut_resolutions, 2)
+        self.assertEqual((statistics.rules["names"].visited, statistics.rules["names"].actions), (3, 1))
+        self.assertEqual((statistics.rules["broken"].visited, statistics.rules["broken"].actions), (2, 1))
+        self.assertEqual(statistics.rules["broken again"].visited, 1)
+        self.assertEqual(statistics.rules["empty"].actions, 1)
+
+    def test_resume_from_cursor(self):
+        """Test that links are resolved until the budget is used up and the next run continues there."""
+        rules = [Rule("broken", lambda file, target: () if not target.exists else None, self._delete,
+                      needs_target=True)]
+        pipeline = RulePipeline(rules, [], plan=self.plan)
+        cursor = pipeline.run_file_rules(self.snapshot, self._resolve_all, over_budget=lambda: True)
+        self.assertEqual(cursor, (0, ("Folder", "Broken.lnk")))
+        self.assertListEqual(self.plan.operations, [])
+
+        self.resolved.clear()
+        self.assertIsNone(pipeline.run_file_rules(self.snapshot, self._resolve_all, cursor))
+        self.assertListEqual(self.resolved, ["Broken.lnk", "Uninstall.lnk"])
+        self.assertListEqual([operation.path.name for operation in self.plan.operations],
+                             ["Broken.lnk", "Uninstall.lnk"])
+
+
+if __name__ == "__main__":
+    unittest.main()
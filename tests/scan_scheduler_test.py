@@ -0,0 +1,61 @@
+"""Tests for the ScanScheduler."""
+import random
+import threading
+import unittest
+
+from support import FakeClock
+
+from library.helpers.scan_scheduler import ScanScheduler
+
+
+class TestScanScheduler(unittest.TestCase):
+    """Test scheduling scans."""
+    def setUp(self):
+        self.clock = FakeClock()
+
+    def test_adaptive_interval(self):
+        """Test that the interval backs off without changes and tightens after changes."""
+        scheduler = ScanScheduler(300, adaptive=True, jitter=0, clock=self.clock)
+        intervals = []
+        for changed in [False, False, False, False, False, True, False]:
+            scheduler.record_scan(changed)
+            intervals.append(scheduler.seconds_until_next_scan())
+        self.assertListEqual(intervals, [600, 1200, 2400, 2400, 2400, 75, 150])
+
+        scheduler.configure(300, adaptive=False)
+        scheduler.record_scan(True)
+        self.assertEqual(scheduler.seconds_until_next_scan(), 300)
+
+    def test_jitter(self):
+        """Test that the intervals vary by at most the jitter."""
+        scheduler = ScanScheduler(100, adaptive=False, jitter=0.1, clock=self.clock,
+                                  random_generator=random.Random(0))
+        intervals = set()
+        for _ in range(20):
+            scheduler.record_scan(False)
+            intervals.add(scheduler.seconds_until_next_scan())
+        self.assertGreater(len(intervals), 1)
+        self.assertTrue(all(90 <= interval <= 110 for interval in intervals))
+
+    def test_wait(self):
+        """Test that waiting ends when a scan is due, triggered or the scheduler is stopped."""
+        scheduler = ScanScheduler(300, adaptive=False, jitter=0, clock=self.clock)
+        self.assertTrue(scheduler.wait())  # The first scan is due right away
+
+        scheduler.record_scan(False)
+        self.assertFalse(scheduler.wait(timeout=0))
+        self.clock.time += 300
+        self.assertTrue(scheduler.wait())
+
+        scheduler.record_scan(False)
+        threading.Timer(0.01, scheduler.trigger).start()
+        self.assertTrue(scheduler.wait())
+        self.assertFalse(scheduler.interrupted())
+
+        threading.Timer(0.01, scheduler.stop).start()
+        self.assertFalse(scheduler.wait())
+        self.assertTrue(scheduler.stopped())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,57 @@
+"""Tests for the shell link parser."""
+import os
+import pathlib
+import unittest
+from unittest import mock
+
+from library.helpers import shell_link
+
+FIXTURES_PATH = pathlib.Path(__file__).parent.joinpath("fixtures")
+
+
+class TestShellLink(unittest.TestCase):
+    """Test parsing windows shortcut files."""
+    def test_local_link(self):
+        """Test a shortcut with a target ID list, link info and string data."""
+        link = shell_link.read(FIXTURES_PATH.joinpath("local.lnk"))
+        self.assertEqual(link.target, "C:\\Program Files\\Editor\\editor.exe")
+        self.assertEqual(link.arguments, "--new-window")
+        self.assertEqual(link.working_directory, "C:\\Program Files\\Editor")
+        self.assertEqual(link.relative_path, "..\\..\\..\\..\\Program Files\\Editor\\editor.exe")
+        self.assertFalse(link.advertised)
+
+    def test_id_list_link(self):
+        """Test a shortcut that only has a target ID list."""
+        link = shell_link.read(FIXTURES_PATH.joinpath("id_list.lnk"))
+        self.assertEqual(link.target, "D:\\Games Library\\Game Launcher.exe")
+        self.assertEqual(link.arguments, "")
+
+    def test_network_link(self):
+        """Test a shortcut to a file on a network share."""
+        link = shell_link.read(FIXTURES_PATH.joinpath("network.lnk"))
+        self.assertEqual(link.target, "\\\\fileserver\\tools\\report.exe")
+        self.assertEqual(link.arguments, "/quiet")
+
+    def test_environment_variable_link(self):
+        """Test that environment variables in the target are expanded."""
+        with mock.patch.dict(os.environ, {"SystemRoot": "C:\\Windows"}):
+            link = shell_link.read(FIXTURES_PATH.joinpath("environment.lnk"))
+        self.assertEqual(link.target, "C:\\Windows\\system32\\notepad.exe")
+
+    def test_advertised_link(self):
+        """Test that advertised shortcuts are recognized."""
+        link = shell_link.read(FIXTURES_PATH.joinpath("advertised.lnk"))
+        self.assertTrue(link.advertised)
+        self.assertIsNone(link.target)
+
+    def test_invalid_link(self):
+        """Test that invalid data raises a ShellLinkError."""
+        data = FIXTURES_PATH.joinpath("local.lnk").read_bytes()
+        with self.assertRaises(shell_link.ShellLinkError):
+            shell_link.parse(b"not a shortcut")
+        with self.assertRaises(shell_link.ShellLinkError):
+            shell_link.parse(data[:100])
+
+
+if __name__ == "__main__":
+    unittest.main()
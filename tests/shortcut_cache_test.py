@@ -0,0 +1,71 @@
+"""Tests for the ShortcutCache."""
+import pathlib
+import unittest
+from unittest.mock import Mock
+
+from support import TemporaryDirectoryTestCase
+
+from library.helpers.shortcut_cache import ShortcutCache
+
+
+class TestShortcutCache(TemporaryDirectoryTestCase):
+    """Test caching the targets of shortcuts."""
+    def setUp(self):
+        super().setUp()
+        self.read_shortcut = Mock(
+            side_effect=lambda link: (pathlib.Path("C:/Targets", link.stem), "--start")
+        )
+
+    def test_hits_and_misses(self):
+        """Test that unchanged shortcuts are only read once."""
+        cache = ShortcutCache(None, 10, self.read_shortcut)
+        link = pathlib.Path("Program.lnk")
+
+        self.assertEqual(cache.read_shortcut(link, 1, 100), pathlib.Path("C:/Targets/Program"))
+        self.assertEqual(cache.read_shortcut(link, 1, 100), pathlib.Path("C:/Targets/Program"))
+        cache.read_shortcut(link, 2, 100)
+
+        self.assertEqual(self.read_shortcut.call_count, 2)
+        self.assertEqual((cache.hits, cache.misses), (1, 2))
+
+    def test_eviction(self):
+        """Test that the least recently used shortcut is evicted."""
+        cache = ShortcutCache(None, 2, self.read_shortcut)
+        first, second, third = (pathlib.Path(f"{name}.lnk") for name in ("A", "B", "C"))
+
+        cache.read_shortcut(first, 1, 1)
+        cache.read_shortcut(second, 1, 1)
+        cache.read_shortcut(first, 1, 1)
+        cache.read_shortcut(third, 1, 1)
+        cache.read_shortcut(first, 1, 1)
+        cache.read_shortcut(second, 1, 1)
+
+        self.assertEqual(cache.misses, 4)
+
+    def test_persistence(self):
+        """Test that the cache survives being saved and loaded again."""
+        cache_file = self.directory.joinpath("shortcut_cache.json")
+        cache = ShortcutCache(cache_file, 10, self.read_shortcut)
+        cache.read_shortcut(pathlib.Path("Program.lnk"), 1, 100)
+        cache.save()
+
+        loaded_cache = ShortcutCache(cache_file, 10, self.read_shortcut)
+        self.assertEqual(
+            loaded_cache.read_shortcut_and_arguments(pathlib.Path("Program.lnk"), 1, 100),
+            (pathlib.Path("C:/Targets/Program"), "--start")
+        )
+        self.assertEqual(loaded_cache.hits, 1)
+        self.assertEqual(self.read_shortcut.call_count, 1)
+
+    def test_corrupt_file(self):
+        """Test that a corrupt cache file is ignored."""
+        cache_file = self.directory.joinpath("shortcut_cache.json")
+        cache_file.write_text("{", encoding="utf-8")
+        with self.assertLogs(level="WARNING"):
+            cache = ShortcutCache(cache_file, 10, self.read_shortcut)
+        cache.read_shortcut(pathlib.Path("Program.lnk"), 1, 100)
+        self.assertEqual(cache.misses, 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
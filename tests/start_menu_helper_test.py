@@ -0,0 +1,242 @@
+"""Tests for the StartMenuHelper."""
+import functools
+import pathlib
+import unittest
+from unittest.mock import patch
+
+from support import FakeClock, TemporaryDirectoryTestCase
+
+from library import constants
+from library.configuration import Configuration
+from library.helpers.cancellation import Checkpoint
+from library.helpers.metrics import RESOLVE_LINKS
+from library.helpers.tree_snapshot import TreeSnapshot
+from library.start_menu_helper import StartMenuHelper
+
+
+class TestStartMenuHelper(TemporaryDirectoryTestCase):
+    """Test cleaning a start menu with shortcuts whose targets are written into the files."""
+    def setUp(self):
+        super().setUp()
+        self.start_menu = self.directory.joinpath("Start Menu")
+        self.programs = self.start_menu.joinpath("Programs")
+        self.programs.mkdir(parents=True)
+        self.config = Configuration(self.directory.joinpath("config"))
+        for patcher in [
+            patch.object(constants, "START_MENU_PATHS", [self.start_menu]),
+            patch("library.helpers.windows_shortcuts.read_shortcut_and_arguments", side_effect=self._read_shortcut),
+        ]:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.helper = StartMenuHelper(self.config)
+
+    @staticmethod
+    def _read_shortcut(link):
+        """Return the target that is written into the shortcut file."""
+        target = link.read_text(encoding="utf-8")
+        if target == "unreadable":
+            raise OSError("Not a shortcut")
+        return pathlib.Path(target), ""
+
+    def _shortcut(self, path, target):
+        """Create a shortcut to the target below the programs directory."""
+        shortcut = self.programs.joinpath(path)
+        shortcut.parent.mkdir(parents=True, exist_ok=True)
+        shortcut.write_text(target, encoding="utf-8")
+
+    def _clean(self, **options):
+        """Save the options and run one cycle."""
+        for key, value in options.items():
+            self.config.set(key, value)
+        self.config.save()
+        self.helper.run_cycle()
+
+    def _remaining(self):
+        """Return the paths of all files that are left below the programs directory."""
+        return sorted(path.relative_to(self.programs).as_posix() for path in self.programs.rglob("*") if path.is_file())
+
+    def test_duplicates_in_different_folders(self):
+        """Test that files in different folders are only duplicates if their targets are the same."""
+        self._shortcut("VendorA/Uninstall.lnk", "C:/VendorA/a.exe")
+        self._shortcut("VendorB/Uninstall.lnk", "C:/VendorB/b.exe")
+        self._shortcut("App.lnk", "C:/App/app.exe")
+        self._shortcut("VendorA/App.lnk", "C:/App/app.exe")
+
+        self._clean(delete_duplicates_bool="True")
+
+        self.assertListEqual(self._remaining(), ["App.lnk", "VendorA/Uninstall.lnk", "VendorB/Uninstall.lnk"])
+
+    def test_duplicates_without_targets(self):
+        """Test that shortcuts without a target or that can not be read are never duplicates."""
+        self._shortcut("Control Panel.lnk", "")
+        self._shortcut("Tools/This PC.lnk", "")
+        self._shortcut("Broken.lnk", "unreadable")
+        self._shortcut("Tools/Other.lnk", "unreadable")
+
+        with self.assertLogs(level="WARNING"):
+            self._clean(delete_duplicates_bool="True")
+
+        self.assertListEqual(self._remaining(),
+                             ["Broken.lnk", "Control Panel.lnk", "Tools/Other.lnk", "Tools/This PC.lnk"])
+
+    def test_files_not_matching_file_types(self):
+        """Test that shortcuts are kept if either their own file type or the one of their target is listed."""
+        programs_files = self.directory.joinpath("Program Files")
+        programs_files.mkdir()
+        programs_files.joinpath("app.exe").write_bytes(b"")
+        programs_files.joinpath("manual.pdf").write_bytes(b"")
+        self._shortcut("App.lnk", str(programs_files.joinpath("app.exe")))
+        self._shortcut("Manual.lnk", str(programs_files.joinpath("manual.pdf")))
+        self._shortcut("Readme.txt", "")
+        self.config.delete_matching_file_types_exceptions = [".lnk"]
+
+        self._clean(delete_files_based_on_file_type_str="not in the list")
+        self.assertListEqual(self._remaining(), ["App.lnk", "Manual.lnk"])
+
+        self.config.delete_matching_file_types_exceptions = [".exe"]
+        self._clean()
+        self.assertListEqual(self._remaining(), ["App.lnk"])
+
+    def test_file_types_of_unknown_targets(self):
+        """Test that shortcuts whose targets could not be checked are kept whatever the file types are."""
+        self._shortcut("Offline.lnk", str(self.directory.joinpath("Apps", "app.exe")))
+        self._shortcut("Readme.txt", "")
+        self.config.delete_matching_file_types_exceptions = [".exe"]
+
+        with patch("library.helpers.target_oracle.TargetOracle._drive_is_reachable", return_value=False):
+            self.helper = StartMenuHelper(self.config)
+            self._clean(delete_files_based_on_file_type_str="not in the list")
+            self.assertListEqual(self._remaining(), ["Offline.lnk"])
+
+            self._clean(delete_files_based_on_file_type_str="in the list")
+            self.assertListEqual(self._remaining(), ["Offline.lnk"])
+
+    def test_start_menus_without_programs_directory(self):
+        """Test that start menus without a programs directory are skipped and compared with no other one."""
+        user_start_menu = self.directory.joinpath("User Start Menu")
+        user_start_menu.mkdir()
+        self._shortcut("App.lnk", "C:/App/app.exe")
+        self._shortcut("Other App.lnk", "C:/App/app.exe")
+
+        start_menus = [self.directory.joinpath("Missing"), self.start_menu, user_start_menu]
+        with patch.object(constants, "START_MENU_PATHS", start_menus):
+            self.helper = StartMenuHelper(self.config)
+            self._clean(delete_duplicates_bool="True")
+
+        self.assertListEqual(self._remaining(), ["App.lnk"])
+
+    def test_duplicates_of_several_users(self):
+        """Test that the shortcut of all users is kept if only one of several users has a duplicate."""
+        user_programs = [self.directory.joinpath(user, "Programs") for user in ["u1", "u2"]]
+        for programs in user_programs:
+            programs.mkdir(parents=True)
+        self._shortcut("App.lnk", "C:/App/app.exe")
+        user_programs[0].joinpath("My App.lnk").write_text("C:/App/app.exe", encoding="utf-8")
+
+        start_menus = [self.start_menu] + [programs.parent for programs in user_programs]
+        for keep in ["current user", "newest"]:
+            with patch.object(constants, "START_MENU_PATHS", start_menus):
+                self.helper = StartMenuHelper(self.config)
+                self._clean(delete_duplicates_bool="True", delete_duplicates_keep_str=keep)
+            self.assertListEqual(self._remaining(), ["App.lnk"])
+            self.assertListEqual(list(user_programs[0].iterdir()), [])
+            user_programs[0].joinpath("My App.lnk").write_text("C:/App/app.exe", encoding="utf-8")
+
+    def test_move_files_to_programs_directory(self):
+        """Test that files next to the programs directory are moved as part of the plan and can be undone."""
+        self.start_menu.joinpath("App.lnk").write_text("C:/App/app.exe", encoding="utf-8")
+        self.start_menu.joinpath("Tools").mkdir()
+        self.start_menu.joinpath("Tools", "Tool.lnk").write_text("C:/Tools/tool.exe", encoding="utf-8")
+        self.config.save()
+
+        self.assertListEqual(self.helper.dry_run(), [
+            f"Would apply: Moved {self.start_menu.joinpath('App.lnk')} to {self.programs}",
+            f"Would apply: Moved {self.start_menu.joinpath('Tools')} to {self.programs}",
+        ])
+        self._clean(flatten_folders_containing_only_one_item_bool="True")
+        self.assertListEqual(self._remaining(), ["App.lnk", "Tool.lnk"])
+        self.assertListEqual(
+            sorted((action.rule, action.path) for action in self.helper.history.actions()),
+            [
+                ("flatten_folders_containing_one_file", str(self.programs.joinpath("Tools", "Tool.lnk"))),
+                ("move_files_to_programs_directory", str(self.start_menu.joinpath("App.lnk"))),
+                ("move_files_to_programs_directory", str(self.start_menu.joinpath("Tools"))),
+            ]
+        )
+
+        self.helper.undo_last_cycle()
+        self.assertListEqual(sorted(path.name for path in self.start_menu.rglob("*")),
+                             ["App.lnk", "Programs", "Tool.lnk", "Tools"])
+        self.assertListEqual(self._remaining(), [])
+
+    def test_broken_links_without_changes(self):
+        """Test that links whose targets were removed are deleted even if the start menu did not change."""
+        programs_files = self.directory.joinpath("Program Files")
+        programs_files.mkdir()
+        programs_files.joinpath("app.exe").write_bytes(b"")
+        self._shortcut("Folder/App.lnk", str(programs_files.joinpath("app.exe")))
+
+        self._clean(delete_broken_links_bool="True", delete_empty_folders_bool="True",
+                    incremental_scanning_bool="True")
+        self.assertListEqual(self._remaining(), ["Folder/App.lnk"])
+
+        programs_files.joinpath("app.exe").unlink()
+        self.helper = StartMenuHelper(self.config)  # The old helper still knows the listing of the target
+        self.helper.run_cycle()
+        self.assertListEqual(list(self.programs.iterdir()), [])
+        resolution = self.helper.metrics.last_cycle.rules[RESOLVE_LINKS]
+        self.assertEqual((resolution.shortcut_resolutions, resolution.directory_listings), (1, 1))
+
+    def test_changed_shortcut_without_changes_to_folders(self):
+        """Test that a shortcut that points somewhere else is read again although its folder did not change."""
+        programs_files = self.directory.joinpath("Program Files")
+        programs_files.mkdir()
+        programs_files.joinpath("app.exe").write_bytes(b"")
+        self._shortcut("App.lnk", str(programs_files.joinpath("app.exe")))
+        self._clean(delete_broken_links_bool="True", incremental_scanning_bool="True")
+
+        self._shortcut("App.lnk", str(programs_files.joinpath("uninstalled", "app.exe")))
+        self.helper = StartMenuHelper(self.config)
+        self.helper.run_cycle()
+        self.assertListEqual(self._remaining(), [])
+
+    def test_time_budget_after_slow_reading(self):
+        """Test that reading the start menu for longer than the time budget leaves the budget for resolving links."""
+        clock = FakeClock()
+        for name in ["A", "B", "C"]:
+            self._shortcut(f"{name}.lnk", str(self.directory.joinpath(f"{name}.exe")))
+
+        def slow_snapshot(*args):
+            """Read the start menu and let more time than the budget pass."""
+            snapshot = TreeSnapshot(*args)
+            clock.sleep(60)
+            return snapshot
+
+        for patcher in [
+            patch("library.start_menu_helper.Checkpoint", functools.partial(Checkpoint, clock=clock)),
+            patch("library.start_menu_helper.TreeSnapshot", slow_snapshot),
+        ]:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self._clean(delete_broken_links_bool="True", time_budget_in_seconds_int="10")
+        self.assertListEqual(self._remaining(), [])
+
+    def test_priority_and_delay_of_single_cycles(self):
+        """Test that cycles that are run on their own lower the priority once and wait before the first cycle."""
+        with patch("library.start_menu_helper.lower_priority", return_value=True) as lower_priority:
+            with patch("library.start_menu_helper.StoppableThread.wait", return_value=False) as wait:
+                self._clean(low_priority_bool="True", first_cycle_delay_in_seconds_int="30")
+                self.helper.run_cycle()
+        lower_priority.assert_called_once_with()
+        wait.assert_called_once_with(30)
+
+    def test_no_workers(self):
+        """Test that a cycle uses one worker if the options ask for none."""
+        self._shortcut("Broken.lnk", str(self.directory.joinpath("Missing.exe")))
+        self._clean(delete_broken_links_bool="True", shortcut_resolution_workers_int="0",
+                    start_menu_workers_int="0")
+        self.assertListEqual(self._remaining(), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
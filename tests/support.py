@@ -0,0 +1,25 @@
+"""Helpers that are shared by the tests."""
+import pathlib
+import tempfile
+import unittest
+
+
+class FakeClock:
+    """A clock that only moves when it is told to or when something sleeps."""
+    def __init__(self):
+        self.time = 1000.0
+
+    def __call__(self):
+        return self.time
+
+    def sleep(self, seconds):
+        """Move the clock forward instead of sleeping."""
+        self.time += seconds
+
+
+class TemporaryDirectoryTestCase(unittest.TestCase):
+    """A test case that gets a new temporary directory for every test."""
+    def setUp(self):
+        temporary_directory = tempfile.TemporaryDirectory()
+        self.addCleanup(temporary_directory.cleanup)
+        self.directory = pathlib.Path(temporary_directory.name)
@@ -0,0 +1,73 @@
+"""Tests for the TargetOracle."""
+import unittest
+from unittest.mock import patch
+
+from support import FakeClock, TemporaryDirectoryTestCase
+
+from library.helpers.target_oracle import TargetOracle
+
+
+class TestTargetOracle(TemporaryDirectoryTestCase):
+    """Test checking link targets with directory listings."""
+    def setUp(self):
+        super().setUp()
+        self.vendor = self.directory.joinpath("Vendor")
+        self.vendor.joinpath("Data").mkdir(parents=True)
+        for index in range(10):
+            self.vendor.joinpath(f"app{index}.exe").write_bytes(b"")
+        self.clock = FakeClock()
+        self.oracle = TargetOracle(60, self.clock)
+
+    def test_directory_is_listed_once(self):
+        """Test that targets in the same directory are checked with one listing instead of many stats."""
+        targets = [self.oracle.check(self.vendor.joinpath(f"app{index}.exe")) for index in range(10)]
+        folder = self.oracle.check(self.vendor.joinpath("Data"))
+
+        self.assertTrue(all(target.exists and not target.is_dir for target in targets))
+        self.assertTrue(folder.exists and folder.is_dir)
+        self.assertEqual(self.oracle.listings, 1)
+        self.assertEqual(self.oracle.stats, 1)  # The root of the drive
+
+    def test_missing_targets_are_confirmed(self):
+        """Test that a target that is not in an old listing is only missing if it does not exist."""
+        self.oracle.check(self.vendor.joinpath("app0.exe"))
+        self.vendor.joinpath("new.exe").write_bytes(b"")
+
+        self.assertTrue(self.oracle.check(self.vendor.joinpath("new.exe")).exists)
+        missing = self.oracle.check(self.vendor.joinpath("missing.exe"))
+        self.assertFalse(missing.exists)
+        self.assertTrue(missing.known)
+        self.assertFalse(self.oracle.check(self.vendor.joinpath("Missing Folder", "app.exe")).exists)
+
+    def test_listings_expire(self):
+        """Test that a directory is listed again once its listing is older than the time to live."""
+        self.oracle.check(self.vendor.joinpath("app0.exe"))
+        self.clock.time += 30
+        self.oracle.check(self.vendor.joinpath("app1.exe"))
+        self.assertEqual(self.oracle.listings, 1)
+
+        self.vendor.joinpath("app0.exe").unlink()
+        self.clock.time += 31
+        self.assertTrue(self.oracle.check(self.vendor.joinpath("app1.exe")).exists)
+        self.assertFalse(self.oracle.check(self.vendor.joinpath("app0.exe")).exists)
+        self.assertEqual(self.oracle.listings, 2)
+
+    def test_unreachable_drive_is_unknown(self):
+        """Test that targets on a drive that can not be reached are neither existing nor missing."""
+        with patch("os.path.isdir", return_value=False):
+            target = self.oracle.check(self.vendor.joinpath("app0.exe"))
+
+        self.assertFalse(target.known)
+        self.assertFalse(target.exists)
+        self.assertEqual(self.oracle.listings, 0)
+
+    def test_unreadable_target_is_unknown(self):
+        """Test that a target whose directory and metadata can not be read is unknown."""
+        with patch("os.scandir", side_effect=PermissionError), patch("os.stat", side_effect=PermissionError):
+            target = self.oracle.check(self.vendor.joinpath("app0.exe"))
+
+        self.assertFalse(target.known)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,67 @@
+"""Tests for the Throttle."""
+import unittest
+from unittest.mock import patch
+
+from support import FakeClock
+
+from library.helpers.throttle import Throttle, TokenBucket, lower_priority
+
+
+class TestThrottle(unittest.TestCase):
+    """Test limiting how fast the start menu is read and changed."""
+    def setUp(self):
+        self.clock = FakeClock()
+        lower_priority.cache_clear()
+
+    def tearDown(self):
+        lower_priority.cache_clear()
+
+    def test_rate(self):
+        """Test that a burst goes through right away and everything after it at the rate."""
+        bucket = TokenBucket(10, clock=self.clock)
+        for _ in range(10):
+            self.assertEqual(bucket.take(), 0)
+        for _ in range(20):
+            self.clock.sleep(bucket.take())
+        self.assertAlmostEqual(self.clock.time, 1002.0)
+        self.assertAlmostEqual(bucket.waited, 2.0)
+
+        self.clock.time += 60
+        for _ in range(10):
+            self.assertEqual(bucket.take(), 0)
+        self.assertAlmostEqual(bucket.take(), 0.1)
+
+    def test_waiting_threads_take_turns(self):
+        """Test that operations that arrive at the same time reserve the next tokens one after another."""
+        bucket = TokenBucket(2, burst=1, clock=self.clock)
+        self.assertListEqual([bucket.take() for _ in range(4)], [0, 0.5, 1.0, 1.5])
+
+    def test_separate_budgets(self):
+        """Test that reading does not use up the budget for changes and that 0 means no limit."""
+        throttle = Throttle(1, 2, clock=self.clock, sleep=self.clock.sleep)
+        unlimited = Throttle(clock=self.clock, sleep=self.clock.sleep)
+        for _ in range(5):
+            throttle.read()
+            unlimited.read()
+            unlimited.change()
+        self.assertAlmostEqual(self.clock.time, 1004.0)
+
+        throttle.change()
+        throttle.change()
+        self.assertAlmostEqual(self.clock.time, 1004.0)
+        self.assertEqual(throttle.changes.waited, 0)
+
+    def test_lower_priority_once(self):
+        """Test that the priority is only lowered once and that failing to lower it is not fatal."""
+        with patch("os.nice") as nice:
+            self.assertTrue(lower_priority())
+            self.assertTrue(lower_priority())
+        nice.assert_called_once()
+
+        lower_priority.cache_clear()
+        with patch("os.nice", side_effect=PermissionError), self.assertLogs(level="WARNING"):
+            self.assertFalse(lower_priority())
+
+
+if __name__ == "__main__":
+    unittest.main()
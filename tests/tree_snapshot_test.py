@@ -0,0 +1,97 @@
+"""Tests for the TreeSnapshot."""
+import unittest
+
+from support import TemporaryDirectoryTestCase
+
+from library.helpers.tree_snapshot import TreeSnapshot
+
+
+class TestTreeSnapshot(TemporaryDirectoryTestCase):
+    """Test reading and updating a TreeSnapshot."""
+    def setUp(self):
+        super().setUp()
+        self.root = self.directory
+        self.root.joinpath("Folder", "Nested").mkdir(parents=True)
+        self.root.joinpath("Folder", "Nested", "App.lnk").write_bytes(b"")
+        self.root.joinpath("Folder", "Readme.txt").write_bytes(b"text")
+        self.root.joinpath("Top.lnk").write_bytes(b"")
+
+    def test_read_tree(self):
+        """Test that all entries are read in one walk."""
+        snapshot = TreeSnapshot([self.root])
+        root = snapshot.root(self.root)
+
+        self.assertListEqual(
+            [entry.path for entry in snapshot.directories(root)],
+            [self.root.joinpath("Folder"), self.root.joinpath("Folder", "Nested")]
+        )
+        self.assertListEqual(
+            [entry.path for entry in snapshot.links(root)],
+            [self.root.joinpath("Folder", "Nested", "App.lnk"), self.root.joinpath("Top.lnk")]
+        )
+        self.assertEqual(
+            [entry.size for entry in snapshot.files(root) if entry.name == "Readme.txt"],
+            [4]
+        )
+
+    def test_skip_unreadable_roots(self):
+        """Test that roots that can not be read are left out instead of stopping the reading."""
+        missing = self.root.joinpath("Missing")
+        with self.assertLogs(level="WARNING"):
+            snapshot = TreeSnapshot([missing, self.root])
+
+        self.assertListEqual([root.location for root in snapshot.roots], [self.root])
+        self.assertEqual(len(list(snapshot.links(snapshot.root(self.root)))), 2)
+
+    def test_move_and_remove(self):
+        """Test that moving and removing entries updates the snapshot in place."""
+        snapshot = TreeSnapshot([self.root])
+        root = snapshot.root(self.root)
+        folder, nested = snapshot.directories(root)
+        link = snapshot.children(nested)[0]
+
+        snapshot.move(link, root)
+        snapshot.remove(folder)
+
+        self.assertEqual(link.path, self.root.joinpath("App.lnk"))
+        self.assertFalse(folder.exists)
+        self.assertFalse(nested.exists)
+        self.assertListEqual(
+            [entry.name for entry in snapshot.children(root)],
+            ["Top.lnk", "App.lnk"]
+        )
+
+    def test_read_trees_concurrently(self):
+        """Test that reading several trees with workers keeps their order and counts everything."""
+        roots = [self.root.joinpath("Folder"), self.root.joinpath("Folder", "Nested"), self.root]
+        sequential = TreeSnapshot(roots)
+        concurrent = TreeSnapshot(roots, workers=3)
+
+        self.assertListEqual([root.location for root in concurrent.roots], roots)
+        self.assertEqual(
+            (concurrent.entries, concurrent.listings, concurrent.stats),
+            (sequential.entries, sequential.listings, sequential.stats)
+        )
+        self.assertEqual((concurrent.entries, concurrent.listings), (9, 6))
+
+    def test_parallel_traversal(self):
+        """Test that reading every directory as a task of its own creates the same snapshot."""
+        for index in range(20):
+            self.root.joinpath("Folder", f"Program {index}", "Tools").mkdir(parents=True)
+            self.root.joinpath("Folder", f"Program {index}", "Tools", "Tool.lnk").write_bytes(b"")
+        sequential = TreeSnapshot([self.root])
+        parallel = TreeSnapshot([self.root], workers=4, parallel_traversal=True)
+
+        self.assertListEqual(
+            [entry.path for entry in parallel.files(parallel.roots[0])],
+            [entry.path for entry in sequential.files(sequential.roots[0])]
+        )
+        self.assertListEqual(
+            [entry.path for entry in parallel.directories(parallel.roots[0])],
+            [entry.path for entry in sequential.directories(sequential.roots[0])]
+        )
+        self.assertEqual((parallel.entries, parallel.listings), (sequential.entries, sequential.listings))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,56 @@
+"""Tests for the WorkStealingPool."""
+import threading
+import time
+import unittest
+
+from library.helpers.work_stealing import WorkStealingPool
+
+
+class TestWorkStealingPool(unittest.TestCase):
+    """Test processing tasks that add more tasks."""
+    def test_processes_all_tasks(self):
+        """Test that every task and every task added by another task is processed once."""
+        processed = []
+        lock = threading.Lock()
+
+        def process(task):
+            with lock:
+                processed.append(task)
+            time.sleep(0.001)
+            return [task + (child,) for child in range(3)] if len(task) < 4 else []
+
+        WorkStealingPool(4).run([(0,), (1,)], process)
+
+        self.assertEqual(len(processed), 2 * (1 + 3 + 9 + 27))
+        self.assertEqual(len(set(processed)), len(processed))
+
+    def test_work_is_stolen(self):
+        """Test that tasks added by one worker are processed by other workers as well."""
+        threads = set()
+
+        def process(task):
+            threads.add(threading.get_ident())
+            time.sleep(0.01)
+            return list(range(1, 16)) if task == 0 else []
+
+        WorkStealingPool(4).run([0], process)
+
+        self.assertGreater(len(threads), 1)
+
+    def test_raises_first_error(self):
+        """Test that an error stops the pool and is raised again."""
+        def process(task):
+            if task == 5:
+                raise OSError("unreachable")
+            return [task + 1] if task < 10 else []
+
+        with self.assertRaises(OSError):
+            WorkStealingPool(3).run([0], process)
+
+    def test_without_tasks(self):
+        """Test that the pool returns right away if there is nothing to do."""
+        WorkStealingPool(2).run([], lambda task: [])
+
+
+if __name__ == "__main__":
+    unittest.main()